@@ -6,24 +6,33 @@ import logging
 import threading
 import subprocess
 import socket
+import queue
+import hashlib
+import mimetypes
+from collections import deque
+from datetime import datetime, timedelta
 
-from flask import Flask, request, jsonify, send_from_directory, url_for
+from flask import Flask, Response, request, jsonify, send_from_directory, url_for, redirect, abort
 from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
-from werkzeug.utils import secure_filename
-import google.generativeai as genai
-from google.generativeai import types as genai_types
+from werkzeug.utils import secure_filename, safe_join
+from sqlalchemy import event, func
+from sqlalchemy.orm import selectinload, defer
 from flask_cors import CORS # Add this import
 
 # Import the required functions from createshorts
+from artifact_cache import artifact_cache, materialize
+from transcript_store import WordTranscript, save_transcript, load_transcript, video_transcript_path
+from chunked_upload import ChunkedUploadStore, UploadError, upload_chunk_size
+from live_ingest import live_ingests
+from suggestion_engine import SuggestionEngine, SUGGESTION_PROMPT_VERSION, parse_segments, time_to_seconds
 from createshorts import (
-    process_video,
-    parse_srt, parse_vtt,
-    get_text_from_segments,
-    VIDEOS_DIR, EDITED_VIDEOS_DIR, EDITED_SHORTS_DIR, AUDIO_DIR, SUBTITLES_DIR
+    process_video, render_video_ffmpeg,
+    load_subtitle_groups, group_words_with_timestamps,
+    get_timed_text_from_segments, transcribe_audio, get_partial_transcript, load_audio_pcm,
+    cut_segment, cut_segments_batch, plan_cut_batches, short_cut_modes, short_video_codec_args, short_audio_codec_args,
+    VIDEOS_DIR, EDITED_VIDEOS_DIR, EDITED_SHORTS_DIR, AUDIO_DIR, SUBTITLES_DIR, PREVIEWS_DIR
 )
-import google.generativeai as genai # Use the standard alias
-from google.generativeai import types as genai_types
 import logging
 import re # Import re for time validation
 from flask_migrate import Migrate
@@ -51,15 +60,53 @@ for dir_path in [DATA_DIR, VIDEOS_DIR, EDITED_VIDEOS_DIR, EDITED_SHORTS_DIR, AUD
     os.makedirs(dir_path, exist_ok=True)
 # --- End Directories ---
 
+# Default cut mode for shorts without background audio: 'smart' (re-encode head GOP, copy the rest),
+# 'copy' (keyframe-aligned stream copy, fast previews) or 'reencode' (full re-encode)
+SHORT_CUT_MODE = 'smart'
+SHORT_MAIN_AUDIO_BOOST = 1.0 # Volume multiplier for a short's own audio when background music is mixed in
+SHORT_MIN_OUTPUT_BYTES = 10 * 1024 # Rendered shorts smaller than this are treated as failed
+# Render the full 1080x1920 edited video when a video is processed. Off by default: shorts are then rendered
+# straight from the original (reframed and subtitled per clip), and the edited video is made on request only.
+RENDER_FULL_EDITED_VIDEO = os.environ.get('RENDER_FULL_EDITED_VIDEO', '').lower() in ('1', 'true', 'yes')
+
+# Gemini suggestion response cache (see SuggestionResponseCache)
+SUGGESTION_CACHE_TTL_HOURS = 7 * 24 # Cached window responses older than this are ignored and purged
+SUGGESTION_CACHE_MAX_ENTRIES = 5000 # Least recently used entries beyond this are evicted
+
+# GET /videos paging and file-presence index
+VIDEO_LIST_MAX_LIMIT = 200 # Largest page a client may request
+VIDEO_LIST_SINCE_MARGIN_SECONDS = 60 # ?since= looks back this far: updated_at is stamped at flush, which can precede the commit
+MEDIA_INDEX_RESCAN_SECONDS = 60 # Output directories are re-listed at most this often to catch external changes
+
+# Media serving. Fingerprinted /media URLs are immutable; MEDIA_OFFLOAD hands the file transfer to a front proxy:
+# '' (Flask streams it, with Range support), 'x-sendfile' (Apache/lighttpd) or 'x-accel' (nginx, internal
+# location MEDIA_ACCEL_PREFIX aliased to the data directory)
+MEDIA_OFFLOAD = os.environ.get('MEDIA_OFFLOAD', '').lower()
+MEDIA_ACCEL_PREFIX = os.environ.get('MEDIA_ACCEL_PREFIX', '/protected-media')
+MEDIA_IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+app.config['USE_X_SENDFILE'] = MEDIA_OFFLOAD == 'x-sendfile'
+
+# Server-sent events (/events)
+SSE_HISTORY_SIZE = 1000 # Recent events kept so a reconnecting client can replay from Last-Event-ID
+SSE_SUBSCRIBER_QUEUE_SIZE = 500 # Undelivered events per client before it is told to resync instead
+SSE_KEEPALIVE_SECONDS = 15 # Comment line sent on idle streams so proxies don't drop them
+SSE_RETRY_MS = 3000 # Client reconnect delay
+
 # Database Models
 class Video(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     original_filename = db.Column(db.String(512), nullable=False, index=True) # Index for faster lookup
     edited_filename = db.Column(db.String(512))
+    proxy_filename = db.Column(db.String(512), nullable=True) # Low-resolution preview render (PREVIEWS_DIR)
     status = db.Column(db.String(20), default='pending', index=True)
     video_title = db.Column(db.String(512))
     transcript = db.Column(db.Text) # Stores formatted Whisper transcript OR indicator like "Using uploaded..."
     uploaded_subtitle_filename = db.Column(db.String(512), nullable=True) # Existing field
+    progress = db.Column(db.Float, nullable=True) # Transcription percent complete while processing (None when idle)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True) # Bumped on any change to the video or its shorts
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1') # Incremented with updated_at; feeds listing ETags
+    zoom_factor = db.Column(db.Float, nullable=True) # Zoom used by the last processing run (shorts rendered from the original reuse it)
+    process_without_subs = db.Column(db.Boolean, nullable=False, default=False, server_default='0') # Burn no subtitles into shorts
 
 
 class ShortSegment(db.Model):
@@ -74,6 +121,137 @@ class ShortSegment(db.Model):
     status = db.Column(db.String(20), default='pending', index=True)
 
 
+class Job(db.Model):
+    """Persistent background job. Queued rows survive a restart and are picked up by the JobScheduler workers."""
+    id = db.Column(db.Integer, primary_key=True)
+    task_key = db.Column(db.String(64), nullable=False, index=True) # e.g. "video_3", "short_12" (one active job per key)
+    func_name = db.Column(db.String(100), nullable=False) # Name in TASK_FUNCTIONS
+    job_class = db.Column(db.String(20), nullable=False, index=True) # Concurrency class (see JOB_CLASS_LIMITS)
+    priority = db.Column(db.Integer, nullable=False, default=0, index=True) # Higher runs first
+    args_json = db.Column(db.Text, nullable=False, default='[]')
+    kwargs_json = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued', index=True) # queued, running, completed, failed
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+
+
+class SuggestionCacheEntry(db.Model):
+    """Raw Gemini response for one transcript window, keyed by suggestion_engine.suggestion_cache_key."""
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(64), nullable=False, unique=True, index=True)
+    model_name = db.Column(db.String(100), nullable=False)
+    prompt_version = db.Column(db.Integer, nullable=False)
+    temperature = db.Column(db.Float, nullable=False)
+    response_text = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+    last_used_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
+
+
+@event.listens_for(db.session, 'before_flush')
+def touch_changed_videos(session, flush_context, instances):
+    """
+    Bumps Video.updated_at and Video.version for every video whose row or shorts change in this flush
+    (drives /videos?since= and the listing ETags).
+    """
+    now = datetime.utcnow()
+    touched_videos = set()
+    touched_video_ids = set()
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, Video):
+            if obj not in session.deleted:
+                touched_videos.add(obj)
+        elif isinstance(obj, ShortSegment) and obj.video_id is not None:
+            touched_video_ids.add(obj.video_id)
+    for video_id in touched_video_ids:
+        video = session.get(Video, video_id)
+        if video is not None and video not in session.deleted:
+            touched_videos.add(video)
+    for video in touched_videos:
+        video.updated_at = now
+        video.version = (video.version or 0) + 1
+
+
+class EventBroker:
+    """
+    In-process fan-out of job status events to /events subscribers.
+
+    Each subscriber gets a bounded queue. Events carry increasing ids and the last SSE_HISTORY_SIZE are kept,
+    so a client reconnecting with Last-Event-ID gets what it missed. If it missed more than that (or the
+    server restarted, or its queue overflowed) it gets a single 'resync' event and reloads the list instead.
+    """
+
+    def __init__(self, history_size=SSE_HISTORY_SIZE, queue_size=SSE_SUBSCRIBER_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = set()
+        self._history = deque(maxlen=history_size)
+        self._next_id = 1
+
+    def _resync(self, subscriber):
+        """Replaces a subscriber's backlog with one resync event. Caller holds the lock."""
+        while True:
+            try: subscriber.get_nowait()
+            except queue.Empty: break
+        subscriber.put_nowait((self._next_id - 1, 'resync', {}))
+
+    def publish(self, event_type, data):
+        with self._lock:
+            event = (self._next_id, event_type, data)
+            self._next_id += 1
+            self._history.append(event)
+            for subscriber in self._subscribers:
+                try:
+                    subscriber.put_nowait(event)
+                except queue.Full:
+                    self._resync(subscriber)
+
+    def subscribe(self, last_event_id=None):
+        subscriber = queue.Queue(maxsize=self.queue_size)
+        with self._lock:
+            if last_event_id is not None:
+                oldest_id = self._history[0][0] if self._history else self._next_id
+                if last_event_id >= self._next_id or last_event_id + 1 < oldest_id:
+                    self._resync(subscriber) # Unknown id (server restarted) or history already gone
+                else:
+                    for past_event in self._history:
+                        if past_event[0] > last_event_id:
+                            subscriber.put_nowait(past_event)
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+event_broker = EventBroker()
+
+@event.listens_for(db.session, 'after_flush')
+def collect_status_events(session, flush_context):
+    """Records Video/ShortSegment changes in this flush; they are published once the transaction commits."""
+    pending = session.info.setdefault('pending_events', [])
+    for obj in session.deleted:
+        if isinstance(obj, Video):
+            pending.append(('video', {'id': obj.id, 'deleted': True}))
+        elif isinstance(obj, ShortSegment):
+            pending.append(('short', {'id': obj.id, 'video_id': obj.video_id, 'deleted': True}))
+    for obj in list(session.new) + list(session.dirty):
+        if isinstance(obj, Video):
+            pending.append(('video', {'id': obj.id, 'status': obj.status, 'progress': obj.progress}))
+        elif isinstance(obj, ShortSegment):
+            pending.append(('short', {'id': obj.id, 'video_id': obj.video_id, 'status': obj.status}))
+
+@event.listens_for(db.session, 'after_commit')
+def publish_status_events(session):
+    for event_type, data in session.info.pop('pending_events', []):
+        event_broker.publish(event_type, data)
+
+@event.listens_for(db.session, 'after_rollback')
+def discard_status_events(session):
+    session.info.pop('pending_events', None)
+
+
 with app.app_context():
     db.create_all()
 
@@ -83,8 +261,8 @@ logger = logging.getLogger(__name__)
 # --- Helper Functions ---
 
 def format_transcript(transcript):
-    """Formats Whisper segments into a string with timestamps."""
-    if not transcript or not isinstance(transcript, list):
+    """Formats Whisper segments (list or stored WordTranscript) into a string with timestamps."""
+    if not transcript or not isinstance(transcript, (list, WordTranscript)):
         logger.warning(f"Invalid or empty transcript data received for formatting: {type(transcript)}")
         return "Transcription data not available or invalid."
 
@@ -124,6 +302,142 @@ def format_transcript(transcript):
 
     return formatted if formatted else "No valid segments found in transcript."
 
+def load_video_transcript(video_id):
+    """Returns the stored word-level transcript for a video, or None if it was never transcribed."""
+    return load_transcript(video_transcript_path(video_id))
+
+def store_video_transcript(video_id, transcript):
+    """Saves a Whisper transcript as the video's word-level transcript and returns the stored copy."""
+    dest_path = video_transcript_path(video_id)
+    if isinstance(transcript, WordTranscript):
+        if os.path.abspath(transcript.path) != os.path.abspath(dest_path):
+            materialize(transcript.path, dest_path) # Hardlink of the cached file, no re-serialization
+    else:
+        save_transcript(transcript, dest_path)
+    logger.info(f"Stored word-level transcript for video {video_id}: {dest_path}")
+    return load_transcript(dest_path)
+
+def delete_video_transcript(video_id):
+    transcript_path = video_transcript_path(video_id)
+    if os.path.exists(transcript_path):
+        try: os.remove(transcript_path)
+        except OSError as e: logger.warning(f"Could not remove stored transcript {transcript_path}: {e}")
+
+class MediaFileIndex:
+    """
+    In-memory record of which files exist in the media output directories, so listings don't stat() every row.
+
+    Writers call add()/discard() as they create or remove files. Each directory is also re-listed with a
+    single os.scandir at most every MEDIA_INDEX_RESCAN_SECONDS to pick up changes made outside the app.
+    Also keeps each file's fingerprint for immutable media URLs: the content hash, computed by the writer in
+    add(), or for files the app didn't write, a stored hash or failing that a size/mtime signature. Each
+    fingerprint is kept with the file's stat signature and recomputed once the file changes on disk.
+    """
+
+    def __init__(self, rescan_seconds=MEDIA_INDEX_RESCAN_SECONDS):
+        self.rescan_seconds = rescan_seconds
+        self._lock = threading.Lock()
+        self._names = {} # directory -> set of file names
+        self._scanned_at = {} # directory -> time.monotonic() of the last listing
+        self._fingerprints = {} # (directory, filename) -> (fingerprint, stat signature)
+
+    def _directory_names(self, directory):
+        """Caller holds the lock."""
+        now = time.monotonic()
+        if directory not in self._names or now - self._scanned_at[directory] > self.rescan_seconds:
+            try:
+                with os.scandir(directory) as entries:
+                    self._names[directory] = {entry.name for entry in entries if entry.is_file()}
+            except OSError as e:
+                logger.warning(f"Could not list media directory {directory}: {e}")
+                self._names[directory] = set()
+            self._scanned_at[directory] = now
+            for key in [k for k in self._fingerprints if k[0] == directory and k[1] not in self._names[directory]]:
+                del self._fingerprints[key]
+        return self._names[directory]
+
+    def exists(self, directory, filename):
+        if not filename:
+            return False
+        with self._lock:
+            return filename in self._directory_names(directory)
+
+    @staticmethod
+    def _signature(path):
+        st = os.stat(path)
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def add(self, directory, filename):
+        """Records a file the caller just wrote (hashes it, so call it from the worker, not a request)."""
+        path = os.path.join(directory, filename)
+        try:
+            signature = self._signature(path)
+            fingerprint = artifact_cache.file_digest(path)[:16]
+        except OSError as e:
+            logger.warning(f"Could not fingerprint media file {filename}: {e}")
+            fingerprint = None
+        with self._lock:
+            self._directory_names(directory).add(filename)
+            if fingerprint:
+                self._fingerprints[(directory, filename)] = (fingerprint, signature)
+            else:
+                self._fingerprints.pop((directory, filename), None)
+
+    def discard(self, directory, filename):
+        with self._lock:
+            self._directory_names(directory).discard(filename)
+            self._fingerprints.pop((directory, filename), None)
+
+    def fingerprint(self, directory, filename):
+        path = os.path.join(directory, filename)
+        try:
+            signature = self._signature(path)
+        except OSError:
+            with self._lock:
+                self._fingerprints.pop((directory, filename), None)
+            return None
+        with self._lock:
+            cached = self._fingerprints.get((directory, filename))
+        if cached and cached[1] == signature:
+            return cached[0]
+        digest = artifact_cache.known_digest(path)
+        # Without a stored hash, the size/mtime signature itself changes whenever the file is rewritten
+        fingerprint = digest[:16] if digest else f"s{signature[0]:x}{signature[1]:x}"
+        with self._lock:
+            self._fingerprints[(directory, filename)] = (fingerprint, signature)
+        return fingerprint
+
+media_files = MediaFileIndex()
+
+def make_progress_reporter(video_id, min_step=1.0):
+    """Returns a progress_callback that writes throttled percent-complete updates to Video.progress."""
+    last_reported = [None]
+    def report(percent):
+        percent = round(float(percent), 1)
+        if last_reported[0] is not None and percent - last_reported[0] < min_step and percent < 100.0:
+            return
+        last_reported[0] = percent
+        try:
+            Video.query.filter_by(id=video_id).update({'progress': percent, 'updated_at': datetime.utcnow(), 'version': Video.version + 1}, synchronize_session=False)
+            db.session.commit()
+            event_broker.publish('progress', {'id': video_id, 'progress': percent}) # Bulk updates skip the flush hooks
+        except Exception as e:
+            logger.warning(f"Could not record progress {percent}% for video {video_id}: {e}")
+            db.session.rollback()
+    return report
+
+def get_or_create_video_transcript(video, progress_callback=None):
+    """Loads the video's stored transcript, running Whisper (cached by content) only if none is stored yet."""
+    transcript = load_video_transcript(video.id)
+    if transcript is not None:
+        return transcript
+    original_video_path = os.path.join(VIDEOS_DIR, video.original_filename)
+    if not os.path.exists(original_video_path):
+        raise FileNotFoundError(f"Original video file not found: {original_video_path}")
+    live_ingests.wait_for(original_video_path) # Resume from what was transcribed while the upload arrived
+    transcript = transcribe_audio(original_video_path, os.path.splitext(video.original_filename)[0], progress_callback=progress_callback)
+    return store_video_transcript(video.id, transcript)
+
 def get_subtitle_text_content(video):
     """Gets the most relevant text content (uploaded subs > generated transcript)."""
     if not video:
@@ -134,16 +448,12 @@ def get_subtitle_text_content(video):
     if video.uploaded_subtitle_filename:
         subtitle_path = os.path.join(SUBTITLES_DIR, video.uploaded_subtitle_filename)
         if os.path.exists(subtitle_path):
-            file_ext = os.path.splitext(subtitle_path)[1].lower()
             parsed_segments = None
             try:
-                if file_ext == '.srt':
-                    parsed_segments = parse_srt(subtitle_path)
-                elif file_ext == '.vtt':
-                    parsed_segments = parse_vtt(subtitle_path)
+                parsed_segments = load_subtitle_groups(subtitle_path) # Cached by file content hash
 
                 if parsed_segments:
-                    text_content = get_text_from_segments(parsed_segments)
+                    text_content = get_timed_text_from_segments(parsed_segments) # Timed, so long subtitles get windowed
                     if text_content:
                         logger.info(f"Extracted text content from uploaded subtitle file: {subtitle_path}")
                         return text_content
@@ -164,178 +474,104 @@ def get_subtitle_text_content(video):
         logger.info(f"Using stored Whisper transcript from DB for video {video.id}")
         return video.transcript # Assumes it's the formatted transcript with timestamps
 
-    # 3. No usable content found
+    # 3. Rebuild the formatted text from the stored word-level transcript (no re-transcription)
+    stored_transcript = load_video_transcript(video.id) if video.id else None
+    if stored_transcript is not None and len(stored_transcript):
+        formatted_transcript = format_transcript(stored_transcript)
+        if not formatted_transcript.startswith(("Transcription data", "No valid segments")):
+            logger.info(f"Using stored word-level transcript for video {video.id}")
+            return formatted_transcript
+
+    # 4. No usable content found
     logger.warning(f"No usable subtitle text content found for video {video.id}.")
     return None
 
 
-def get_suggested_segments(subtitle_content_text):
-    """Calls Gemini API to get short segment suggestions from subtitle text."""
-    api_key = os.environ.get('GEMINI_API_KEY')
-    if not api_key:
-        logger.error("GEMINI_API_KEY not set in environment")
-        raise ValueError("GEMINI_API_KEY not set in environment")
-
-    # Basic check for valid transcript input
-    if not subtitle_content_text or not isinstance(subtitle_content_text, str) or subtitle_content_text.strip() == "":
-        logger.warning("Cannot get suggestions: Subtitle content text is missing or empty.")
-        return "[]" # Return empty JSON array string
-
-    try:
-        # Initialize the Gemini client (consider initializing once globally if frequently used)
-        genai.configure(api_key=api_key)
-        client = genai.GenerativeModel("models/gemini-1.5-flash-latest") # Use recommended model
-
-        # Adjust prompt slightly based on whether timestamps are likely present
-        has_timestamps = "[" in subtitle_content_text and "]" in subtitle_content_text and ":" in subtitle_content_text
-        time_guidance = (
-            "Provide precise start and end times based *only* on the timestamps given in the transcript (format: [hh:mm:ss - hh:mm:ss]).\n\n"
-            if has_timestamps
-            else "Estimate appropriate start and end times in hh:mm:ss format based on the flow of the text. Ensure start time is before end time.\n\n"
-        )
-
-        prompt = (
-            "Analyze the following video subtitle text and suggest 3-5 engaging segments suitable for YouTube Shorts (typically 50-60 seconds). "
-            "Focus on segments with clear topics, questions, or strong statements.\n\n"
-            "If a logical segment is significantly longer than 60 seconds, try to break it into meaningful parts (e.g., 'Topic X Part 1', 'Topic X Part 2'), ensuring each part is still engaging on its own.\n\n"
-            "if the duration of the whole video is more than 20 minutes, please suggest at least 20 segments.\n\n"
-            f"{time_guidance}"
-            "Return the result *ONLY* as a valid JSON array. Each object in the array must contain:\n"
-            "- 'shortname': A concise, unique, descriptive name for the clip (under 50 characters).\n"
-            "- 'shortdescription': A brief summary of the segment's content (1-2 sentences).\n"
-            "- 'starttime': The start time in hh:mm:ss format.\n"
-            "- 'endtime': The end time in hh:mm:ss format.\n\n"
-            "Example Input Segment (with timestamps): [00:01:15 - 00:02:10] Discussion about AI ethics...\n"
-            "Example Output Object: {\"shortname\": \"AI Ethics Intro\", \"shortdescription\": \"Introduction to the ethical considerations of AI.\", \"starttime\": \"00:01:15\", \"endtime\": \"00:02:10\"}\n\n"
-            "Subtitle Text:\n" + subtitle_content_text
-        )
-
-        response = client.generate_content(
-            contents=[prompt],
-            generation_config=genai_types.GenerationConfig(
-                response_mime_type="application/json", # Request JSON output directly
-                # response_schema= # Consider defining schema for stricter validation if needed
-                max_output_tokens=8042, # Adjust token limit if needed
-                temperature=0.3 # Slightly adjusted temperature for consistency
-            ),
-            # safety_settings= # Add safety settings if necessary
-        )
-
-        # Log only the beginning of the response for brevity
-        response_text = response.text
-        logger.info(f"Gemini API raw response text (first 250 chars): {response_text[:250]}...")
-        return response_text # Return the JSON string directly
-
-    except Exception as e:
-        logger.error(f"Error calling Gemini API: {e}", exc_info=True)
-        # Check for specific API errors if possible (e.g., quota, invalid key)
-        # Return an empty JSON array string in case of error
-        return "[]"
-
-def parse_segments(response_text):
-    """Parses the JSON response from Gemini into a list of segment dictionaries."""
-    if not response_text or not isinstance(response_text, str):
-         logger.warning("Received invalid or empty response text from Gemini for parsing.")
-         return []
-
-    try:
-        # Handle potential Markdown fences if the API didn't return pure JSON
-        cleaned_response = response_text.strip()
-        if cleaned_response.startswith("```json"):
-            cleaned_response = cleaned_response[7:]
-        if cleaned_response.endswith("```"):
-            cleaned_response = cleaned_response[:-3]
-        cleaned_response = cleaned_response.strip()
-
-        if not cleaned_response:
-             logger.warning("Cleaned response text from Gemini is empty.")
-             return []
-
-        segments = json.loads(cleaned_response)
-
-        # Validate structure: should be a list
-        if not isinstance(segments, list):
-            # Try to load if it's a JSON object with a key containing the list
-            if isinstance(segments, dict):
-                # Look for a likely key containing the list (common names)
-                potential_keys = ['segments', 'suggestions', 'clips', 'shorts']
-                found_list = False
-                for key in segments:
-                    if key.lower() in potential_keys and isinstance(segments[key], list):
-                        segments = segments[key]
-                        found_list = True
-                        logger.info(f"Found segment list under key '{key}' in Gemini response.")
-                        break
-                if not found_list:
-                     raise ValueError(f"Expected a JSON array or object containing a list, but got object keys: {list(segments.keys())}")
-            else:
-                raise ValueError(f"Expected a JSON array, but got type {type(segments)}")
-
-        valid_segments = []
-        # Regex for hh:mm:ss format (allows 1 to 3 digits for hour)
-        time_pattern = re.compile(r'^\d{1,3}:\d{2}:\d{2}$')
+class SuggestionResponseCache:
+    """
+    Persistent (database) cache of raw Gemini window responses for the SuggestionEngine.
 
-        for i, seg in enumerate(segments):
-             if not isinstance(seg, dict):
-                 logger.warning(f"Segment {i} is not a dictionary, skipping. Data: {seg}")
-                 continue
+    Entries expire after SUGGESTION_CACHE_TTL_HOURS; once there are more than SUGGESTION_CACHE_MAX_ENTRIES,
+    the least recently used ones are deleted. Called from the engine's request threads, so each call uses
+    its own app context and session.
+    """
 
-             # Normalize keys (lowercase, remove underscores/spaces) for flexibility
-             normalized_seg = {k.lower().replace('_','').replace(' ',''): v for k, v in seg.items()}
+    def __init__(self, ttl_hours=SUGGESTION_CACHE_TTL_HOURS, max_entries=SUGGESTION_CACHE_MAX_ENTRIES):
+        self.ttl = timedelta(hours=ttl_hours)
+        self.max_entries = max_entries
 
-             # Check for required keys using normalized names
-             required_keys = ['shortname', 'shortdescription', 'starttime', 'endtime']
-             if not all(k in normalized_seg for k in required_keys):
-                 logger.warning(f"Segment {i} missing required fields. Got keys: {list(normalized_seg.keys())}. Segment data: {seg}")
-                 continue
+    def get(self, cache_key):
+        with app.app_context():
+            try:
+                entry = SuggestionCacheEntry.query.filter_by(cache_key=cache_key).first()
+                if not entry:
+                    return None
+                now = datetime.utcnow()
+                if now - entry.created_at > self.ttl:
+                    db.session.delete(entry)
+                    db.session.commit()
+                    return None
+                entry.last_used_at = now
+                response_text = entry.response_text
+                db.session.commit()
+                return response_text
+            except Exception as e:
+                logger.warning(f"Suggestion cache lookup failed (treating as miss): {e}")
+                db.session.rollback()
+                return None
 
-             start_time_str = str(normalized_seg['starttime']).strip()
-             end_time_str = str(normalized_seg['endtime']).strip()
+    def put(self, cache_key, response_text):
+        with app.app_context():
+            try:
+                entry = SuggestionCacheEntry.query.filter_by(cache_key=cache_key).first()
+                now = datetime.utcnow()
+                if entry is None:
+                    entry = SuggestionCacheEntry(cache_key=cache_key)
+                    db.session.add(entry)
+                entry.model_name = suggestion_engine.model_name
+                entry.prompt_version = SUGGESTION_PROMPT_VERSION
+                entry.temperature = suggestion_engine.temperature
+                entry.response_text = response_text
+                entry.created_at = now
+                entry.last_used_at = now
+                db.session.commit()
+                self._evict()
+            except Exception as e:
+                logger.warning(f"Could not store suggestion cache entry: {e}")
+                db.session.rollback()
+
+    def _evict(self):
+        SuggestionCacheEntry.query.filter(SuggestionCacheEntry.created_at < datetime.utcnow() - self.ttl).delete(synchronize_session=False)
+        overflow = SuggestionCacheEntry.query.count() - self.max_entries
+        if overflow > 0:
+            stale_ids = [row.id for row in SuggestionCacheEntry.query.with_entities(SuggestionCacheEntry.id).order_by(SuggestionCacheEntry.last_used_at).limit(overflow)]
+            SuggestionCacheEntry.query.filter(SuggestionCacheEntry.id.in_(stale_ids)).delete(synchronize_session=False)
+            logger.info(f"Evicted {len(stale_ids)} least recently used suggestion cache entries.")
+        db.session.commit()
 
-             # Validate time format more strictly (H:MM:SS or HH:MM:SS etc.)
-             if not (time_pattern.match(start_time_str) and time_pattern.match(end_time_str)):
-                 logger.warning(f"Segment {i} has invalid time format (Expected H:MM:SS or HH:MM:SS). Start='{start_time_str}', End='{end_time_str}'. Data: {seg}")
-                 continue
+suggestion_engine = SuggestionEngine(cache=SuggestionResponseCache())
 
-             # Optional: Validate start < end
-             try:
-                 start_s = time_to_seconds(start_time_str)
-                 end_s = time_to_seconds(end_time_str)
-                 if start_s >= end_s:
-                      logger.warning(f"Segment {i} has start time >= end time. Start='{start_time_str}', End='{end_time_str}'. Skipping.")
-                      continue
-             except ValueError as e:
-                  logger.warning(f"Segment {i} time conversion error: {e}. Start='{start_time_str}', End='{end_time_str}'. Skipping.")
-                  continue
-
-             # Map normalized keys back to expected DB keys
-             # Ensure values are strings and reasonably sized
-             short_name = str(normalized_seg['shortname'])[:100] # Limit length
-             short_desc = str(normalized_seg['shortdescription'])[:500] # Limit length
-
-             valid_segments.append({
-                 'short_name': short_name,
-                 'short_description': short_desc,
-                 'start_time': start_time_str, # Keep original valid format
-                 'end_time': end_time_str      # Keep original valid format
-             })
-
-        logger.info(f"Successfully parsed {len(valid_segments)} valid segments from Gemini response.")
-        return valid_segments
-
-    except json.JSONDecodeError as e:
-        logger.error(f"Failed to parse JSON response from Gemini: {e}. Response text: '{response_text[:500]}...'")
-        return []
-    except ValueError as e:
-        logger.error(f"Invalid segment format or structure from Gemini: {e}. Response text: '{response_text[:500]}...'")
-        return []
-    except Exception as e: # Catch other potential errors during parsing
-        logger.error(f"An unexpected error occurred during Gemini segment parsing: {e}", exc_info=True)
-        return []
+def get_suggested_segments(subtitle_content_text, force_fresh=False):
+    """Gets short segment suggestions from subtitle text as a JSON array string (see SuggestionEngine)."""
+    # Basic check for valid transcript input
+    if not subtitle_content_text or not isinstance(subtitle_content_text, str) or subtitle_content_text.strip() == "":
+        logger.warning("Cannot get suggestions: Subtitle content text is missing or empty.")
+        return "[]" # Return empty JSON array string
+    # Long transcripts are split into overlapping windows requested concurrently, then merged
+    # force_fresh skips cached window responses (they are still refreshed with the new answers)
+    return suggestion_engine.suggest_json(subtitle_content_text, force_fresh=force_fresh)
 
 # --- Core Processing Logic ---
-def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=False, zoom_factor=2.0, process_without_subs=False):
-    """Core logic for processing/reprocessing a video. Should run in a separate thread."""
+def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=False, zoom_factor=2.0, process_without_subs=False, render_edited=None):
+    """
+    Core logic for processing/reprocessing a video. Should run in a separate thread.
+
+    Only transcription (or subtitle parsing) and the Gemini suggestions happen here, so the video is 'completed'
+    as soon as suggestions are available. Renders are queued afterwards: a 360x640 preview proxy for the browser,
+    and the full edited video only if render_edited (default RENDER_FULL_EDITED_VIDEO). Without it shorts are
+    rendered straight from the original when they are created (see direct_short_source).
+    """
+    render_edited = RENDER_FULL_EDITED_VIDEO if render_edited is None else render_edited
     # Validate zoom factor early, default if needed
     try:
         zoom_factor = float(zoom_factor) if zoom_factor is not None else 2.0
@@ -360,7 +596,11 @@ def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=F
                  return
 
             video.status = 'processing'
+            video.progress = 0.0
+            video.zoom_factor = zoom_factor # Remembered for shorts rendered from the original
+            video.process_without_subs = bool(process_without_subs)
             session.commit()
+            progress_reporter = make_progress_reporter(video_id)
             logger.info(f"Starting processing for video {video_id}. Force: {force_reprocess}, Use Subs Hint: {use_uploaded_subtitle}, Zoom: {zoom_factor}, Process Without Subs: {process_without_subs}")
 
             original_video_path = os.path.join(VIDEOS_DIR, video.original_filename)
@@ -395,68 +635,59 @@ def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=F
                     logger.warning(f"Uploaded subtitle file specified ({video.uploaded_subtitle_filename}) but not found at {subtitle_path_candidate}. Falling back to generation.")
                     # video.uploaded_subtitle_filename = None # Clear invalid filename?
 
-            # --- Decide whether to run full editing vs. just transcription/parsing ---
-            # Needs re-editing if: forced, OR using uploaded subs (might be different content/formatting), OR edited file doesn't exist.
-            needs_re_editing = force_reprocess or (subtitle_source == "uploaded") or not os.path.exists(edited_video_path)
-            skip_editing = not needs_re_editing
+            # --- Transcribe/parse only; renders come after the suggestions are committed ---
+            # The edited video and preview proxy are stale if forced or using uploaded subs (different content/formatting).
+            renders_stale = force_reprocess or (subtitle_source == "uploaded")
+            if renders_stale:
+                for directory, attr in ((EDITED_VIDEOS_DIR, 'edited_filename'), (PREVIEWS_DIR, 'proxy_filename')):
+                    stale_filename = getattr(video, attr)
+                    if not stale_filename:
+                        continue
+                    stale_path = os.path.join(directory, stale_filename)
+                    logger.info(f"Removing stale render {stale_path}; it will be rendered again if needed.")
+                    if os.path.exists(stale_path):
+                        try: os.remove(stale_path)
+                        except OSError as e: logger.warning(f"Could not remove stale render {stale_path}: {e}")
+                    media_files.discard(directory, stale_filename)
+                    setattr(video, attr, None)
+            render_edited = render_edited and (renders_stale or not os.path.exists(edited_video_path))
 
             whisper_transcript_result = None # Holds raw Whisper segments list
             parsed_subtitle_groups = None # Holds list from parse_srt/vtt or group_words
 
-            if skip_editing:
-                 logger.info(f"Edited video {edited_filename} exists and no re-editing needed/forced.")
-                 # Still need subtitle content if not using uploaded subs and DB transcript is missing/invalid
-                 if subtitle_source != "uploaded" and (not video.transcript or video.transcript.startswith("Transcription data") or video.transcript.startswith("Using uploaded")):
-                     logger.info("Attempting transcript generation only (skip_editing=True).")
-                     try:
-                        _, whisper_transcript_result, parsed_subtitle_groups = process_video(
-                            original_video_path, edited_filename, skip_editing=True, subtitle_file_path=None, zoom_factor=zoom_factor, process_without_subs=process_without_subs # Pass zoom even if skipping
-                        )
-                        if whisper_transcript_result:
-                             logger.info(f"Transcript generation completed (skip_editing=True).")
-                             subtitle_source = "generated"
-                        else:
-                             logger.warning("Transcript generation (skip_editing=True) returned no data.")
-                     except Exception as e:
-                         logger.error(f"Transcript generation failed even with skip_editing=True: {e}", exc_info=True)
-                         # Don't raise here, just proceed without transcript if skip_editing
-                 elif subtitle_source == "uploaded":
-                      logger.info("Using uploaded subtitles, skipping transcript generation. Parsing for content.")
-                      # Need to parse the subtitle file to get content for Gemini later
-                      try:
-                          if subtitle_file_path.endswith(".srt"): parsed_subtitle_groups = parse_srt(subtitle_file_path)
-                          elif subtitle_file_path.endswith(".vtt"): parsed_subtitle_groups = parse_vtt(subtitle_file_path)
-                      except Exception as e:
-                           logger.error(f"Failed to parse existing subtitle file {subtitle_file_path} for content: {e}", exc_info=True)
-                 else:
-                      logger.info("Valid transcript seems to exist in DB, skipping generation.")
-                      # If we rely on DB transcript, we don't have parsed_subtitle_groups. Need to handle this later.
-
-                 # Ensure DB has the edited filename if the file exists
-                 if not video.edited_filename and os.path.exists(edited_video_path):
-                      video.edited_filename = edited_filename
-
-            else: # Needs editing (or re-editing)
-                 logger.info(f"Running full video processing (editing). Subtitle source hint: {subtitle_source}, Zoom: {zoom_factor}, Process Without Subs: {process_without_subs}")
-                 try:
-                     # Call process_video to edit and get transcript data
-                     edited_video_path_result, whisper_transcript_result, parsed_subtitle_groups = process_video(
-                         original_video_path,
-                         edited_filename,
-                         skip_editing=False, # We are editing now
-                         subtitle_file_path=subtitle_file_path, # Pass the path if determined
-                         zoom_factor=zoom_factor, # Pass the zoom factor
-                         process_without_subs=process_without_subs # Pass process_without_subs flag
-                     )
-                     # Update DB with the actual filename produced
-                     video.edited_filename = os.path.basename(edited_video_path_result)
-                     logger.info(f"Video editing completed. Result path: {edited_video_path_result}")
-                     # Update subtitle source based on what process_video actually used
-                     subtitle_source = "uploaded" if subtitle_file_path else "generated"
-
-                 except Exception as e:
-                     logger.error(f"Core video processing (createshorts.process_video) failed: {e}", exc_info=True)
-                     raise # Propagate error to set status to failed
+            # Still need subtitle content if not using uploaded subs and DB transcript is missing/invalid (or forced)
+            if subtitle_source != "uploaded" and (force_reprocess or not video.transcript or video.transcript.startswith("Transcription data") or video.transcript.startswith("Using uploaded")):
+                logger.info("Generating transcript (the video itself is rendered later).")
+                try:
+                    live_ingests.wait_for(original_video_path) # Resume from the audio and checkpoint transcribed while the upload arrived
+                    _, whisper_transcript_result, parsed_subtitle_groups = process_video(
+                        original_video_path, edited_filename, skip_editing=True, subtitle_file_path=None, zoom_factor=zoom_factor, process_without_subs=process_without_subs,
+                        whisper_transcript=load_video_transcript(video_id), # Reuse stored word timings if present
+                        progress_callback=progress_reporter
+                    )
+                    if whisper_transcript_result:
+                        logger.info("Transcript generation completed.")
+                        subtitle_source = "generated"
+                    else:
+                        logger.warning("Transcript generation returned no data.")
+                except Exception as e:
+                    logger.error(f"Transcript generation failed: {e}", exc_info=True)
+                    raise # Nothing to suggest from; mark the video failed
+            elif subtitle_source == "uploaded":
+                logger.info("Using uploaded subtitles, skipping transcript generation. Parsing for content.")
+                # Need to parse the subtitle file to get content for Gemini later
+                try:
+                    parsed_subtitle_groups = load_subtitle_groups(subtitle_file_path)
+                except Exception as e:
+                    logger.error(f"Failed to parse existing subtitle file {subtitle_file_path} for content: {e}", exc_info=True)
+            else:
+                logger.info("Valid transcript seems to exist in DB, skipping generation.")
+                # If we rely on DB transcript, we don't have parsed_subtitle_groups. Need to handle this later.
+
+            # Ensure DB has the edited filename if a (still valid) edited video exists
+            if not video.edited_filename and not renders_stale and os.path.exists(edited_video_path):
+                video.edited_filename = edited_filename
+                media_files.add(EDITED_VIDEOS_DIR, edited_filename)
 
             # --- Update DB with transcript/status ---
             # Update video title if not set
@@ -465,6 +696,7 @@ def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=F
 
             # Store transcript info based on source
             if subtitle_source == "generated" and whisper_transcript_result:
+                whisper_transcript_result = store_video_transcript(video_id, whisper_transcript_result)
                 formatted_transcript = format_transcript(whisper_transcript_result)
                 video.transcript = formatted_transcript # Store formatted Whisper output or error
                 if formatted_transcript.startswith("Transcription data"):
@@ -481,7 +713,7 @@ def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=F
             # Use parsed_subtitle_groups if available (from editing or parsing step)
             text_for_gemini = None
             if parsed_subtitle_groups:
-                text_for_gemini = get_text_from_segments(parsed_subtitle_groups)
+                text_for_gemini = get_timed_text_from_segments(parsed_subtitle_groups)
                 if not text_for_gemini:
                     logger.warning("Parsed subtitle groups yielded no text content for Gemini.")
             elif subtitle_source == "generated" and video.transcript and not video.transcript.startswith("Transcription data"):
@@ -556,6 +788,12 @@ def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=F
             session.commit()
             logger.info(f"Video {video_id} processing completed successfully.")
 
+            # Renders follow the suggestions: first the quick preview proxy, then (only if enabled) the full edited video
+            if not (video.proxy_filename and os.path.exists(os.path.join(PREVIEWS_DIR, video.proxy_filename))):
+                start_task(f"proxy_{video_id}", render_preview_proxy, (video_id,))
+            if render_edited:
+                start_task(f"edited_{video_id}", render_edited_video, (video_id,))
+
         except FileNotFoundError as e:
              logger.error(f"File not found error processing video {video_id}: {e}", exc_info=True)
              if video: video.status = 'failed'
@@ -568,6 +806,7 @@ def _process_video_core(video_id, force_reprocess=False, use_uploaded_subtitle=F
         finally:
             # Commit final status (completed or failed)
             if video and video.status in ['failed', 'completed']:
+                 video.progress = None
                  try:
                      session.commit()
                  except Exception as db_err:
@@ -593,8 +832,23 @@ def trigger_full_reprocessing(video_id, zoom_factor=2.0):
     # force_reprocess=True ensures it runs, use_uploaded_subtitle=False lets core check filename
     _process_video_core(video_id, force_reprocess=True, use_uploaded_subtitle=False, zoom_factor=zoom_factor)
 
+def prepare_video_audio(video_id):
+    """Decodes an uploaded video's soundtrack into the artifact cache so transcription doesn't wait on ffmpeg."""
+    with app.app_context():
+        video = db.session.get(Video, video_id)
+        video_filename = video.original_filename if video else None
+        db.session.close()
+    if not video_filename:
+        logger.error(f"Video {video_id} not found for audio preparation.")
+        return
+    video_path = os.path.join(VIDEOS_DIR, video_filename)
+    live_ingests.wait_for(video_path) # Audio decoded while the upload arrived lands in the cache
+    # The digest was registered when the upload completed, so the file isn't read again to find the cache key
+    load_audio_pcm(video_path, source_digest=artifact_cache.known_digest(video_path))
+    logger.info(f"Audio for video {video_id} is ready in the cache.")
+
 # --- Renamed Background Task Function ---
-def regenerate_suggestions(video_id):
+def regenerate_suggestions(video_id, force_fresh=False):
     """ Regenerates short suggestions based on current subtitle content. Runs in thread."""
     with app.app_context():
         video = None
@@ -618,22 +872,13 @@ def regenerate_suggestions(video_id):
 
             # If no valid transcript, try to generate with Whisper (skip_editing)
             if not text_for_gemini or not isinstance(text_for_gemini, str) or text_for_gemini.strip() == "" or text_for_gemini.startswith("Transcription data") or text_for_gemini.startswith("Using uploaded") or text_for_gemini.startswith("Subtitle processing failed"):
-                logger.info(f"No valid subtitle content found for video {video_id}. Attempting Whisper transcript generation for suggestions only.")
+                logger.info(f"No valid subtitle content found for video {video_id}. Loading (or generating) the word-level transcript for suggestions only.")
                 try:
-                    from createshorts import process_video
-                    original_video_path = os.path.join(VIDEOS_DIR, video.original_filename)
-                    edited_filename = f"{os.path.splitext(video.original_filename)[0]}_edited.mp4"
-                    _, whisper_transcript_result, _ = process_video(
-                        original_video_path,
-                        edited_filename,
-                        skip_editing=True,
-                        subtitle_file_path=None,
-                        zoom_factor=2.0,
-                        process_without_subs=True
-                    )
-                    if whisper_transcript_result:
+                    whisper_transcript_result = get_or_create_video_transcript(video, progress_callback=make_progress_reporter(video_id))
+                    if whisper_transcript_result is not None and len(whisper_transcript_result):
                         formatted_transcript = format_transcript(whisper_transcript_result)
                         video.transcript = formatted_transcript
+                        video.progress = None
                         session.commit()
                         text_for_gemini = formatted_transcript
                     else:
@@ -649,7 +894,7 @@ def regenerate_suggestions(video_id):
                 return
 
             # --- Get New Segments ---
-            response_text = get_suggested_segments(text_for_gemini)
+            response_text = get_suggested_segments(text_for_gemini, force_fresh=force_fresh)
             new_segments = parse_segments(response_text)
 
             # --- Clear Old Suggestions ---
@@ -715,7 +960,58 @@ def regenerate_suggestions(video_id):
 
 # Find the existing process_short function and replace it with this modified version
 # Add audio_filename and audio_volume parameters
-def process_short(video_id, short_id, audio_filename=None, audio_volume=None):
+def video_subtitle_groups(video):
+    """Subtitle groups burned into the video's shorts: the uploaded subtitle file if usable, else the Whisper transcript."""
+    if video.uploaded_subtitle_filename:
+        subtitle_path = os.path.join(SUBTITLES_DIR, video.uploaded_subtitle_filename)
+        if os.path.exists(subtitle_path):
+            groups = load_subtitle_groups(subtitle_path) # Cached by file content hash
+            if groups is not None:
+                return groups
+        logger.warning(f"Uploaded subtitle file {video.uploaded_subtitle_filename} not usable for video {video.id}. Using the transcript.")
+    transcript = load_video_transcript(video.id)
+    return group_words_with_timestamps(transcript) if transcript is not None else []
+
+def direct_short_source(video):
+    """
+    For videos without an edited video: returns (original_path, render_kwargs) so cut_segments_batch reframes
+    and subtitles each short straight from the original, with the zoom and subtitles the video was processed with.
+    """
+    original_path = os.path.join(VIDEOS_DIR, video.original_filename)
+    if not os.path.exists(original_path):
+        raise FileNotFoundError(f"Original video file not found: {original_path}")
+    subtitle_groups = [] if video.process_without_subs else video_subtitle_groups(video)
+    return original_path, {'zoom_factor': video.zoom_factor or 2.0, 'subtitle_groups': subtitle_groups}
+
+def short_output_filename(short):
+    """File name (in EDITED_SHORTS_DIR) a short is rendered to."""
+    safe_short_name = re.sub(r'[^\w\-]+', '_', short.short_name or 'short').strip('_').lower()[:50]
+    return f"{secure_filename(f'vid{short.video_id}_short{short.id}_{safe_short_name}')}.mp4"
+
+def resolve_background_audio(audio_filename, audio_volume):
+    """
+    Validates the background music options of a short render. Returns (music_path, music_volume, main_volume)
+    or None when no (usable) music was selected. audio_volume is the 0-100 UI percentage for the music.
+    """
+    if not audio_filename:
+        return None
+    audio_input_path = os.path.join(MUSIC_DIR, audio_filename)
+    if not os.path.exists(audio_input_path):
+        logger.warning(f"Background audio file specified ('{audio_filename}') but not found at {audio_input_path}. Proceeding without adding background audio.")
+        return None
+    try:
+        vol_percent = int(audio_volume)
+    except (ValueError, TypeError):
+        logger.warning(f"Could not parse background volume '{audio_volume}'. Ignoring background audio.")
+        return None
+    if not 0 <= vol_percent <= 100:
+        logger.warning(f"Invalid volume '{audio_volume}' provided for background. Must be 0-100. Ignoring background audio.")
+        return None
+    # The UI default is 5%; the user must set 25% or higher if they want YouTube to detect the music
+    logger.info(f"Will mix in background audio '{audio_filename}' with background volume multiplier {vol_percent / 100.0:.2f}. Main audio will be boosted by {SHORT_MAIN_AUDIO_BOOST:.1f}x.")
+    return audio_input_path, vol_percent / 100.0, SHORT_MAIN_AUDIO_BOOST
+
+def process_short(video_id, short_id, audio_filename=None, audio_volume=None, cut_mode=None):
     """Processes a single short segment, optionally mixing in background audio. Runs in thread."""
     with app.app_context(): # Ensure DB access within thread
         short = None
@@ -742,16 +1038,15 @@ def process_short(video_id, short_id, audio_filename=None, audio_volume=None):
 
             short.status = 'processing'
             session.commit()
-            logger.info(f"Starting short creation for short {short_id} (Video {video_id}). Audio File: {audio_filename}, Background Volume %: {audio_volume}")
+            logger.info(f"Starting short creation for short {short_id} (Video {video_id}). Audio File: {audio_filename}, Background Volume %: {audio_volume}, Cut Mode: {cut_mode or SHORT_CUT_MODE}")
 
             if video.status != 'completed':
                  raise ValueError(f"Cannot create short {short_id}, main video {video_id} status is '{video.status}'.")
-            if not video.edited_filename:
-                raise ValueError(f"Edited video filename not set for video {video_id}")
 
-            edited_video_path = os.path.join(EDITED_VIDEOS_DIR, video.edited_filename)
-            if not os.path.exists(edited_video_path):
-                raise FileNotFoundError(f"Edited video file not found: {edited_video_path}")
+            edited_video_path = os.path.join(EDITED_VIDEOS_DIR, video.edited_filename) if video.edited_filename else None
+            direct_source = None # (original_path, render_kwargs) when rendering from the original
+            if not edited_video_path or not os.path.exists(edited_video_path):
+                direct_source = direct_short_source(video)
 
             start_time_str = short.start_time
             end_time_str = short.end_time
@@ -769,117 +1064,73 @@ def process_short(video_id, short_id, audio_filename=None, audio_volume=None):
                 raise ValueError(f"Invalid duration ({duration_seconds}s) for short {short_id}")
 
             # --- Generate Filename ---
-            safe_short_name = re.sub(r'[^\w\-]+', '_', short.short_name or 'short').strip('_').lower()[:50]
-            safe_desc_text = short.short_description or f"segment_{start_time_str.replace(':','')}_{end_time_str.replace(':','')}"
-            safe_desc = re.sub(r'[^\w\-]+', '_', safe_desc_text).strip('_').lower()
-            max_desc_len = 30 # Limit length of description part further
-            safe_desc = safe_desc[:max_desc_len]
-            short_filename_base = f"vid{video_id}_short{short_id}_{safe_short_name}"
-            short_filename = f"{secure_filename(short_filename_base)}.mp4"
+            short_filename = short_output_filename(short)
             short_path = os.path.join(EDITED_SHORTS_DIR, short_filename)
 
             # --- Prepare Audio Processing ---
-            add_audio = False
-            audio_input_path = None
-            # Default background volume multiplier (e.g., 25% if parsing fails or none selected)
-            # Let's keep the user-selected value, but ensure it can reach 0.25 for YT.
-            # The UI default is 5%, which is 0.05. The user *must* set it to 25% or higher in the UI if they want YT detection.
-            ffmpeg_bg_volume_multiplier = 0.25 # Default *if parsing fails*. Actual value comes from UI.
-
-            # --- Hardcoded boost factor for main audio when background music is added ---
-            # Increase volume by 6dB (multiplier of 2.0). Adjust if needed.
-            MAIN_AUDIO_BOOST_FACTOR = 1.0
-            # ---------------------------------------------------------------------------
-
-            if audio_filename:
-                audio_input_path = os.path.join(MUSIC_DIR, audio_filename)
-                if os.path.exists(audio_input_path):
-                    try:
-                        vol_percent = int(audio_volume)
-                        if 0 <= vol_percent <= 100:
-                            # Convert 0-100% volume for BACKGROUND music to linear multiplier
-                            ffmpeg_bg_volume_multiplier = vol_percent / 100.0
-                            add_audio = True
-                            logger.info(f"Will mix in background audio '{audio_filename}' with background volume multiplier {ffmpeg_bg_volume_multiplier:.2f}. Main audio will be boosted by {MAIN_AUDIO_BOOST_FACTOR:.1f}x.")
-                        else:
-                            logger.warning(f"Invalid volume '{audio_volume}' provided for background. Must be 0-100. Ignoring background audio.")
-                    except (ValueError, TypeError):
-                        logger.warning(f"Could not parse background volume '{audio_volume}'. Ignoring background audio.")
-                else:
-                    logger.warning(f"Background audio file specified ('{audio_filename}') but not found at {audio_input_path}. Proceeding without adding background audio.")
-
-            # --- FFmpeg Command ---
-            ffmpeg_command = ["ffmpeg", "-loglevel", "warning", "-y"] # Base command, overwrite output
-
+            background_audio = resolve_background_audio(audio_filename, audio_volume)
+            add_audio = background_audio is not None
             if add_audio:
-                # Command for cutting video, looping background audio, adjusting its volume,
-                # BOOSTING original audio, and mixing them.
-                ffmpeg_command.extend([
-                    # Inputs
-                    "-i", edited_video_path,                # Input 0: Original Video (with its audio)
-                    "-stream_loop", "-1",                   # Loop Input 1 indefinitely
-                    "-i", audio_input_path,                 # Input 1: Background Music (looped)
-
-                    # Time selection applied to the *output*
-                    "-ss", str(start_seconds),              # Start time offset for OUTPUT
-                    "-t", str(duration_seconds),            # Duration for OUTPUT
-
-                    # Complex Filtergraph
-                    "-filter_complex",
-                        # Boost volume of original audio (Input 0's audio [0:a])
-                        f"[0:a]volume=volume={MAIN_AUDIO_BOOST_FACTOR:.2f}[main_boosted];"
-                        # Adjust volume of background music (Input 1's audio [1:a])
-                        f"[1:a]volume=volume={ffmpeg_bg_volume_multiplier:.2f}[bg_vol];"
-                        # Mix boosted original audio [main_boosted] with adjusted background audio [bg_vol]
-                        "[main_boosted][bg_vol]amix=inputs=2:duration=first:dropout_transition=3[a_mix]",
-
-                    # Mapping
-                    "-map", "0:v",                          # Map video from Input 0
-                    "-map", "[a_mix]",                      # Map the mixed audio output from the filtergraph
-
-                    # Codec Options (video) - Keep consistent quality
-                    "-c:v", "libx264", "-preset", "medium", "-crf", "22", "-profile:v", "high", "-level:v", "4.1",
-                    # Codec Options (audio - for the *mixed* output)
-                    "-c:a", "aac", "-b:a", "160k", # Slightly higher audio bitrate for mixed audio
-
-                    # Other Options
-                    "-avoid_negative_ts", "make_zero",      # Handle timestamp issues
-                    "-map_metadata", "-1",                  # Remove metadata
-                    "-movflags", "+faststart",              # Optimize for web
-                    short_path                              # Output file path
-                ])
-                logger.info(f"Running ffmpeg (re-encode with boosted main audio + mixed background) for short {short_id}") # Log command below
-                # logger.debug(f"FFmpeg command: {' '.join(ffmpeg_command)}") # Uncomment for detailed debugging
-
-            else:
-                # Original command for just cutting (re-encoding video and original audio) - NO BOOST HERE
-                ffmpeg_command.extend([
-                    "-i", edited_video_path,                # Input file
-                    "-ss", str(start_seconds),              # Start time (Output Seeking)
-                    "-t", str(duration_seconds),            # Duration of the clip
-                    "-map", "0:v",                          # Map video stream
-                    "-map", "0:a?",                         # Map audio stream IF IT EXISTS (?)
-                    # Video codec - Keep consistent quality
-                    "-c:v", "libx264", "-preset", "medium", "-crf", "22", "-profile:v", "high", "-level:v", "4.1",
-                    # Audio codec (re-encode original audio) - Keep consistent
-                    "-c:a", "aac", "-b:a", "160k",
-                    "-avoid_negative_ts", "make_zero",      # Handle potential timestamp issues
-                    "-map_metadata", "-1",                  # Remove metadata
-                    "-movflags", "+faststart",              # Optimize for web
-                    short_path                              # Output file path
-                ])
-                logger.info(f"Running ffmpeg (re-encode, only original audio, no boost) for short {short_id}") # Log command below
-                # logger.debug(f"FFmpeg command: {' '.join(ffmpeg_command)}") # Uncomment for detailed debugging
-
+                audio_input_path, ffmpeg_bg_volume_multiplier, MAIN_AUDIO_BOOST_FACTOR = background_audio
 
+            # --- FFmpeg Command ---
             # Execute FFmpeg
             # Add explicit error logging for stderr
             try:
                 # Set encoding explicitly for Windows compatibility if needed
                 process_encoding = 'utf-8' if os.name != 'nt' else 'cp437' # Or try 'cp850' if 437 fails on some systems
-                result = subprocess.run(ffmpeg_command, check=True, capture_output=True, text=True, encoding=process_encoding, errors='replace')
-                logger.debug(f"FFmpeg stdout for short {short_id}: {result.stdout}")
-                logger.debug(f"FFmpeg stderr for short {short_id}: {result.stderr}") # Log stderr even on success for info
+                if direct_source:
+                    # No edited video: reframe, burn in subtitles and cut in one encode from the original
+                    original_path, render_kwargs = direct_source
+                    logger.info(f"Rendering short {short_id} directly from the original {original_path}{' with background audio' if add_audio else ''}")
+                    clip = {'output_path': short_path, 'start': start_seconds, 'duration': duration_seconds}
+                    cut_segments_batch(original_path, [clip], background_audio, **render_kwargs)
+                elif add_audio:
+                    # Command for cutting video, looping background audio, adjusting its volume,
+                    # BOOSTING original audio, and mixing them. Audio is mixed so the clip is always re-encoded,
+                    # but seeking happens on the input side so ffmpeg doesn't decode everything before the start.
+                    ffmpeg_command = ["ffmpeg", "-loglevel", "warning", "-y"] # Base command, overwrite output
+                    ffmpeg_command.extend([
+                        # Inputs
+                        "-ss", str(start_seconds),              # Input seek on the edited video
+                        "-t", str(duration_seconds),            # Read only the clip duration from it
+                        "-i", edited_video_path,                # Input 0: Original Video (with its audio)
+                        "-stream_loop", "-1",                   # Loop Input 1 indefinitely
+                        "-i", audio_input_path,                 # Input 1: Background Music (looped)
+
+                        # Complex Filtergraph
+                        "-filter_complex",
+                            # Boost volume of original audio (Input 0's audio [0:a])
+                            f"[0:a]volume=volume={MAIN_AUDIO_BOOST_FACTOR:.2f}[main_boosted];"
+                            # Adjust volume of background music (Input 1's audio [1:a])
+                            f"[1:a]volume=volume={ffmpeg_bg_volume_multiplier:.2f}[bg_vol];"
+                            # Mix boosted original audio [main_boosted] with adjusted background audio [bg_vol]
+                            "[main_boosted][bg_vol]amix=inputs=2:duration=first:dropout_transition=3[a_mix]",
+
+                        # Mapping
+                        "-map", "0:v",                          # Map video from Input 0
+                        "-map", "[a_mix]",                      # Map the mixed audio output from the filtergraph
+                    ])
+                    # Codec Options - Keep consistent quality
+                    ffmpeg_command.extend(short_video_codec_args + short_audio_codec_args)
+                    ffmpeg_command.extend([
+                        # Other Options
+                        "-avoid_negative_ts", "make_zero",      # Handle timestamp issues
+                        "-map_metadata", "-1",                  # Remove metadata
+                        "-movflags", "+faststart",              # Optimize for web
+                        short_path                              # Output file path
+                    ])
+                    logger.info(f"Running ffmpeg (re-encode with boosted main audio + mixed background) for short {short_id}") # Log command below
+                    # logger.debug(f"FFmpeg command: {' '.join(ffmpeg_command)}") # Uncomment for detailed debugging
+                    result = subprocess.run(ffmpeg_command, check=True, capture_output=True, text=True, encoding=process_encoding, errors='replace')
+                    logger.debug(f"FFmpeg stdout for short {short_id}: {result.stdout}")
+                    logger.debug(f"FFmpeg stderr for short {short_id}: {result.stderr}") # Log stderr even on success for info
+                else:
+                    # Just cutting (original audio, no boost): the cutting engine seeks on the input side and,
+                    # in 'smart' mode, only re-encodes the GOP at the head of the cut
+                    effective_cut_mode = cut_mode if cut_mode in short_cut_modes else SHORT_CUT_MODE
+                    logger.info(f"Running ffmpeg cut (mode '{effective_cut_mode}', only original audio, no boost) for short {short_id}")
+                    cut_segment(edited_video_path, short_path, start_seconds, duration_seconds, mode=effective_cut_mode)
             except subprocess.CalledProcessError as e:
                  # Log detailed error if check=True fails
                  logger.error(f"FFmpeg failed for short {short_id} (Return Code: {e.returncode}).")
@@ -894,9 +1145,8 @@ def process_short(video_id, short_id, audio_filename=None, audio_volume=None):
                 raise
 
             # --- Validation ---
-            min_expected_size_kb = 10 # Example: Expect at least 10KB
             final_size = os.path.getsize(short_path) if os.path.exists(short_path) else 0
-            if not os.path.exists(short_path) or final_size < (min_expected_size_kb * 1024):
+            if not os.path.exists(short_path) or final_size < SHORT_MIN_OUTPUT_BYTES:
                 error_details = result.stderr if 'result' in locals() and result and result.stderr else "Unknown FFmpeg error or empty/tiny output."
                 logger.error(f"FFmpeg command finished but output file '{short_path}' is missing or too small ({final_size} bytes).")
                 raise RuntimeError(f"FFmpeg produced invalid output file: {short_path}. FFmpeg stderr: {error_details}")
@@ -905,6 +1155,7 @@ def process_short(video_id, short_id, audio_filename=None, audio_volume=None):
             # --- Success ---
             short.short_filename = short_filename
             short.status = 'completed'
+            media_files.add(EDITED_SHORTS_DIR, short_filename)
             session.commit()
             logger.info(f"Short {short_id} created successfully {'with mixed audio' if add_audio else ''}: {short_filename}")
 
@@ -941,51 +1192,303 @@ def process_short(video_id, short_id, audio_filename=None, audio_volume=None):
                     session.rollback()
             session.close() # Close session
 
-def time_to_seconds(time_str):
-    """Converts HH:MM:SS or H:MM:SS string to seconds."""
-    # Regex allows for H, HH, or HHH hours, but max practical is usually < 100
-    if not time_str or not re.match(r'^\d{1,3}:\d{2}:\d{2}$', time_str):
-        raise ValueError(f"Invalid time format: '{time_str}'. Expected H:MM:SS or HH:MM:SS.")
-    try:
-        parts = list(map(int, time_str.split(':')))
-        if len(parts) != 3:
-             raise ValueError("Time string must have 3 parts separated by colons.")
-        h, m, s = parts
-        # Add reasonable limits (e.g., 999 hours max?)
-        if not (0 <= h < 1000 and 0 <= m < 60 and 0 <= s < 60):
-             raise ValueError(f"Time components out of range (0-999h, 0-59m, 0-59s): {h}:{m}:{s}")
-        return h * 3600 + m * 60 + s
-    except ValueError as e: # Catch split errors, int conversion errors, or range errors
-        # Re-raise with a more informative message
-        raise ValueError(f"Could not parse time string '{time_str}': {e}")
+def _record_short_render(session, clip, error=None):
+    """Marks a short of a batch render completed (if its output looks valid) or failed, and commits."""
+    short, short_path = clip['short'], clip['output_path']
+    final_size = os.path.getsize(short_path) if os.path.exists(short_path) else 0
+    if error is None and final_size >= SHORT_MIN_OUTPUT_BYTES:
+        short.short_filename = os.path.basename(short_path)
+        short.status = 'completed'
+        media_files.add(EDITED_SHORTS_DIR, short.short_filename)
+        session.commit()
+        logger.info(f"Short {short.id} created successfully: {short.short_filename}")
+        return
+    logger.error(f"Short {short.id} failed: {error or f'output missing or too small ({final_size} bytes)'}")
+    short.status = 'failed'
+    short.short_filename = None
+    if os.path.exists(short_path):
+        try: os.remove(short_path)
+        except OSError: logger.warning(f"Could not delete potentially corrupted short file: {short_path}")
+    session.commit()
+
+def process_shorts_batch(video_id, short_ids, audio_filename=None, audio_volume=None, cut_mode=None):
+    """
+    Renders several shorts of one video in one job, with the same options as process_short.
+
+    Shorts that need a full re-encode (background music, 'reencode' mode, or no edited video so they are reframed
+    from the original) are cut in time-sorted batches, one
+    ffmpeg run per batch (cut_segments_batch), so the edited video is decoded once per batch instead of once per
+    short. 'smart' and 'copy' cuts hardly decode anything and run one after another. Each short gets its own
+    status; if a batch fails, its shorts are retried one by one so a bad clip can't fail the others.
+    """
+    with app.app_context():
+        session = db.session
+        clips = []
+        try:
+            video = session.get(Video, video_id)
+            if not video:
+                logger.error(f"Video {video_id} not found for batch short render.")
+                return
+            shorts = ShortSegment.query.filter(ShortSegment.id.in_(short_ids), ShortSegment.video_id == video_id).all()
+            edited_video_path = os.path.join(EDITED_VIDEOS_DIR, video.edited_filename) if video.edited_filename else None
+            render_kwargs = {}
+            try:
+                if video.status != 'completed':
+                    raise ValueError(f"video status is '{video.status}'")
+                if not edited_video_path or not os.path.exists(edited_video_path):
+                    edited_video_path, render_kwargs = direct_short_source(video) # Render from the original
+            except (ValueError, FileNotFoundError) as e:
+                logger.error(f"Cannot render shorts for video {video_id}: {e}")
+                for short in shorts:
+                    if short.status in ['queued', 'processing']:
+                        short.status = 'failed'
+                session.commit()
+                return
+
+            for short in shorts:
+                if short.status not in ['pending', 'queued', 'failed']:
+                    logger.warning(f"Short {short.id} has status '{short.status}', skipping it in the batch.")
+                    continue
+                try:
+                    start_seconds = time_to_seconds(short.start_time)
+                    end_seconds = time_to_seconds(short.end_time)
+                    if start_seconds >= end_seconds:
+                        raise ValueError(f"start={short.start_time} >= end={short.end_time}")
+                except ValueError as e:
+                    logger.error(f"Invalid time range for short {short.id}: {e}")
+                    short.status = 'failed'
+                    continue
+                short.status = 'processing'
+                clips.append({
+                    'short': short,
+                    'output_path': os.path.join(EDITED_SHORTS_DIR, short_output_filename(short)),
+                    'start': start_seconds,
+                    'duration': end_seconds - start_seconds,
+                })
+            session.commit()
+
+            background_audio = resolve_background_audio(audio_filename, audio_volume)
+            effective_cut_mode = cut_mode if cut_mode in short_cut_modes else SHORT_CUT_MODE
+            one_pass = background_audio is not None or effective_cut_mode == 'reencode' or bool(render_kwargs)
+            logger.info(f"Rendering {len(clips)} shorts for video {video_id} ({'batched re-encode' if one_pass else f'{effective_cut_mode} cuts'}{', with background audio' if background_audio else ''})")
 
+            def render_alone(clip):
+                try:
+                    if one_pass:
+                        cut_segments_batch(edited_video_path, [clip], background_audio, **render_kwargs)
+                    else:
+                        cut_segment(edited_video_path, clip['output_path'], clip['start'], clip['duration'], mode=effective_cut_mode)
+                    _record_short_render(session, clip)
+                except (subprocess.CalledProcessError, OSError, ValueError) as e:
+                    _record_short_render(session, clip, error=e)
+
+            if not one_pass:
+                for clip in clips:
+                    render_alone(clip)
+                return
+            for batch in plan_cut_batches(clips):
+                try:
+                    cut_segments_batch(edited_video_path, batch, background_audio, **render_kwargs)
+                except (subprocess.CalledProcessError, OSError, ValueError) as e:
+                    logger.warning(f"Batch of {len(batch)} shorts for video {video_id} failed, rendering them one by one: {e}")
+                    for clip in batch:
+                        render_alone(clip)
+                    continue
+                for clip in batch:
+                    if os.path.exists(clip['output_path']) and os.path.getsize(clip['output_path']) >= SHORT_MIN_OUTPUT_BYTES:
+                        _record_short_render(session, clip)
+                    else:
+                        render_alone(clip)
+        except Exception as e: # Last resort: don't leave shorts stuck in 'processing'
+            logger.error(f"Batch short render for video {video_id} failed: {e}", exc_info=True)
+            session.rollback()
+            for clip in clips:
+                if clip['short'].status == 'processing':
+                    clip['short'].status = 'failed'
+            try:
+                session.commit()
+            except Exception as db_err:
+                logger.error(f"Failed to commit 'failed' statuses for batch of video {video_id}: {db_err}")
+                session.rollback()
+        finally:
+            session.close()
 
-# --- Thread Management ---
-active_tasks = {}
+# --- Job Queue ---
+# Max jobs running at once per class. CPU-heavy classes are kept low so encodes don't fight over cores;
+# I/O-bound Gemini calls can overlap more.
+JOB_CLASS_LIMITS = {
+    'whisper': 1, # Transcription-only jobs
+    'render': 1,  # Full video processing (transcription + MoviePy render)
+    'cut': 2,     # ffmpeg short cuts
+    'gemini': 4,  # Suggestion regeneration
+    'ingest': 1,  # Early audio decode of freshly uploaded videos
+}
+JOB_POLL_INTERVAL_SECONDS = 5 # Workers also wake up immediately when a job is enqueued
+JOB_HISTORY_DAYS = 7 # Finished job rows older than this are pruned at startup
+
+active_tasks = {} # task_key -> Job.id for jobs queued or running in this process (mirror of the Job table)
 task_lock = threading.Lock()
 
-def start_task(task_key, target_func, args_tuple=None, kwargs_dict=None):
-    """Starts a background task if not already running, supports args and kwargs."""
+class JobScheduler:
+    """Runs persisted Job rows on a bounded set of worker threads, one group per job class."""
+
+    def __init__(self, class_limits):
+        self.class_limits = dict(class_limits)
+        self._wakeup = threading.Condition()
+        self._started = False
+        self._start_lock = threading.Lock()
+
+    def start(self):
+        """Recovers interrupted jobs and starts the workers (idempotent)."""
+        with self._start_lock:
+            if self._started:
+                return
+            self._started = True
+            self._recover_jobs()
+            for job_class, limit in self.class_limits.items():
+                for i in range(max(1, int(limit))):
+                    worker = threading.Thread(target=self._worker_loop, args=(job_class,), name=f"job-{job_class}-{i}", daemon=True)
+                    worker.start()
+            logger.info(f"Job scheduler started with limits {self.class_limits}")
+
+    def notify(self):
+        with self._wakeup:
+            self._wakeup.notify_all()
+
+    def _recover_jobs(self):
+        """Re-queues jobs that were running when the process died and prunes old finished jobs."""
+        with app.app_context():
+            session = db.session
+            try:
+                interrupted = Job.query.filter_by(status='running').all()
+                for job in interrupted:
+                    logger.warning(f"Re-queuing interrupted job {job.id} ({job.task_key}, {job.func_name}).")
+                    job.status = 'queued'
+                    job.started_at = None
+                    # Put the entity back into a state its task function will accept again
+                    kind, _, entity_id = job.task_key.rpartition('_') if job.task_key.startswith('shorts_batch_') else job.task_key.partition('_')
+                    if kind == 'shorts_batch' and entity_id.isdigit():
+                        # args are (video_id, short_ids); only this batch's shorts were in flight
+                        args = json.loads(job.args_json or '[]')
+                        short_ids = args[1] if len(args) > 1 else []
+                        for short in ShortSegment.query.filter(ShortSegment.video_id == int(entity_id), ShortSegment.id.in_(short_ids), ShortSegment.status == 'processing'):
+                            short.status = 'queued'
+                    elif kind == 'video' and entity_id.isdigit():
+                        video = session.get(Video, int(entity_id))
+                        if video and video.status == 'processing': video.status = 'pending'
+                    elif kind == 'short' and entity_id.isdigit():
+                        short = session.get(ShortSegment, int(entity_id))
+                        if short and short.status == 'processing': short.status = 'queued'
+                cutoff = datetime.utcnow() - timedelta(days=JOB_HISTORY_DAYS)
+                Job.query.filter(Job.status.in_(['completed', 'failed']), Job.finished_at < cutoff).delete(synchronize_session=False)
+                session.commit()
+                with task_lock:
+                    for job in Job.query.filter_by(status='queued').all():
+                        active_tasks[job.task_key] = job.id
+            except Exception as e:
+                logger.error(f"Failed to recover job queue: {e}", exc_info=True)
+                session.rollback()
+            finally:
+                session.close()
+
+    def _claim_next(self, job_class):
+        """Atomically moves the highest-priority queued job of this class to 'running' and returns its data."""
+        with app.app_context():
+            session = db.session
+            try:
+                candidate = Job.query.filter_by(status='queued', job_class=job_class) \
+                    .order_by(Job.priority.desc(), Job.id.asc()).first()
+                if not candidate:
+                    return None
+                claimed = Job.query.filter_by(id=candidate.id, status='queued') \
+                    .update({'status': 'running', 'started_at': datetime.utcnow()}, synchronize_session=False)
+                session.commit()
+                if claimed != 1:
+                    return None # Another worker got it first
+                return candidate.id, candidate.task_key, candidate.func_name, json.loads(candidate.args_json or '[]'), json.loads(candidate.kwargs_json or '{}')
+            except Exception as e:
+                logger.error(f"Failed to claim job for class {job_class}: {e}", exc_info=True)
+                session.rollback()
+                return None
+            finally:
+                session.close()
+
+    def _finish(self, job_id, task_key, status, error=None):
+        with app.app_context():
+            session = db.session
+            try:
+                job = session.get(Job, job_id)
+                if job:
+                    job.status = status
+                    job.error = error
+                    job.finished_at = datetime.utcnow()
+                    session.commit()
+            except Exception as e:
+                logger.error(f"Failed to record final status '{status}' for job {job_id}: {e}")
+                session.rollback()
+            finally:
+                session.close()
+        with task_lock:
+            if active_tasks.get(task_key) == job_id:
+                del active_tasks[task_key]
+
+    def _worker_loop(self, job_class):
+        while True:
+            claimed = self._claim_next(job_class)
+            if not claimed:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=JOB_POLL_INTERVAL_SECONDS)
+                continue
+            job_id, task_key, func_name, args, kwargs = claimed
+            target_func = TASK_FUNCTIONS.get(func_name)
+            if not target_func:
+                logger.error(f"Job {job_id} references unknown task function '{func_name}'.")
+                self._finish(job_id, task_key, 'failed', f"Unknown task function '{func_name}'")
+                continue
+            logger.info(f"Running job {job_id} ({task_key}: {func_name}) on {threading.current_thread().name}")
+            try:
+                target_func(*args, **kwargs)
+                self._finish(job_id, task_key, 'completed')
+            except Exception as e: # Task functions handle their own errors; this is a last resort
+                logger.error(f"Job {job_id} ({task_key}) raised: {e}", exc_info=True)
+                self._finish(job_id, task_key, 'failed', str(e))
+
+job_scheduler = JobScheduler(JOB_CLASS_LIMITS)
+
+def start_task(task_key, target_func, args_tuple=None, kwargs_dict=None, job_class=None, priority=None):
+    """Queues a background task unless one with the same key is already queued or running. Supports args and kwargs."""
+    job_scheduler.start()
+    default_class, default_priority = TASK_DEFAULTS.get(target_func.__name__, ('render', 0))
+    job_class = job_class or default_class
+    priority = default_priority if priority is None else priority
+
+    # Ensure args_tuple and kwargs_dict are initialized if None
+    args_tuple = args_tuple if args_tuple is not None else ()
+    kwargs_dict = kwargs_dict if kwargs_dict is not None else {}
+
     with task_lock:
-        if task_key in active_tasks and active_tasks[task_key].is_alive():
-            logger.warning(f"Task {task_key} is already running. Skipping new request.")
+        existing = Job.query.filter(Job.task_key == task_key, Job.status.in_(['queued', 'running'])).first()
+        if existing:
+            logger.warning(f"Task {task_key} is already {existing.status} (job {existing.id}). Skipping new request.")
+            active_tasks[task_key] = existing.id
             return False # Indicate task was not started
 
-        # Basic cleanup of completed threads
-        finished_tasks = [k for k, t in active_tasks.items() if not t.is_alive()]
-        for k in finished_tasks:
-            del active_tasks[k]
-            logger.debug(f"Cleaned up finished task: {k}")
-
-        # Ensure args_tuple and kwargs_dict are initialized if None
-        args_tuple = args_tuple if args_tuple is not None else ()
-        kwargs_dict = kwargs_dict if kwargs_dict is not None else {}
-
-        logger.info(f"Starting background task: {task_key} for function {target_func.__name__} with args {args_tuple} and kwargs {kwargs_dict}")
-        thread = threading.Thread(target=target_func, args=args_tuple, kwargs=kwargs_dict, name=task_key)
-        active_tasks[task_key] = thread
-        thread.start()
-        return True # Indicate task started
+        logger.info(f"Queuing background task: {task_key} for function {target_func.__name__} (class {job_class}, priority {priority}) with args {args_tuple} and kwargs {kwargs_dict}")
+        job = Job(
+            task_key=task_key,
+            func_name=target_func.__name__,
+            job_class=job_class,
+            priority=priority,
+            args_json=json.dumps(list(args_tuple)),
+            kwargs_json=json.dumps(kwargs_dict),
+            status='queued'
+        )
+        db.session.add(job)
+        db.session.commit()
+        active_tasks[task_key] = job.id
+    job_scheduler.notify()
+    return True # Indicate task was queued
+
 def process_uploaded_video_with_subtitle(video_id, zoom_factor=2.0):
     """Handles initial processing when subtitle WAS provided during upload."""
     logger.info(f"Queuing initial processing (with subs hint) for video {video_id} using zoom {zoom_factor}.")
@@ -993,53 +1496,132 @@ def process_uploaded_video_with_subtitle(video_id, zoom_factor=2.0):
     # and video editing happens (as opposed to just transcription/parsing)
     _process_video_core(video_id, force_reprocess=True, use_uploaded_subtitle=True, zoom_factor=zoom_factor)
 
-# --- Endpoints ---
+def render_preview_proxy(video_id):
+    """
+    Renders the 360x640 preview proxy: the framing and subtitles shorts get, encoded ultrafast, so the video
+    and its suggestions can be previewed in the browser long before (or without) a full-quality render.
+    """
+    with app.app_context():
+        session = db.session
+        try:
+            video = session.get(Video, video_id)
+            if not video or video.status != 'completed':
+                logger.warning(f"Not rendering preview proxy for video {video_id}: {'not found' if not video else 'status ' + video.status}.")
+                return
+            source_path, render_kwargs = direct_short_source(video)
+            proxy_filename = f"{os.path.splitext(video.original_filename)[0]}_proxy.mp4"
+            proxy_path = os.path.join(PREVIEWS_DIR, proxy_filename)
+            render_video_ffmpeg(source_path, proxy_path, render_kwargs['subtitle_groups'], zoom_factor=render_kwargs['zoom_factor'], proxy=True)
+            video.proxy_filename = proxy_filename
+            media_files.add(PREVIEWS_DIR, proxy_filename)
+            session.commit()
+            logger.info(f"Preview proxy for video {video_id} rendered: {proxy_path}")
+        except Exception as e:
+            logger.error(f"Rendering preview proxy for video {video_id} failed: {e}", exc_info=True)
+            session.rollback()
+        finally:
+            session.close()
 
-@app.route('/upload', methods=['POST'])
-def upload_video_endpoint(): # Renamed endpoint function
-    if 'video' not in request.files:
-        return jsonify({'error': 'No video file provided'}), 400
-    video_file = request.files['video']
-    subtitle_file = request.files.get('subtitle') # Use .get for optional file
-    zoom_factor_str = request.form.get('zoom_factor', default='2.0') # Get zoom factor as string
-    process_without_subs = request.form.get('process_without_subs', 'false').lower() == 'true'
+def render_edited_video(video_id):
+    """
+    Renders the full-length edited video on request (it is skipped during processing unless
+    RENDER_FULL_EDITED_VIDEO is set), with the zoom and subtitles the video was processed with.
+    """
+    with app.app_context():
+        session = db.session
+        try:
+            video = session.get(Video, video_id)
+            if not video or video.status != 'completed':
+                logger.warning(f"Not rendering edited video for video {video_id}: {'not found' if not video else 'status ' + video.status}.")
+                return
+            original_video_path = os.path.join(VIDEOS_DIR, video.original_filename)
+            edited_filename = f"{os.path.splitext(video.original_filename)[0]}_edited.mp4"
+            subtitle_file_path = None
+            if video.uploaded_subtitle_filename and os.path.exists(os.path.join(SUBTITLES_DIR, video.uploaded_subtitle_filename)):
+                subtitle_file_path = os.path.join(SUBTITLES_DIR, video.uploaded_subtitle_filename)
+            logger.info(f"Rendering full edited video for video {video_id} (Zoom: {video.zoom_factor or 2.0}, Without Subs: {video.process_without_subs})")
+            edited_video_path, _, _ = process_video(
+                original_video_path, edited_filename, skip_editing=False, subtitle_file_path=subtitle_file_path,
+                zoom_factor=video.zoom_factor or 2.0, process_without_subs=video.process_without_subs,
+                whisper_transcript=None if subtitle_file_path else load_video_transcript(video_id), # Reuses the stored transcript
+            )
+            video.edited_filename = os.path.basename(edited_video_path)
+            media_files.add(EDITED_VIDEOS_DIR, video.edited_filename)
+            session.commit()
+            logger.info(f"Edited video for video {video_id} rendered: {edited_video_path}")
+        except Exception as e:
+            logger.error(f"Rendering edited video for video {video_id} failed: {e}", exc_info=True)
+            session.rollback()
+        finally:
+            session.close()
+
+# Functions that can be run as jobs, looked up by name when a persisted job is picked up
+TASK_FUNCTIONS = {func.__name__: func for func in [
+    process_uploaded_video,
+    process_uploaded_video_with_subtitle,
+    reprocess_video_with_subtitle,
+    trigger_full_reprocessing,
+    regenerate_suggestions,
+    process_short,
+    process_shorts_batch,
+    prepare_video_audio,
+    render_edited_video,
+    render_preview_proxy,
+]}
+# Default (job_class, priority) per task function; start_task can override both
+TASK_DEFAULTS = {
+    'process_uploaded_video': ('render', 0),
+    'process_uploaded_video_with_subtitle': ('render', 0),
+    'reprocess_video_with_subtitle': ('render', 0),
+    'trigger_full_reprocessing': ('render', 0),
+    'regenerate_suggestions': ('gemini', 10),
+    'process_short': ('cut', 20), # User is usually waiting on a short, so cut before long renders
+    'process_shorts_batch': ('cut', 20),
+    'prepare_video_audio': ('ingest', 0),
+    'render_edited_video': ('render', 0),
+    'render_preview_proxy': ('render', 10), # Small and fast; ahead of full-quality renders
+}
+
+@app.before_request
+def ensure_job_scheduler_started():
+    # Workers only start in the process that serves requests (not in the reloader's parent process)
+    job_scheduler.start()
+
+# --- Endpoints ---
 
-    # Try converting zoom factor, use default on failure
+def parse_zoom_factor(value):
+    """Parses a zoom factor form value, falling back to 2.0 when it's missing or invalid."""
     try:
-        zoom_factor = float(zoom_factor_str)
+        zoom_factor = float(value)
         if zoom_factor < 1.0:
-            logger.warning(f"Invalid zoom factor '{zoom_factor_str}' (must be >= 1.0). Using default 2.0.")
+            logger.warning(f"Invalid zoom factor '{value}' (must be >= 1.0). Using default 2.0.")
             zoom_factor = 2.0
     except (ValueError, TypeError):
-        logger.warning(f"Invalid zoom factor value '{zoom_factor_str}'. Using default 2.0.")
+        logger.warning(f"Invalid zoom factor value '{value}'. Using default 2.0.")
         zoom_factor = 2.0
+    return zoom_factor
 
-    if not video_file or video_file.filename == '':
-        return jsonify({'error': 'No selected video file or empty filename'}), 400
-
-    video_filename = secure_filename(video_file.filename)
-    video_path = os.path.join(VIDEOS_DIR, video_filename)
+def register_uploaded_video(video_filename, zoom_factor, process_without_subs, subtitle_file=None):
+    """
+    Creates (or resets) the Video record for a video file already saved in VIDEOS_DIR, stores the optional
+    subtitle file and queues processing. Returns the JSON response body. Raises on failure; the caller rolls back.
+    """
+    session = db.session # Use scoped session
     subtitle_saved_filename = None
+    subtitle_save_path = None
     start_processing_func = process_uploaded_video # Default function (auto-detect subs)
-    session = db.session # Use scoped session
 
     try:
-        logger.info(f"Upload requested for {video_filename} with zoom factor: {zoom_factor}")
-
-        # --- 1. Save Video File ---
-        # Ensure filename uniqueness? Or just overwrite? Overwriting for now.
-        video_path = os.path.join(VIDEOS_DIR, video_filename) # Path for saving
-        video_file.save(video_path)
-        logger.info(f"Video saved to {video_path}")
-
-        # --- 2. Create/Update Video DB Record ---
+        # --- Create/Update Video DB Record ---
         video = Video.query.filter_by(original_filename=video_filename).first()
         if video:
             logger.warning(f"Video {video_filename} exists (ID: {video.id}). Resetting status and potentially clearing old data.")
             # Reset status and clear fields that will be repopulated
             video.status = 'pending'
             video.edited_filename = None
+            video.proxy_filename = None
             video.transcript = None # Clear old transcript/indicator
+            delete_video_transcript(video.id) # New upload may have different content
             # Clean up associated files before potentially saving new ones
             if video.uploaded_subtitle_filename:
                 old_sub = os.path.join(SUBTITLES_DIR, video.uploaded_subtitle_filename)
@@ -1069,7 +1651,7 @@ def upload_video_endpoint(): # Renamed endpoint function
         video_id = video.id
         logger.info(f"Video record ready with ID {video_id}")
 
-        # --- 3. Handle Optional Subtitle File ---
+        # --- Handle Optional Subtitle File ---
         if not process_without_subs and subtitle_file and subtitle_file.filename != '':
             allowed_extensions = {'.srt', '.vtt'}
             sub_filename = secure_filename(subtitle_file.filename)
@@ -1096,32 +1678,149 @@ def upload_video_endpoint(): # Renamed endpoint function
                 # Set processing function to *hint* using subtitles
                 start_processing_func = process_uploaded_video_with_subtitle
 
-        # --- 4. Start Background Processing ---
+        # --- Start Background Processing ---
         task_key = f"video_{video_id}"
         # Pass the validated or default zoom factor to the task
         if process_without_subs:
             start_task(task_key, process_uploaded_video, (video_id, zoom_factor), {'process_without_subs': True})
         else:
             start_task(task_key, start_processing_func, (video_id, zoom_factor))
+    except Exception:
+        if subtitle_save_path and os.path.exists(subtitle_save_path):
+            try: os.remove(subtitle_save_path)
+            except OSError: logger.warning(f"Could not remove subtitle {subtitle_save_path} after error.")
+        raise
+
+    return {
+        'video_id': video_id,
+        'message': f'Upload successful. Processing {"with subtitle" if subtitle_saved_filename else "(auto-detecting subs)"} started (Zoom: {zoom_factor}).'
+    }
+
+@app.route('/upload', methods=['POST'])
+def upload_video_endpoint(): # Renamed endpoint function
+    if 'video' not in request.files:
+        return jsonify({'error': 'No video file provided'}), 400
+    video_file = request.files['video']
+    subtitle_file = request.files.get('subtitle') # Use .get for optional file
+    zoom_factor = parse_zoom_factor(request.form.get('zoom_factor', default='2.0'))
+    process_without_subs = request.form.get('process_without_subs', 'false').lower() == 'true'
 
-        return jsonify({
-            'video_id': video_id,
-            'message': f'Upload successful. Processing {"with subtitle" if subtitle_saved_filename else "(auto-detecting subs)"} started (Zoom: {zoom_factor}).'
-            }), 202
+    if not video_file or video_file.filename == '':
+        return jsonify({'error': 'No selected video file or empty filename'}), 400
+
+    video_filename = secure_filename(video_file.filename)
+    video_path = os.path.join(VIDEOS_DIR, video_filename)
+    session = db.session # Use scoped session
+
+    try:
+        logger.info(f"Upload requested for {video_filename} with zoom factor: {zoom_factor}")
+
+        # --- 1. Save Video File ---
+        # Ensure filename uniqueness? Or just overwrite? Overwriting for now.
+        video_file.save(video_path)
+        media_files.discard(VIDEOS_DIR, video_filename) # A same-named earlier upload's fingerprint no longer applies
+        logger.info(f"Video saved to {video_path}")
+
+        # --- 2-4. Create/Update record, store subtitle, start processing ---
+        return jsonify(register_uploaded_video(video_filename, zoom_factor, process_without_subs, subtitle_file)), 202
 
     except Exception as e:
-        if 'session' in locals(): session.rollback() # Rollback DB changes on any error
+        session.rollback() # Rollback DB changes on any error
         logger.error(f"Error during video upload process for {video_filename}: {e}", exc_info=True)
         # Clean up potentially saved files if process failed significantly
         if os.path.exists(video_path):
             try: os.remove(video_path)
             except OSError: logger.warning(f"Could not remove video {video_path} after error.")
-        if 'subtitle_save_path' in locals() and os.path.exists(subtitle_save_path):
-            try: os.remove(subtitle_save_path)
-            except OSError: logger.warning(f"Could not remove subtitle {subtitle_save_path} after error.")
         return jsonify({'error': f'Server error during upload: {e}'}), 500
     finally:
-         if 'session' in locals(): session.close()
+        session.close()
+
+# --- Resumable chunked uploads ---
+# POST /uploads starts an upload, PUT /uploads/<id>?offset=N appends the raw request body, GET reports how many
+# bytes arrived (to resume after a dropped connection), and POST /uploads/<id>/finalize turns it into a video.
+# Large uploads are also decoded and transcribed while they arrive (see live_ingest.py).
+chunked_uploads = ChunkedUploadStore(VIDEOS_DIR, on_progress=live_ingests.data_received, on_discard=live_ingests.cancel)
+
+def upload_error_response(e):
+    return jsonify({'error': str(e), **e.details}), e.status
+
+@app.route('/uploads', methods=['POST'])
+def create_chunked_upload():
+    data = request.get_json(silent=True) or {}
+    video_filename = secure_filename(str(data.get('filename') or ''))
+    if not video_filename:
+        return jsonify({'error': 'A filename is required'}), 400
+    try:
+        size = int(data.get('size'))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'The file size in bytes is required'}), 400
+
+    options = {
+        'zoom_factor': parse_zoom_factor(data.get('zoom_factor', 2.0)),
+        'process_without_subs': str(data.get('process_without_subs', 'false')).lower() == 'true',
+    }
+    try:
+        upload = chunked_uploads.create(video_filename, size, options)
+    except UploadError as e:
+        return upload_error_response(e)
+    live_ingests.start(upload['upload_id'], chunked_uploads.part_path(upload['upload_id']), size)
+    return jsonify({**upload, 'chunk_size': upload_chunk_size}), 201
+
+@app.route('/uploads/<upload_id>', methods=['GET'])
+def get_chunked_upload(upload_id):
+    try:
+        return jsonify(chunked_uploads.status(upload_id))
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route('/uploads/<upload_id>', methods=['PUT'])
+def put_upload_chunk(upload_id):
+    offset = request.args.get('offset', type=int)
+    if offset is None:
+        return jsonify({'error': 'The offset query parameter is required'}), 400
+    try:
+        return jsonify(chunked_uploads.write_chunk(upload_id, offset, request.stream))
+    except UploadError as e:
+        return upload_error_response(e)
+
+@app.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_chunked_upload(upload_id):
+    try:
+        chunked_uploads.abort(upload_id)
+    except UploadError as e:
+        return upload_error_response(e)
+    return jsonify({'message': 'Upload aborted'})
+
+@app.route('/uploads/<upload_id>/finalize', methods=['POST'])
+def finalize_chunked_upload(upload_id):
+    subtitle_file = request.files.get('subtitle') # Small enough to send as a normal multipart field
+    try:
+        upload = chunked_uploads.status(upload_id)
+        options = chunked_uploads.options(upload_id)
+        video_filename = upload['filename']
+        video_path = os.path.join(VIDEOS_DIR, video_filename)
+        digest = chunked_uploads.complete(upload_id, video_path)
+    except UploadError as e:
+        return upload_error_response(e)
+    artifact_cache.register_digest(video_path, digest) # Hashed while streaming; the cache never re-reads the file
+    media_files.discard(VIDEOS_DIR, video_filename) # Replaced any same-named earlier upload; re-fingerprinted from the digest
+    live_ingests.upload_completed(upload_id, video_path, digest)
+
+    session = db.session
+    try:
+        result = register_uploaded_video(video_filename, options['zoom_factor'], options['process_without_subs'], subtitle_file)
+        # Decode the soundtrack now rather than when a render worker frees up (or collect the live ingest's decode)
+        start_task(f"audio_{result['video_id']}", prepare_video_audio, (result['video_id'],))
+        return jsonify(result), 202
+    except Exception as e:
+        session.rollback()
+        logger.error(f"Error finalizing upload {upload_id} ({video_filename}): {e}", exc_info=True)
+        if os.path.exists(video_path):
+            try: os.remove(video_path)
+            except OSError: logger.warning(f"Could not remove video {video_path} after error.")
+        return jsonify({'error': f'Server error during upload: {e}'}), 500
+    finally:
+        session.close()
 
 @app.route('/videos/<int:video_id>/upload_subtitle', methods=['POST'])
 def upload_subtitle(video_id):
@@ -1280,47 +1979,134 @@ def reprocess_auto_detect_endpoint(video_id):
     return jsonify({'message': message}), status_code
 # --- End New Endpoint ---
 
+@app.route('/videos/<int:video_id>/render_edited', methods=['POST'])
+def render_edited_endpoint(video_id):
+    """Queues a render of the full edited video (shorts don't need it; they are rendered from the original)."""
+    session = db.session
+    video = session.get(Video, video_id)
+    if not video:
+        session.close()
+        return jsonify({'error': 'Video not found'}), 404
+    if video.status != 'completed':
+        session.close()
+        return jsonify({'error': f'Video status is {video.status}. Cannot render the edited video now.'}), 400
+    session.close()
+
+    if start_task(f"edited_{video_id}", render_edited_video, (video_id,)):
+        return jsonify({'message': 'Rendering of the full edited video started.'}), 202
+    return jsonify({'message': 'Edited video render is already running or queued.'}), 200
+
+
+def listing_etag(*state):
+    """Strong ETag over the version state a listing response is built from (plus host and query, which shape URLs and paging)."""
+    payload = json.dumps([request.host_url, request.query_string.decode('utf-8', 'replace'), state], default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:32]
+
+def conditional_response(etag):
+    """304 response if the client already holds this ETag, else None."""
+    if request.if_none_match.contains(etag):
+        response = Response(status=304)
+        response.set_etag(etag)
+        return response
+    return None
+
+MEDIA_DIRECTORIES = {'edited-videos': EDITED_VIDEOS_DIR, 'shorts': EDITED_SHORTS_DIR, 'videos': VIDEOS_DIR, 'previews': PREVIEWS_DIR}
+
+def media_url(kind, filename):
+    """Immutable, content-fingerprinted URL for a file in one of MEDIA_DIRECTORIES (None if it's missing)."""
+    fingerprint = media_files.fingerprint(MEDIA_DIRECTORIES[kind], filename) if filename else None
+    if not fingerprint:
+        return None
+    return url_for('serve_media', kind=kind, fingerprint=fingerprint, filename=filename, _external=True)
+
+def serialize_short(s):
+    return {
+        'id': s.id,
+        'short_name': s.short_name,
+        'short_description': s.short_description,
+        'start_time': s.start_time,
+        'end_time': s.end_time,
+        'status': s.status,
+        # Generate URL only if the file is present (index lookup, no stat per row)
+        'short_url': media_url('shorts', s.short_filename) if s.status == 'completed' and media_files.exists(EDITED_SHORTS_DIR, s.short_filename) else None
+    }
+
+def serialize_video(v, transcript_head=None):
+    """JSON for one video in the library listing. transcript_head is the start of v.transcript (the column itself is deferred)."""
+    has_subtitle_content = bool(v.uploaded_subtitle_filename) or bool(transcript_head and not transcript_head.startswith("Transcription data") and not transcript_head.startswith("Using uploaded"))
+    return {
+        'id': v.id,
+        'title': v.video_title or os.path.splitext(v.original_filename)[0].replace('_', ' ').title(), # Fallback title
+        'original_filename': v.original_filename,
+        'status': v.status,
+        'progress': v.progress, # Transcription percent complete while processing
+        'uploaded_subtitle_filename': v.uploaded_subtitle_filename,
+        # Provide URL only if file exists and status allows playback
+        'edited_video_url': media_url('edited-videos', v.edited_filename) if v.status == 'completed' and media_files.exists(EDITED_VIDEOS_DIR, v.edited_filename) else None,
+        # Low-resolution proxy for in-browser preview (ready shortly after the suggestions)
+        'preview_video_url': media_url('previews', v.proxy_filename) if v.status == 'completed' and media_files.exists(PREVIEWS_DIR, v.proxy_filename) else None,
+        # Original upload, for previews when no edited video was rendered
+        'source_video_url': media_url('videos', v.original_filename) if v.status == 'completed' and not (v.edited_filename and media_files.exists(EDITED_VIDEOS_DIR, v.edited_filename)) and media_files.exists(VIDEOS_DIR, v.original_filename) else None,
+        # Order shorts by start time for consistent display
+        'shorts': [serialize_short(s) for s in sorted(v.shorts, key=lambda s: s.start_time)],
+        'has_subtitle_content': has_subtitle_content, # Flag for frontend logic
+        'updated_at': v.updated_at.isoformat() if v.updated_at else None
+    }
 
 @app.route('/videos', methods=['GET'])
 def get_videos():
+    """
+    Lists videos (newest first) with their shorts, using one query for videos and one for all their shorts.
+
+    Without parameters the response is the full list. With limit/offset and/or since (an updated_at value from
+    a previous response's server_time) it is an envelope with paging info; since returns only videos changed
+    at or after that time (less VIDEO_LIST_SINCE_MARGIN_SECONDS, so rows committed after a change was stamped
+    aren't missed; clients replace videos by id, so repeats are harmless), plus the ids of all current videos so
+    clients can drop deleted ones.
+    """
     try:
-        # Order by ID descending for recent videos first
-        videos = Video.query.order_by(Video.id.desc()).all()
-        output = []
-        for v in videos:
-            shorts_data = []
+        # Cheap projection first: if nothing changed, answer 304 before loading or serializing anything
+        etag = listing_etag([tuple(row) for row in db.session.query(Video.id, Video.version, Video.updated_at).order_by(Video.id)])
+        not_modified = conditional_response(etag)
+        if not_modified is not None:
+            return not_modified
+
+        since_param = request.args.get('since')
+        limit = request.args.get('limit', type=int)
+        offset = max(0, request.args.get('offset', default=0, type=int))
+        if limit is not None:
+            limit = max(1, min(limit, VIDEO_LIST_MAX_LIMIT))
+        since = None
+        if since_param:
             try:
-                # Order shorts by start time for consistent display
-                shorts = ShortSegment.query.filter_by(video_id=v.id).order_by(ShortSegment.start_time).all()
-                shorts_data = [{
-                    'id': s.id,
-                    'short_name': s.short_name,
-                    'short_description': s.short_description,
-                    'start_time': s.start_time,
-                    'end_time': s.end_time,
-                    'status': s.status,
-                    # Generate URL only if file likely exists
-                    'short_url': url_for('serve_short', filename=s.short_filename, _external=True) if s.status == 'completed' and s.short_filename and os.path.exists(os.path.join(EDITED_SHORTS_DIR, s.short_filename)) else None
-                } for s in shorts]
-            except Exception as e:
-                 logger.error(f"Error fetching shorts for video {v.id}: {e}", exc_info=True)
-
-            # Check if edited video file actually exists before providing URL
-            edited_video_exists = v.edited_filename and os.path.exists(os.path.join(EDITED_VIDEOS_DIR, v.edited_filename))
-            has_subtitle_content = bool(v.uploaded_subtitle_filename) or (v.transcript and not v.transcript.startswith("Transcription data") and not v.transcript.startswith("Using uploaded"))
-
-            output.append({
-                'id': v.id,
-                'title': v.video_title or os.path.splitext(v.original_filename)[0].replace('_', ' ').title(), # Fallback title
-                'original_filename': v.original_filename,
-                'status': v.status,
-                'uploaded_subtitle_filename': v.uploaded_subtitle_filename,
-                # Provide URL only if file exists and status allows playback
-                'edited_video_url': url_for('serve_edited_video', filename=v.edited_filename, _external=True) if v.status == 'completed' and edited_video_exists else None,
-                'shorts': shorts_data,
-                'has_subtitle_content': has_subtitle_content # Flag for frontend logic
-            })
-        return jsonify(output)
+                since = datetime.fromisoformat(since_param) - timedelta(seconds=VIDEO_LIST_SINCE_MARGIN_SECONDS)
+            except ValueError:
+                return jsonify({'error': f"Invalid since '{since_param}'. Expected an ISO timestamp from server_time."}), 400
+
+        server_time = datetime.utcnow()
+        # The (potentially large) transcript column is deferred; only its first characters are needed for the flag
+        query = db.session.query(Video, func.substr(Video.transcript, 1, 40)).options(defer(Video.transcript), selectinload(Video.shorts))
+        if since is not None:
+            query = query.filter(Video.updated_at >= since)
+        query = query.order_by(Video.id.desc())
+        total = query.count() if limit is not None else None
+        if limit is not None:
+            query = query.offset(offset).limit(limit)
+        output = [serialize_video(v, transcript_head) for v, transcript_head in query.all()]
+
+        if since is None and limit is None:
+            response = jsonify(output)
+            response.headers['X-Server-Time'] = server_time.isoformat() # Starting point for ?since= fetches
+            response.set_etag(etag)
+            return response
+        envelope = {'videos': output, 'server_time': server_time.isoformat()}
+        if limit is not None:
+            envelope.update({'total': total, 'limit': limit, 'offset': offset, 'next_offset': offset + limit if offset + limit < total else None})
+        if since is not None:
+            envelope['video_ids'] = [video_id for (video_id,) in db.session.query(Video.id).order_by(Video.id.desc())]
+        response = jsonify(envelope)
+        response.set_etag(etag)
+        return response
     except Exception as e:
          logger.error(f"Error fetching video list: {e}", exc_info=True)
          # Provide a slightly more specific error if possible, but avoid leaking too much detail
@@ -1347,7 +2133,11 @@ def create_short_endpoint(video_id, short_id):
     data = request.get_json() or {}
     audio_filename = data.get('audio_filename')
     audio_volume = data.get('audio_volume')
-    logger.info(f"Create request for short {short_id}: Audio='{audio_filename}', Volume='{audio_volume}'")
+    cut_mode = data.get('cut_mode') # Optional: 'smart', 'copy' (fast preview) or 'reencode'
+    if cut_mode is not None and cut_mode not in short_cut_modes:
+        session.close()
+        return jsonify({'error': f"Invalid cut_mode '{cut_mode}'. Expected one of: {', '.join(short_cut_modes)}."}), 400
+    logger.info(f"Create request for short {short_id}: Audio='{audio_filename}', Volume='{audio_volume}', Cut Mode='{cut_mode}'")
     # --- End audio data extraction ---
 
     short.status = 'queued'
@@ -1355,7 +2145,7 @@ def create_short_endpoint(video_id, short_id):
 
     task_key = f"short_{short_id}"
     # Pass audio details as keyword arguments to the task
-    task_kwargs = {'audio_filename': audio_filename, 'audio_volume': audio_volume}
+    task_kwargs = {'audio_filename': audio_filename, 'audio_volume': audio_volume, 'cut_mode': cut_mode}
     if start_task(task_key, process_short, args_tuple=(video_id, short_id), kwargs_dict=task_kwargs):
         message = 'Short creation queued'
         status_code = 202
@@ -1367,6 +2157,47 @@ def create_short_endpoint(video_id, short_id):
     return jsonify({'message': message}), status_code
 
 
+@app.route('/videos/<int:video_id>/shorts/create_all', methods=['POST'])
+def create_all_shorts_endpoint(video_id):
+    """Queues every pending or failed short of a video as one batch render job (see process_shorts_batch)."""
+    session = db.session
+    video = session.get(Video, video_id)
+    if not video:
+        session.close()
+        return jsonify({'error': 'Video not found'}), 404
+    if video.status != 'completed':
+        session.close()
+        return jsonify({'error': f'Cannot create shorts, main video status is {video.status} (must be completed).'}), 400
+
+    data = request.get_json(silent=True) or {}
+    audio_filename = data.get('audio_filename')
+    audio_volume = data.get('audio_volume')
+    cut_mode = data.get('cut_mode')
+    if cut_mode is not None and cut_mode not in short_cut_modes:
+        session.close()
+        return jsonify({'error': f"Invalid cut_mode '{cut_mode}'. Expected one of: {', '.join(short_cut_modes)}."}), 400
+
+    shorts = [s for s in video.shorts if s.status in ['pending', 'failed']]
+    if not shorts:
+        session.close()
+        return jsonify({'error': 'No pending or failed shorts to create.'}), 400
+    previous_statuses = {s.id: s.status for s in shorts}
+    for short in shorts:
+        short.status = 'queued'
+    session.commit() # Before queueing, so the job can't start ahead of this update
+
+    task_kwargs = {'audio_filename': audio_filename, 'audio_volume': audio_volume, 'cut_mode': cut_mode}
+    if start_task(f"shorts_batch_{video_id}", process_shorts_batch, args_tuple=(video_id, list(previous_statuses)), kwargs_dict=task_kwargs):
+        message, status_code = f'Creation of {len(shorts)} shorts queued', 202
+    else:
+        for short in shorts:
+            short.status = previous_statuses[short.id]
+        session.commit()
+        message, status_code = 'A batch render is already running for this video.', 200
+    session.close()
+    return jsonify({'message': message, 'short_ids': list(previous_statuses)}), status_code
+
+
 @app.route('/videos/<int:video_id>', methods=['DELETE'])
 def delete_video(video_id):
     session = db.session
@@ -1382,6 +2213,7 @@ def delete_video(video_id):
     paths_to_delete = []
     if video.original_filename: paths_to_delete.append(os.path.join(VIDEOS_DIR, video.original_filename))
     if video.edited_filename: paths_to_delete.append(os.path.join(EDITED_VIDEOS_DIR, video.edited_filename))
+    if video.proxy_filename: paths_to_delete.append(os.path.join(PREVIEWS_DIR, video.proxy_filename))
     if video.uploaded_subtitle_filename: paths_to_delete.append(os.path.join(SUBTITLES_DIR, video.uploaded_subtitle_filename))
     if original_filename_base:
         # Be careful with audio files if they could be shared or reused
@@ -1402,12 +2234,16 @@ def delete_video(video_id):
          if file_path and os.path.exists(file_path):
              try:
                  os.remove(file_path)
+                 media_files.discard(os.path.dirname(file_path), os.path.basename(file_path))
+                 artifact_cache.forget_digest(file_path) # Cached artifacts stay content-addressed; only drop the path's hash
                  logger.info(f"Deleted file: {file_path}")
                  deleted_files_count += 1
              except OSError as e:
                  logger.error(f"Error deleting file {file_path}: {e}")
                  skipped_files.append(os.path.basename(file_path))
 
+    delete_video_transcript(video_id)
+
     try:
         # Delete video record (shorts should be deleted by cascade)
         session.delete(video)
@@ -1477,6 +2313,7 @@ def update_short(video_id, short_id):
                  if os.path.exists(old_file):
                      try:
                          os.remove(old_file)
+                         media_files.discard(EDITED_SHORTS_DIR, short.short_filename)
                          logger.info(f"Deleted old file {old_file} for updated short {short_id}.")
                      except OSError as e:
                          logger.error(f"Could not delete old file {old_file}: {e}")
@@ -1497,7 +2334,7 @@ def update_short(video_id, short_id):
              'start_time': short.start_time,
              'end_time': short.end_time,
              'status': short.status,
-             'short_url': url_for('serve_short', filename=short.short_filename, _external=True) if short.status == 'completed' and short.short_filename else None
+             'short_url': media_url('shorts', short.short_filename) if short.status == 'completed' and short.short_filename else None
         }
         message = f'Short updated successfully.{status_reset_msg}'
         status_code = 200
@@ -1536,37 +2373,19 @@ def refresh_shorts_endpoint(video_id):
 
     # Check if there's any content to base suggestions on
     has_content = get_subtitle_text_content(video) is not None # Use helper to check
-    if not has_content:
-        # Try to generate transcript with Whisper for suggestions only (no video editing)
-        try:
-            from createshorts import process_video
-            original_video_path = os.path.join(VIDEOS_DIR, video.original_filename)
-            edited_filename = f"{os.path.splitext(video.original_filename)[0]}_edited.mp4"
-            # Only generate transcript, do not edit video
-            _, whisper_transcript_result, _ = process_video(
-                original_video_path,
-                edited_filename,
-                skip_editing=True,
-                subtitle_file_path=None,
-                zoom_factor=2.0,
-                process_without_subs=True
-            )
-            if whisper_transcript_result:
-                formatted_transcript = format_transcript(whisper_transcript_result)
-                video.transcript = formatted_transcript
-                session.commit()
-                has_content = True
-            else:
-                session.close()
-                return jsonify({'error': 'Failed to generate transcript for suggestions.'}), 400
-        except Exception as e:
-            session.close()
-            return jsonify({'error': f'Failed to generate transcript for suggestions: {e}'}), 500
+    # Without content, regenerate_suggestions has to run Whisper first, so queue it in the CPU-bound whisper class
+    job_class = 'gemini' if has_content else 'whisper'
+
+    # force_fresh asks Gemini again even if identical transcript windows have cached responses
+    request_data = request.get_json(silent=True) or {}
+    force_fresh = str(request_data.get('force_fresh', request.args.get('force_fresh', ''))).lower() in ('1', 'true', 'yes')
 
-    logger.info(f"Queueing suggestion regeneration for video {video_id}")
+    logger.info(f"Queueing suggestion regeneration for video {video_id} (class {job_class}, has content: {has_content}, force fresh: {force_fresh})")
     task_key = f"video_{video_id}"
-    if start_task(task_key, regenerate_suggestions, (video_id,)):
+    if start_task(task_key, regenerate_suggestions, (video_id,), kwargs_dict={'force_fresh': force_fresh} if force_fresh else None, job_class=job_class):
         message = 'Suggestion regeneration queued. Non-completed suggestions will be replaced shortly.'
+        if not has_content:
+            message = 'Transcript generation and suggestion regeneration queued. Non-completed suggestions will be replaced shortly.'
         status_code = 202
     else:
         message = 'Suggestion regeneration task is already running or queued.'
@@ -1597,7 +2416,11 @@ def recreate_short_endpoint(video_id, short_id):
     data = request.get_json() or {}
     audio_filename = data.get('audio_filename')
     audio_volume = data.get('audio_volume')
-    logger.info(f"Recreate request for short {short_id}: Audio='{audio_filename}', Volume='{audio_volume}'")
+    cut_mode = data.get('cut_mode') # Optional: 'smart', 'copy' (fast preview) or 'reencode'
+    if cut_mode is not None and cut_mode not in short_cut_modes:
+        session.close()
+        return jsonify({'error': f"Invalid cut_mode '{cut_mode}'. Expected one of: {', '.join(short_cut_modes)}."}), 400
+    logger.info(f"Recreate request for short {short_id}: Audio='{audio_filename}', Volume='{audio_volume}', Cut Mode='{cut_mode}'")
     # --- End audio data extraction ---
 
     if short.short_filename:
@@ -1605,6 +2428,7 @@ def recreate_short_endpoint(video_id, short_id):
         if os.path.exists(short_path):
             try:
                 os.remove(short_path)
+                media_files.discard(EDITED_SHORTS_DIR, short.short_filename)
                 logger.info(f"Removed existing file for short {short_id} before recreation: {short_path}")
             except OSError as e:
                  logger.error(f"Could not remove existing file {short_path}: {e}")
@@ -1616,7 +2440,7 @@ def recreate_short_endpoint(video_id, short_id):
     logger.info(f"Queueing recreation for short {short_id}")
     task_key = f"short_{short_id}"
     # Pass audio details as keyword arguments to the task
-    task_kwargs = {'audio_filename': audio_filename, 'audio_volume': audio_volume}
+    task_kwargs = {'audio_filename': audio_filename, 'audio_volume': audio_volume, 'cut_mode': cut_mode}
     if start_task(task_key, process_short, args_tuple=(video_id, short_id), kwargs_dict=task_kwargs):
         message = 'Short recreation queued'
         status_code = 202
@@ -1738,24 +2562,83 @@ def bulk_manual_create_shorts(video_id):
 
 # --- Serving files and index ---
 # Use Cache-Control headers to prevent browser caching issues, especially for videos that might be replaced.
+@app.route('/events')
+def stream_events():
+    """
+    Server-sent events stream of status changes, replacing client polling.
+
+    Events: 'video' {id, status, progress} or {id, deleted}, 'short' {id, video_id, status} or {..., deleted},
+    'progress' {id, progress} and 'resync' (reload everything). Clients fetch details with /videos?since=.
+    """
+    last_event_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    subscriber = event_broker.subscribe(last_event_id)
+
+    def generate():
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            while True:
+                try:
+                    event_id, event_type, data = subscriber.get(timeout=SSE_KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            event_broker.unsubscribe(subscriber) # Client went away
+
+    return Response(generate(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 @app.after_request
 def add_header(response):
-    # Add headers to prevent caching for dynamic content and video files
-    if request.path.startswith('/edited-videos/') or \
-       request.path.startswith('/shorts/') or \
-       request.endpoint in ['get_videos', 'get_shorts_for_video']: # Adjust endpoint names if needed
-        response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-        response.headers["Pragma"] = "no-cache"
-        response.headers["Expires"] = "0"
+    # Listings carry ETags: browsers may keep them but must revalidate (If-None-Match -> 304) every time
+    if request.endpoint in ['get_videos', 'get_shorts_for_video']:
+        response.headers["Cache-Control"] = "no-cache"
     return response
 
+def send_media(directory, filename, immutable=False):
+    """
+    Sends a media file with byte-range support. Werkzeug answers Range/If-Range with 206 and streams through
+    wsgi.file_wrapper (sendfile where the server supports it); with MEDIA_OFFLOAD the proxy does the transfer.
+    """
+    path = safe_join(directory, filename)
+    if path is None or not os.path.isfile(path):
+        abort(404)
+    if MEDIA_OFFLOAD == 'x-accel':
+        response = Response(mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream')
+        response.headers['X-Accel-Redirect'] = f"{MEDIA_ACCEL_PREFIX.rstrip('/')}/{os.path.relpath(path, DATA_DIR).replace(os.sep, '/')}"
+    else:
+        response = send_from_directory(directory, filename, conditional=True) # X-Sendfile when USE_X_SENDFILE is set
+    if immutable:
+        response.headers['Cache-Control'] = f"public, max-age={MEDIA_IMMUTABLE_MAX_AGE}, immutable"
+    else:
+        response.headers['Cache-Control'] = "no-cache" # Revalidate with ETag/Last-Modified; no full re-download
+    response.headers['Accept-Ranges'] = 'bytes'
+    return response
+
+@app.route('/media/<kind>/<fingerprint>/<path:filename>')
+def serve_media(kind, fingerprint, filename):
+    """Fingerprinted media URL (see media_url): cacheable forever, since new content gets a new URL."""
+    directory = MEDIA_DIRECTORIES.get(kind)
+    if directory is None or os.path.basename(filename).startswith('.'): # Never expose in-progress uploads
+        abort(404)
+    current = media_files.fingerprint(directory, filename)
+    if current is None:
+        abort(404)
+    if current != fingerprint:
+        return redirect(url_for('serve_media', kind=kind, fingerprint=current, filename=filename)) # Stale link
+    return send_media(directory, filename, immutable=True)
+
 @app.route('/edited-videos/<path:filename>')
 def serve_edited_video(filename):
-    return send_from_directory(EDITED_VIDEOS_DIR, filename)
+    return send_media(EDITED_VIDEOS_DIR, filename)
 
 @app.route('/shorts/<path:filename>')
 def serve_short(filename):
-    return send_from_directory(EDITED_SHORTS_DIR, filename)
+    return send_media(EDITED_SHORTS_DIR, filename)
 
 @app.route('/')
 def index():
@@ -1765,16 +2648,15 @@ def index():
 @app.route('/videos/<int:video_id>/shorts', methods=['GET'])
 def get_shorts_for_video(video_id): # Renamed endpoint function
     try:
+        video_state = db.session.query(Video.version, Video.updated_at).filter_by(id=video_id).first()
+        etag = listing_etag(video_id, tuple(video_state) if video_state else None)
+        not_modified = conditional_response(etag)
+        if not_modified is not None:
+            return not_modified
         shorts = ShortSegment.query.filter_by(video_id=video_id).order_by(ShortSegment.start_time).all()
-        return jsonify([{
-            'id': s.id,
-            'short_name': s.short_name,
-            'short_description': s.short_description,
-            'start_time': s.start_time,
-            'end_time': s.end_time,
-            'status': s.status,
-            'short_url': url_for('serve_short', filename=s.short_filename, _external=True) if s.status == 'completed' and s.short_filename and os.path.exists(os.path.join(EDITED_SHORTS_DIR, s.short_filename)) else None
-        } for s in shorts])
+        response = jsonify([serialize_short(s) for s in shorts])
+        response.set_etag(etag)
+        return response
     except Exception as e:
         logger.error(f"Error fetching shorts for modal (video {video_id}): {e}", exc_info=True)
         # Provide a slightly more specific error if possible, but avoid leaking too much detail
@@ -1826,12 +2708,40 @@ def get_video_transcript(video_id):
         return jsonify({'error': 'Video not found.'}), 404
 
     transcript_text = get_subtitle_text_content(video)
+    if not transcript_text and video.status == 'processing':
+        # Whisper is still running: return the segments checkpointed so far
+        partial_segments = get_partial_transcript(os.path.join(VIDEOS_DIR, video.original_filename))
+        if partial_segments:
+            partial_text = format_transcript(partial_segments)
+            progress = video.progress
+            session.close()
+            return jsonify({'transcript': partial_text, 'partial': True, 'progress': progress}), 200
     session.close()
     if transcript_text:
         return jsonify({'transcript': transcript_text}), 200
     else:
         return jsonify({'error': 'Transcript not available.'}), 404
 
+@app.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Lists queued and running background jobs in the order the scheduler will pick them up."""
+    try:
+        jobs = Job.query.filter(Job.status.in_(['queued', 'running'])) \
+            .order_by(Job.status.desc(), Job.priority.desc(), Job.id.asc()).all() # 'running' sorts before 'queued'
+        return jsonify([{
+            'id': j.id,
+            'task_key': j.task_key,
+            'task': j.func_name,
+            'job_class': j.job_class,
+            'priority': j.priority,
+            'status': j.status,
+            'created_at': j.created_at.isoformat() if j.created_at else None,
+            'started_at': j.started_at.isoformat() if j.started_at else None,
+        } for j in jobs])
+    except Exception as e:
+        logger.error(f"Error listing jobs: {e}", exc_info=True)
+        return jsonify({"error": "Failed to list jobs"}), 500
+
 # --- Socket and Run ---
 import socket
 
@@ -0,0 +1,230 @@
+import os
+import json
+import shutil
+import hashlib
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Directories (ensure consistency with app.py / createshorts.py)
+DATA_DIR = os.path.abspath("data")
+CACHE_DIR = os.path.join(DATA_DIR, "cache")
+os.makedirs(CACHE_DIR, exist_ok=True)
+
+# Settings
+artifact_cache_max_bytes = 20 * 1024 ** 3 # Evict least recently used artifacts once the cache grows past this
+digest_chunk_size = 4 * 1024 * 1024 # Read size when hashing source files
+DIGEST_INDEX_PATH = os.path.join(CACHE_DIR, "digests.json") # Remembers file hashes across restarts
+
+
+def _stat_signature(path):
+    """Cheap identity for a file's current contents: (size, mtime_ns, inode)."""
+    st = os.stat(path)
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+
+class ArtifactCache:
+    """
+    Content-addressed store for intermediate artifacts under data/cache.
+
+    Keys are built from a hash of the source bytes plus the parameters that affect the artifact
+    (see make_key), so a renamed re-upload hits the cache and a same-name upload with new content
+    misses it. Entries are files; a hit refreshes the file's mtime, and once the total size exceeds
+    max_bytes the entries with the oldest mtime are removed first (LRU).
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=artifact_cache_max_bytes):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._total_bytes = None # Computed lazily on first write
+        self._digests = None # abs path -> {"sig": [...], "sha256": "..."}
+
+    # --- Source hashing ---
+    def _load_digest_index(self):
+        if self._digests is None:
+            try:
+                with open(DIGEST_INDEX_PATH, "r", encoding="utf-8") as f:
+                    self._digests = json.load(f)
+            except (OSError, ValueError):
+                self._digests = {}
+        return self._digests
+
+    def _save_digest_index(self):
+        tmp_path = DIGEST_INDEX_PATH + ".tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._digests, f)
+            os.replace(tmp_path, DIGEST_INDEX_PATH)
+        except OSError as e:
+            logger.warning(f"Could not save digest index: {e}")
+
+    def file_digest(self, path):
+        """Returns the sha256 of a file's bytes, reusing the stored value while size/mtime/inode are unchanged."""
+        abs_path = os.path.abspath(path)
+        signature = _stat_signature(abs_path)
+        with self._lock:
+            entry = self._load_digest_index().get(abs_path)
+            if entry and entry.get("sig") == signature:
+                return entry["sha256"]
+
+        logger.info(f"Hashing file contents for cache key: {abs_path}")
+        sha = hashlib.sha256()
+        with open(abs_path, "rb") as f:
+            for chunk in iter(lambda: f.read(digest_chunk_size), b""):
+                sha.update(chunk)
+        digest = sha.hexdigest()
+        self.register_digest(abs_path, digest, signature)
+        return digest
+
+    def known_digest(self, path):
+        """Returns the stored sha256 for path if its size/mtime/inode still match, without hashing (else None)."""
+        abs_path = os.path.abspath(path)
+        try:
+            signature = _stat_signature(abs_path)
+        except OSError:
+            return None
+        with self._lock:
+            entry = self._load_digest_index().get(abs_path)
+        return entry["sha256"] if entry and entry.get("sig") == signature else None
+
+    def register_digest(self, path, digest, signature=None):
+        """Records a digest computed elsewhere (e.g. while a file was being written) so it isn't hashed again."""
+        abs_path = os.path.abspath(path)
+        with self._lock:
+            self._load_digest_index()[abs_path] = {"sig": signature or _stat_signature(abs_path), "sha256": digest}
+            self._save_digest_index()
+
+    def forget_digest(self, path):
+        with self._lock:
+            if self._load_digest_index().pop(os.path.abspath(path), None) is not None:
+                self._save_digest_index()
+
+    # --- Keys and paths ---
+    @staticmethod
+    def make_key(kind, **params):
+        """Builds a cache key from the artifact kind and every parameter that affects it."""
+        payload = json.dumps({"kind": kind, **params}, sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def path_for(self, kind, key, suffix=""):
+        return os.path.join(self.cache_dir, kind, key[:2], f"{key}{suffix}")
+
+    def get_path(self, kind, key, suffix=""):
+        """Returns the cached artifact path (and marks it recently used), or None on a miss."""
+        path = self.path_for(kind, key, suffix)
+        if not os.path.exists(path):
+            return None
+        try:
+            os.utime(path, None) # Refresh LRU position
+        except OSError:
+            pass
+        logger.info(f"Artifact cache hit ({kind}): {os.path.basename(path)}")
+        return path
+
+    # --- Writes ---
+    def put_file(self, kind, key, suffix, source_path, move=True):
+        """Stores a file as an artifact. With move=False the source is hardlinked (or copied) instead of moved."""
+        path = self.path_for(kind, key, suffix)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        if move:
+            shutil.move(source_path, tmp_path)
+        else:
+            _link_or_copy(source_path, tmp_path)
+        os.replace(tmp_path, path)
+        self._account(path)
+        return path
+
+    def put_bytes(self, kind, key, suffix, data):
+        fd, tmp_path = tempfile.mkstemp(prefix="artifact_", suffix=".tmp", dir=self.cache_dir)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        return self.put_file(kind, key, suffix, tmp_path, move=True)
+
+    def get_json(self, kind, key):
+        path = self.get_path(kind, key, ".json")
+        if not path:
+            return None
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Discarding unreadable cache entry {path}: {e}")
+            self.discard(path)
+            return None
+
+    def put_json(self, kind, key, value):
+        return self.put_bytes(kind, key, ".json", json.dumps(value).encode("utf-8"))
+
+    def discard(self, path):
+        try:
+            size = os.path.getsize(path)
+            os.remove(path)
+            with self._lock:
+                if self._total_bytes is not None:
+                    self._total_bytes -= size
+        except OSError:
+            pass
+
+    # --- Eviction ---
+    def _iter_entries(self):
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if name.endswith(".tmp") or os.path.join(root, name) == DIGEST_INDEX_PATH:
+                    continue
+                yield os.path.join(root, name)
+
+    def _account(self, new_path):
+        with self._lock:
+            if self._total_bytes is None:
+                self._total_bytes = sum(os.path.getsize(p) for p in self._iter_entries())
+            else:
+                self._total_bytes += os.path.getsize(new_path)
+            over_budget = self._total_bytes > self.max_bytes
+        if over_budget:
+            self.evict()
+
+    def evict(self):
+        """Removes least recently used artifacts until the cache fits within max_bytes."""
+        with self._lock:
+            entries = []
+            for path in self._iter_entries():
+                try:
+                    st = os.stat(path)
+                    entries.append((st.st_mtime, st.st_size, path))
+                except OSError:
+                    continue
+            total = sum(size for _, size, _ in entries)
+            entries.sort() # Oldest use first
+            for _, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                    total -= size
+                    logger.info(f"Evicted cached artifact (LRU): {path}")
+                except OSError as e:
+                    logger.warning(f"Could not evict cached artifact {path}: {e}")
+            self._total_bytes = total
+
+
+def _link_or_copy(source_path, dest_path):
+    """Hardlinks when possible so cached renders don't double disk usage; copies otherwise."""
+    try:
+        os.link(source_path, dest_path)
+    except OSError:
+        shutil.copy2(source_path, dest_path)
+
+
+def materialize(cached_path, dest_path):
+    """Places a cached artifact at dest_path (replacing any existing file) without touching the cache entry."""
+    if os.path.exists(dest_path):
+        os.remove(dest_path) # Unlink first so we never write through a shared hardlink
+    _link_or_copy(cached_path, dest_path)
+    return dest_path
+
+
+artifact_cache = ArtifactCache()
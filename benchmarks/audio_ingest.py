@@ -0,0 +1,146 @@
+"""
+Compares the old MP3 audio ingest with the direct 16 kHz PCM ingest.
+
+Usage:
+    python benchmarks/audio_ingest.py <media file> [--transcribe] [--model base] [--compute-type int8] [--json out.json]
+
+mp3: ffmpeg -> libmp3lame -q:a 2 file -> faster_whisper.decode_audio (the previous transcribe_audio path)
+pcm: ffmpeg -> raw f32le piped to disk -> memory map (createshorts.load_audio_pcm without the cache)
+
+Each path runs in a fresh subprocess so peak RSS is measured independently. RSS is reported for the Python
+process and, separately, for its children (ffmpeg). Both paths then compute silences and levels over the
+decoded buffer; with --transcribe they also run the single-stream Whisper engine on it.
+"""
+import os
+import sys
+import json
+import math
+import time
+import resource
+import argparse
+import tempfile
+import subprocess
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+SAMPLE_RATE = 16000 # createshorts.whisper_sample_rate (createshorts is only imported inside each measured run)
+
+
+def _frame_rms(audio, frame_samples, block_frames=4096):
+    """RMS level per frame, computed a block at a time so long memory-mapped audio isn't copied whole."""
+    frame_count = len(audio) // frame_samples
+    rms = np.empty(frame_count, dtype=np.float32)
+    for first in range(0, frame_count, block_frames):
+        last = min(frame_count, first + block_frames)
+        block = np.asarray(audio[first * frame_samples:last * frame_samples], dtype=np.float32).reshape(-1, frame_samples)
+        rms[first:last] = np.sqrt(np.mean(np.square(block), axis=1))
+    return rms
+
+
+def detect_silences(audio, threshold_db=-40.0, min_silence_seconds=0.5, frame_seconds=0.02, sample_rate=SAMPLE_RATE):
+    """Returns [(start_seconds, end_seconds)] stretches where the level stays below threshold_db (dBFS)."""
+    frame_samples = max(1, int(frame_seconds * sample_rate))
+    quiet = _frame_rms(audio, frame_samples) < 10 ** (threshold_db / 20.0)
+    # Rising/falling edges of the quiet mask mark the start/end frame of each run
+    edges = np.diff(np.concatenate(([0], quiet.astype(np.int8), [0])))
+    starts, ends = np.flatnonzero(edges == 1), np.flatnonzero(edges == -1)
+    min_frames = int(min_silence_seconds / frame_seconds)
+    return [(round(float(a) * frame_seconds, 3), round(float(b) * frame_seconds, 3)) for a, b in zip(starts, ends) if b - a >= min_frames]
+
+
+def audio_levels(audio, block_seconds=0.4, sample_rate=SAMPLE_RATE):
+    """Loudness summary in dBFS: overall RMS, peak sample, and the RMS of the loudest block_seconds window."""
+    if len(audio) == 0:
+        return {"rms_db": None, "peak_db": None, "max_block_rms_db": None}
+    block_rms = _frame_rms(audio, max(1, int(block_seconds * sample_rate)))
+    peak = 0.0
+    for first in range(0, len(audio), sample_rate * 60):
+        peak = max(peak, float(np.max(np.abs(audio[first:first + sample_rate * 60]))))
+    to_db = lambda level: round(20 * math.log10(level), 2) if level > 0 else None
+    return {
+        "rms_db": to_db(float(np.sqrt(np.mean(np.square(block_rms))))) if len(block_rms) else None,
+        "peak_db": to_db(peak),
+        "max_block_rms_db": to_db(float(block_rms.max())) if len(block_rms) else None,
+    }
+
+
+def _max_rss_mb(who):
+    rss = resource.getrusage(who).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1) # bytes on macOS, KiB on Linux
+
+
+def run_mode(mode, media, transcribe, model_size, compute_type):
+    import createshorts
+    timings = {}
+    with tempfile.TemporaryDirectory(prefix="audio_ingest_") as scratch:
+        started = time.perf_counter()
+        if mode == "mp3":
+            from faster_whisper import decode_audio
+            mp3_path = os.path.join(scratch, "audio.mp3")
+            subprocess.run(["ffmpeg", "-nostdin", "-loglevel", "error", "-i", media, "-vn", "-acodec", "libmp3lame", "-q:a", "2", "-y", mp3_path], check=True)
+            timings["encode_seconds"] = round(time.perf_counter() - started, 2)
+            audio = decode_audio(mp3_path, sampling_rate=createshorts.whisper_sample_rate)
+        else:
+            pcm_path = createshorts.decode_audio_pcm(media, os.path.join(scratch, "audio.f32"))
+            audio = createshorts.open_audio_pcm(pcm_path)
+        timings["ingest_seconds"] = round(time.perf_counter() - started, 2)
+
+        started = time.perf_counter()
+        silences = detect_silences(audio)
+        levels = audio_levels(audio)
+        timings["analysis_seconds"] = round(time.perf_counter() - started, 2)
+
+        if transcribe:
+            started = time.perf_counter()
+            words = []
+            createshorts.transcribe_samples_streaming(audio, lambda seg: words.extend(seg["words"]), model_size, compute_type)
+            timings["transcribe_seconds"] = round(time.perf_counter() - started, 2)
+            timings["words"] = len(words)
+
+        return {
+            "mode": mode,
+            "audio_seconds": round(len(audio) / createshorts.whisper_sample_rate, 1),
+            **timings,
+            "silences": len(silences),
+            "levels": levels,
+            "peak_rss_mb": _max_rss_mb(resource.RUSAGE_SELF),
+            "children_peak_rss_mb": _max_rss_mb(resource.RUSAGE_CHILDREN),
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("media")
+    parser.add_argument("--transcribe", action="store_true", help="Also run Whisper on each decoded buffer")
+    parser.add_argument("--model", default="base")
+    parser.add_argument("--compute-type", default="int8")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--mode", choices=("mp3", "pcm"), help=argparse.SUPPRESS) # Internal: run one path in this process
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.media, args.transcribe, args.model, args.compute_type)))
+        return
+
+    results = []
+    for mode in ("mp3", "pcm"):
+        command = [sys.executable, os.path.abspath(__file__), args.media, "--mode", mode, "--model", args.model, "--compute-type", args.compute_type]
+        if args.transcribe:
+            command.append("--transcribe")
+        started = time.perf_counter()
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        result["wall_seconds"] = round(time.perf_counter() - started, 2) # Includes interpreter start-up and imports
+        results.append(result)
+        print(f"{mode}: ingest {result['ingest_seconds']}s, peak RSS {result['peak_rss_mb']} MB (ffmpeg {result['children_peak_rss_mb']} MB)")
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Compares the captions generator's old upload handling with the single-pass ingest.
+
+Usage:
+    python benchmarks/caption_ingest.py [media ...] [--minutes 10 60] [--size 1280x720] [--json out.json]
+
+old: copy the upload to disk, then whisper.load_audio(file) (a second read and demux of the whole file)
+new: copy the upload to disk while ffmpeg decodes the same bytes to 16 kHz PCM, then read the PCM
+     (main.copy_with_pcm_ingest + main.load_pcm, as /transcribe/ does)
+
+Both report the time from the start of the copy until the audio is ready for Whisper; the difference is the
+time saved before transcription starts. Without media files, synthetic inputs of --minutes length are
+generated (H.264 + AAC, index at the front, like browser and editor exports). Each path runs in a fresh
+subprocess so the page cache warmed by one doesn't favour the other more than it has to: every run starts by
+reading the input once.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+CAPTIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "captions generator")
+sys.path.insert(0, CAPTIONS_DIR)
+
+
+def make_input(path, minutes, size):
+    subprocess.run([
+        "ffmpeg", "-nostdin", "-loglevel", "error", "-y",
+        "-f", "lavfi", "-i", f"testsrc2=size={size}:rate=30",
+        "-f", "lavfi", "-i", "sine=frequency=440:sample_rate=48000",
+        "-t", str(minutes * 60), "-c:v", "libx264", "-preset", "ultrafast", "-c:a", "aac", "-shortest",
+        "-movflags", "+faststart", path,
+    ], check=True)
+
+
+def run_mode(mode, media):
+    import whisper
+    import main
+    with open(media, "rb") as f: # Warm the page cache the same way for both paths
+        for _ in iter(lambda: f.read(main.INGEST_READ_SIZE), b""):
+            pass
+    with tempfile.TemporaryDirectory(prefix="caption_ingest_") as scratch:
+        dest = os.path.join(scratch, "upload" + os.path.splitext(media)[1])
+        pcm_path = main.pcm_path_for(Path(dest))
+        started = time.perf_counter()
+        with open(media, "rb") as source, open(dest, "wb") as destination:
+            if mode == "old":
+                for block in iter(lambda: source.read(main.INGEST_READ_SIZE), b""):
+                    destination.write(block)
+                ingested = False
+            else:
+                ingested = main.copy_with_pcm_ingest(source, destination, pcm_path)
+        copy_seconds = time.perf_counter() - started
+        audio = main.load_pcm(str(pcm_path)) if ingested else whisper.load_audio(dest)
+        ready_seconds = time.perf_counter() - started
+        return {
+            "mode": mode,
+            "audio_seconds": round(len(audio) / whisper.audio.SAMPLE_RATE, 1),
+            "copy_seconds": round(copy_seconds, 2),
+            "audio_ready_seconds": round(ready_seconds, 2),
+            "ingested": ingested,
+        }
+
+
+def main_cli():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("media", nargs="*", help="Input files (default: generated inputs of --minutes length)")
+    parser.add_argument("--minutes", type=float, nargs="+", default=[10, 60])
+    parser.add_argument("--size", default="1280x720", help="Frame size of generated inputs")
+    parser.add_argument("--json", help="Also write the results to this file")
+    parser.add_argument("--mode", choices=("old", "new"), help=argparse.SUPPRESS) # Internal: run one path in this process
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.media[0])))
+        return
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="caption_ingest_inputs_") as inputs:
+        media_files = list(args.media)
+        if not media_files:
+            for minutes in args.minutes:
+                path = os.path.join(inputs, f"input_{minutes:g}min.mp4")
+                print(f"Generating {minutes:g}-minute input ({args.size})...")
+                make_input(path, minutes, args.size)
+                media_files.append(path)
+
+        for media in media_files:
+            runs = {}
+            for mode in ("old", "new"):
+                command = [sys.executable, os.path.abspath(__file__), media, "--mode", mode]
+                output = subprocess.run(command, check=True, capture_output=True, text=True, cwd=CAPTIONS_DIR).stdout
+                runs[mode] = json.loads(output.strip().splitlines()[-1])
+            saved = runs["old"]["audio_ready_seconds"] - runs["new"]["audio_ready_seconds"]
+            result = {
+                "media": os.path.basename(media),
+                "size_mb": round(os.path.getsize(media) / 2**20, 1),
+                "audio_seconds": runs["old"]["audio_seconds"],
+                "old": runs["old"],
+                "new": runs["new"],
+                "saved_seconds": round(saved, 2),
+            }
+            results.append(result)
+            print(f"{result['media']} ({result['audio_seconds'] / 60:.0f} min): audio ready after {runs['old']['audio_ready_seconds']}s -> "
+                  f"{runs['new']['audio_ready_seconds']}s, saved {result['saved_seconds']}s{'' if runs['new']['ingested'] else ' (ingest fell back to the file)'}")
+
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main_cli()
@@ -0,0 +1,99 @@
+"""
+Compares single-stream and chunked parallel Whisper transcription on one media file.
+
+Usage:
+    python benchmarks/transcription_parallel.py <media file> [--model base] [--compute-type int8] [--workers N] [--json out.json]
+
+Both engines run on the same decoded 16 kHz audio and bypass the artifact cache. Reports wall time for each
+engine, how many words the two transcripts share, and the start-time drift of the shared words.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import difflib
+import statistics
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from faster_whisper import decode_audio # noqa: E402
+import createshorts # noqa: E402
+
+
+def run_engine(engine, audio, model_size, compute_type, **kwargs):
+    segments = []
+    started = time.perf_counter()
+    engine(audio, segments.append, model_size, compute_type, **kwargs)
+    return segments, time.perf_counter() - started
+
+
+def flatten_words(segments):
+    return [(w[2].strip().lower().strip(".,!?;:\"'"), w[0]) for seg in segments for w in seg["words"]]
+
+
+def word_drift(reference_segments, candidate_segments):
+    """Aligns the two word sequences and returns drift statistics (seconds) over the matching words."""
+    ref_words, cand_words = flatten_words(reference_segments), flatten_words(candidate_segments)
+    matcher = difflib.SequenceMatcher(a=[w for w, _ in ref_words], b=[w for w, _ in cand_words], autojunk=False)
+    drifts = []
+    for block in matcher.get_matching_blocks():
+        for i in range(block.size):
+            drifts.append(abs(ref_words[block.a + i][1] - cand_words[block.b + i][1]))
+    drifts.sort()
+    return {
+        "reference_words": len(ref_words),
+        "candidate_words": len(cand_words),
+        "matched_words": len(drifts),
+        "match_ratio": round(len(drifts) / len(ref_words), 4) if ref_words else 0.0,
+        "drift_mean": round(statistics.fmean(drifts), 3) if drifts else None,
+        "drift_p95": round(drifts[int(0.95 * (len(drifts) - 1))], 3) if drifts else None,
+        "drift_max": round(drifts[-1], 3) if drifts else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("media")
+    parser.add_argument("--model", default=createshorts.whisper_model_size)
+    parser.add_argument("--compute-type", default=createshorts.whisper_compute_type)
+    parser.add_argument("--workers", type=int, default=createshorts.whisper_parallel_workers)
+    parser.add_argument("--json", help="Also write the results to this file")
+    args = parser.parse_args()
+
+    audio = decode_audio(args.media, sampling_rate=createshorts.whisper_sample_rate)
+    duration = len(audio) / createshorts.whisper_sample_rate
+    print(f"Audio: {duration:.1f}s, model={args.model}, compute_type={args.compute_type}, workers={args.workers}")
+
+    # Load the pooled model up front so its load time isn't charged to the single-stream run
+    with createshorts.whisper_model_pool.model(args.model, args.compute_type):
+        pass
+
+    single, single_seconds = run_engine(createshorts.transcribe_samples_streaming, audio, args.model, args.compute_type)
+    print(f"single-stream: {single_seconds:.1f}s ({duration / single_seconds:.2f}x realtime)")
+    parallel, parallel_seconds = run_engine(
+        createshorts.transcribe_samples_parallel, audio, args.model, args.compute_type,
+        workers=args.workers, cpu_threads=max(1, (os.cpu_count() or 1) // args.workers),
+    )
+    print(f"parallel:      {parallel_seconds:.1f}s ({duration / parallel_seconds:.2f}x realtime, includes worker model loads)")
+
+    results = {
+        "media": os.path.abspath(args.media),
+        "audio_seconds": round(duration, 1),
+        "model": args.model,
+        "compute_type": args.compute_type,
+        "workers": args.workers,
+        "chunks": len(createshorts.find_chunk_boundaries(audio)),
+        "single_stream_seconds": round(single_seconds, 2),
+        "parallel_seconds": round(parallel_seconds, 2),
+        "speedup": round(single_seconds / parallel_seconds, 2),
+        "word_timestamps": word_drift(single, parallel),
+    }
+    print(json.dumps(results, indent=2))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,29 @@
 #captions generator/main.py
 import os
-import shutil
 import subprocess
 import tempfile
 import uuid
+import json
 import math
+import hashlib
+import time
+import asyncio
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import OrderedDict
 from pathlib import Path
 from typing import Optional, List, Dict, Any
 
+import numpy as np # Installed with openai-whisper
 import whisper # openai-whisper
 import uvicorn
 from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
 from fastapi.responses import HTMLResponse, JSONResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, Field # Import Pydantic
 
 # --- Configuration ---
@@ -26,12 +36,225 @@ PROCESSED_VIDEOS_DIR = BASE_DIR / "processed_videos"
 TEMPLATES_DIR = BASE_DIR / "templates"
 STATIC_DIR = BASE_DIR / "static"
 
+# Whisper models kept loaded between requests (see WhisperModelCache)
+WHISPER_MODEL_CACHE_MB = int(os.environ.get("WHISPER_MODEL_CACHE_MB", "4096")) # Memory budget for loaded models, split across WHISPER_WORKERS
+WHISPER_PRELOAD_MODELS = [m.strip() for m in os.environ.get("WHISPER_PRELOAD_MODELS", "tiny").split(",") if m.strip()] # Loaded at startup
+# Approximate parameter counts, used to make room before a model is loaded (the real size is measured after)
+WHISPER_MODEL_PARAMS = {"tiny": 39e6, "base": 74e6, "small": 244e6, "medium": 769e6, "large": 1550e6, "turbo": 809e6}
+
+# Background jobs (see /jobs/{job_id})
+WHISPER_WORKERS = int(os.environ.get("WHISPER_WORKERS", "2")) # Transcription processes; each keeps its own model cache
+FFMPEG_CONCURRENCY = int(os.environ.get("FFMPEG_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2)))) # Parallel renders
+JOB_RETENTION_SECONDS = 3600 # Finished jobs can be polled for this long
+
+# Temp uploads and outputs (see UploadRegistry)
+UPLOAD_TTL_SECONDS = int(os.environ.get("UPLOAD_TTL_SECONDS", str(2 * 3600))) # Unused uploads are removed after this long
+UPLOADS_QUOTA_MB = int(os.environ.get("UPLOADS_QUOTA_MB", "10240")) # Least recently used uploads go first beyond this
+PROCESSED_VIDEO_TTL_SECONDS = int(os.environ.get("PROCESSED_VIDEO_TTL_SECONDS", str(24 * 3600))) # Captioned outputs kept this long
+CLEANUP_INTERVAL_SECONDS = 300
+PREVIEW_CLIP_SECONDS = 5.0 # Length of style preview clips
+INGEST_READ_SIZE = 1024 * 1024 # Upload bytes copied (and fed to the audio decoder) per read
+SESSION_COOKIE = "captioner_session"
+
 # Create directories if they don't exist
 UPLOADS_DIR.mkdir(exist_ok=True)
 PROCESSED_VIDEOS_DIR.mkdir(exist_ok=True)
 
-# --- Simple State for Cleanup ---
-current_temp_video_path_for_cleanup: Optional[Path] = None
+# --- Temp Upload Registry ---
+class UploadRegistry:
+    """
+    Temp uploads by path, with the browser session that uploaded them and how many jobs are using them.
+
+    Uploads are kept after captioning so styles can be regenerated without uploading again. A session's previous
+    upload is dropped when it uploads a new video; other uploads are removed once unused for ttl_seconds, or
+    earlier (least recently used first) when the directory exceeds quota_bytes. An upload that a queued or
+    running job holds is never deleted underneath it: removal waits until the last job releases it.
+    Only used from the event loop, so no locking is needed.
+    """
+
+    def __init__(self, directory: Path, ttl_seconds: int, quota_bytes: int):
+        self.directory = directory
+        self.ttl_seconds = ttl_seconds
+        self.quota_bytes = quota_bytes
+        self._entries: Dict[Path, Dict[str, Any]] = {} # resolved path -> {session, size, last_used, refs, discarded}
+
+    def adopt_existing(self):
+        """Registers uploads left from a previous run (their TTL counts from their mtime) and removes stray SRT files."""
+        for path in self.directory.iterdir():
+            try:
+                if path.name.startswith("vid_") and path.suffix != ".pcm":
+                    stat = path.stat()
+                    self._entries[path.resolve()] = {"session": None, "size": stat.st_size, "last_used": stat.st_mtime, "refs": 0, "discarded": False}
+                elif (path.name.startswith("sub_") and path.suffix == ".srt") or path.suffix == ".pcm":
+                    path.unlink() # Leftovers of renders/transcriptions interrupted by the restart
+            except OSError as e:
+                print(f"Warning: could not adopt or remove leftover upload file {path}: {e}")
+        print(f"Upload registry: adopted {len(self._entries)} existing uploads ({self.total_bytes() / 2**20:.0f} MB)")
+
+    def total_bytes(self) -> int:
+        return sum(entry["size"] for entry in self._entries.values())
+
+    def register(self, path: Path, session_id: str):
+        """Adds a saved upload, replacing the session's previous one. Raises 507 if it can't fit in the quota."""
+        path = path.resolve()
+        for other, entry in list(self._entries.items()):
+            if entry["session"] == session_id and other != path:
+                print(f"Dropping previous upload of session {session_id[:8]}: {other}")
+                self.discard(other)
+        self._entries[path] = {"session": session_id, "size": path.stat().st_size, "last_used": time.time(), "refs": 0, "discarded": False}
+        pinned = sum(entry["size"] for other, entry in self._entries.items() if entry["refs"] > 0 or other == path)
+        if pinned > self.quota_bytes: # Wouldn't fit even after removing every idle upload; don't remove any
+            self.discard(path)
+            raise HTTPException(status_code=507, detail="The server's upload space is full. Please try again later.")
+        self._enforce_quota(keep=path)
+
+    def get(self, path: Path) -> Optional[Dict[str, Any]]:
+        """Returns a live upload's entry and marks it used (None if unknown, removed or missing on disk)."""
+        entry = self._entries.get(path.resolve())
+        if not entry or entry["discarded"] or not path.exists():
+            return None
+        entry["last_used"] = time.time()
+        return entry
+
+    def acquire(self, path: Path):
+        self._entries[path.resolve()]["refs"] += 1
+
+    def release(self, path: Path):
+        path = path.resolve()
+        entry = self._entries.get(path)
+        if not entry:
+            return
+        entry["refs"] -= 1
+        entry["last_used"] = time.time()
+        if entry["discarded"] and entry["refs"] <= 0:
+            self._delete(path)
+
+    def discard(self, path: Path):
+        """Removes an upload now, or as soon as the jobs using it finish."""
+        path = path.resolve()
+        entry = self._entries.get(path)
+        if not entry:
+            return
+        entry["discarded"] = True
+        if entry["refs"] <= 0:
+            self._delete(path)
+
+    def _delete(self, path: Path):
+        self._entries.pop(path, None)
+        pcm_path_for(path).unlink(missing_ok=True) # Audio ingested for a transcription still running on it
+        try:
+            path.unlink()
+            print(f"Removed temp upload: {path}")
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            print(f"Warning: could not remove temp upload {path}: {e}")
+
+    def _enforce_quota(self, keep: Optional[Path] = None):
+        idle = sorted(((entry["last_used"], path) for path, entry in self._entries.items() if entry["refs"] <= 0 and path != keep))
+        for _, path in idle:
+            if self.total_bytes() <= self.quota_bytes:
+                break
+            print(f"Upload quota exceeded; removing least recently used upload {path}")
+            self.discard(path)
+
+    def sweep(self):
+        cutoff = time.time() - self.ttl_seconds
+        for path, entry in list(self._entries.items()):
+            if entry["refs"] <= 0 and (entry["last_used"] < cutoff or not path.exists()):
+                self.discard(path)
+        self._enforce_quota()
+
+
+uploads = UploadRegistry(UPLOADS_DIR, UPLOAD_TTL_SECONDS, UPLOADS_QUOTA_MB * 1024 * 1024)
+
+def sweep_processed_videos():
+    cutoff = time.time() - PROCESSED_VIDEO_TTL_SECONDS
+    for path in [*PROCESSED_VIDEOS_DIR.glob("captioned_*"), *PROCESSED_VIDEOS_DIR.glob("preview_*"), *PROCESSED_VIDEOS_DIR.glob(".tmp_*")]:
+        try:
+            if path.stat().st_mtime < cutoff:
+                path.unlink()
+                print(f"Removed expired captioned video: {path}")
+        except OSError as e:
+            print(f"Warning: could not remove expired captioned video {path}: {e}")
+
+async def cleanup_loop():
+    while True:
+        await asyncio.sleep(CLEANUP_INTERVAL_SECONDS)
+        try:
+            uploads.sweep()
+            await run_in_threadpool(sweep_processed_videos)
+        except Exception as e:
+            print(f"Warning: temp file cleanup failed: {e}")
+
+# --- Whisper Model Cache ---
+class WhisperModelCache:
+    """
+    Loaded Whisper models keyed by name, least recently used first.
+
+    Models are loaded once and reused by later requests. When loading another model would exceed the memory
+    budget, the least recently used models are dropped first (a request still using one keeps its reference
+    until it finishes). A single model bigger than the budget is still loaded, it just evicts everything else.
+    """
+
+    def __init__(self, budget_mb: int):
+        self.budget_bytes = budget_mb * 1024 * 1024
+        self._models: "OrderedDict[str, Any]" = OrderedDict() # name -> model
+        self._sizes: Dict[str, int] = {} # name -> bytes of parameters and buffers
+        self._lock = threading.Lock()
+        self._load_locks: Dict[str, threading.Lock] = {} # One load per model name at a time
+
+    @staticmethod
+    def model_bytes(model) -> int:
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def _estimate_bytes(self, name: str) -> int:
+        base_name = name.split(".")[0].split("-v")[0] # e.g. "large-v3" -> "large", "base.en" -> "base"
+        return int(WHISPER_MODEL_PARAMS.get(base_name, 0) * 4) # float32 weights
+
+    def _evict_for(self, incoming_bytes: int):
+        """Drops least recently used models until incoming_bytes fits the budget. Caller holds self._lock."""
+        while self._models and sum(self._sizes.values()) + incoming_bytes > self.budget_bytes:
+            evicted, _ = self._models.popitem(last=False)
+            freed = self._sizes.pop(evicted, 0)
+            print(f"Whisper model cache: evicted '{evicted}' ({freed / 2**20:.0f} MB)")
+
+    def get(self, name: str):
+        """Returns the loaded model, loading it (and evicting others if needed) on first use."""
+        with self._lock:
+            model = self._models.get(name)
+            if model is not None:
+                self._models.move_to_end(name)
+                return model
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        with load_lock:
+            with self._lock:
+                model = self._models.get(name) # Loaded by a concurrent request meanwhile
+                if model is not None:
+                    self._models.move_to_end(name)
+                    return model
+                self._evict_for(self._estimate_bytes(name))
+            print(f"Loading Whisper model: {name}")
+            model = whisper.load_model(name)
+            size = self.model_bytes(model)
+            with self._lock:
+                self._evict_for(size)
+                self._models[name] = model
+                self._sizes[name] = size
+            print(f"Whisper model cache: loaded '{name}' ({size / 2**20:.0f} MB, {sum(self._sizes.values()) / 2**20:.0f} of {self.budget_bytes / 2**20:.0f} MB used)")
+            return model
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._models)
+
+    def preload(self, names: List[str]):
+        for name in names:
+            self.get(name)
+
+
+model_cache = WhisperModelCache(WHISPER_MODEL_CACHE_MB)
 
 # --- FastAPI App Initialization ---
 app = FastAPI()
@@ -39,6 +262,173 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 app.mount("/processed_videos", StaticFiles(directory=PROCESSED_VIDEOS_DIR), name="processed_videos")
 templates = Jinja2Templates(directory=TEMPLATES_DIR)
 
+# --- Upload Ingest ---
+# The upload is read once: while it is copied to disk, the same bytes are piped into ffmpeg, which writes the
+# 16 kHz mono PCM Whisper needs. Transcription then reads that instead of decoding the file a second time.
+# Containers ffmpeg can't decode from a pipe (e.g. MP4 with its index at the end) fall back to Whisper's own load.
+def pcm_path_for(video_path: Path) -> Path:
+    return video_path.with_name(video_path.name + ".pcm")
+
+def pcm_decode_command(source: str, output: str) -> List[str]:
+    # Same format whisper.load_audio asks ffmpeg for
+    return [FFMPEG_PATH, "-loglevel", "error", "-y", "-i", source, "-map", "0:a:0",
+            "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(whisper.audio.SAMPLE_RATE), "-f", "s16le", output]
+
+def copy_with_pcm_ingest(source, destination, pcm_path: Path) -> bool:
+    """
+    Copies the file object source into destination while ffmpeg decodes the same bytes to pcm_path.
+    Returns True if the PCM is complete; otherwise it is removed and the copy is still done.
+    """
+    stderr_file = tempfile.TemporaryFile() # Not a pipe: nobody reads it while we write, so it must not fill up
+    try:
+        decoder = subprocess.Popen(pcm_decode_command("pipe:0", str(pcm_path)), stdin=subprocess.PIPE, stdout=subprocess.DEVNULL, stderr=stderr_file)
+    except OSError as e:
+        print(f"Warning: could not start the audio ingest decoder: {e}")
+        decoder = None
+    for block in iter(lambda: source.read(INGEST_READ_SIZE), b""):
+        destination.write(block)
+        if decoder:
+            try:
+                decoder.stdin.write(block)
+            except (BrokenPipeError, OSError): # ffmpeg gave up on this input
+                decoder.stdin = None
+                decoder.kill()
+                decoder.wait()
+                decoder = None
+    ok = False
+    if decoder:
+        try: decoder.stdin.close()
+        except OSError: pass
+        ok = decoder.wait() == 0
+        if not ok:
+            stderr_file.seek(0)
+            print(f"Audio ingest can't decode this upload from a stream; Whisper will load it from the file: {stderr_file.read().decode('utf-8', errors='ignore').strip()}")
+    stderr_file.close()
+    if not ok and pcm_path.exists():
+        try: pcm_path.unlink()
+        except OSError: pass
+    return ok
+
+def load_pcm(pcm_path: str) -> np.ndarray:
+    """Reads ingested PCM the way whisper.load_audio returns audio (float32 in [-1, 1))."""
+    return np.fromfile(pcm_path, dtype=np.int16).astype(np.float32) / 32768.0
+
+# --- Whisper Worker Processes ---
+# Transcription runs in a process pool so it never blocks the event loop (or holds the GIL the server needs).
+# Each worker has its own model_cache with an equal share of WHISPER_MODEL_CACHE_MB, warmed with
+# WHISPER_PRELOAD_MODELS when the worker starts.
+whisper_pool: Optional[ProcessPoolExecutor] = None
+ffmpeg_slots = asyncio.Semaphore(FFMPEG_CONCURRENCY)
+
+def init_whisper_worker(preload: List[str], workers: int):
+    import torch
+    torch.set_num_threads(max(1, (os.cpu_count() or 1) // workers)) # Workers share the CPUs instead of oversubscribing
+    model_cache.budget_bytes = WHISPER_MODEL_CACHE_MB * 1024 * 1024 // max(1, workers) # ...and the model memory budget
+    try:
+        model_cache.preload(preload)
+    except Exception as e:
+        print(f"Warning: could not preload Whisper models {preload} in worker {os.getpid()}: {e}")
+
+def warm_whisper_worker() -> int:
+    return os.getpid()
+
+def transcribe_in_worker(video_path: str, model_name: str, words_per_segment: int, pcm_path: Optional[str] = None) -> List[Dict[str, Any]]:
+    """
+    Runs in a Whisper worker process; returns the subtitle segments (much smaller to send back than Whisper's result).
+    pcm_path is the audio decoded at upload time; without it Whisper decodes video_path itself.
+    """
+    model = model_cache.get(model_name) # Warm after the first request for this model in this worker
+    request_word_timestamps = words_per_segment > 0
+    print(f"[worker {os.getpid()}] Transcribing {video_path} with '{model_name}' (word timestamps: {request_word_timestamps}, ingested audio: {bool(pcm_path)})")
+    result = model.transcribe(load_pcm(pcm_path) if pcm_path else video_path, fp16=False, word_timestamps=request_word_timestamps)
+    return create_subtitle_segments(result, words_per_segment)
+
+def create_whisper_pool() -> ProcessPoolExecutor:
+    pool = ProcessPoolExecutor(
+        max_workers=WHISPER_WORKERS,
+        mp_context=multiprocessing.get_context("spawn"), # Forking a process that has loaded PyTorch can deadlock
+        initializer=init_whisper_worker,
+        initargs=(WHISPER_PRELOAD_MODELS, WHISPER_WORKERS),
+    )
+    for _ in range(WHISPER_WORKERS):
+        pool.submit(warm_whisper_worker) # Start the workers (and their preloads) now, not on the first request
+    return pool
+
+def replace_broken_whisper_pool(broken_pool: ProcessPoolExecutor):
+    """A worker died (e.g. killed for running out of memory), which breaks the whole pool: start a new one."""
+    global whisper_pool
+    if whisper_pool is not broken_pool: # Another job already replaced it
+        return
+    print("Whisper worker pool is broken (a worker exited unexpectedly); starting new workers")
+    broken_pool.shutdown(wait=False, cancel_futures=True)
+    whisper_pool = create_whisper_pool()
+
+@app.on_event("startup")
+def start_whisper_workers():
+    # Also covers `uvicorn main:app`, where the __main__ block below doesn't run
+    global whisper_pool
+    whisper_pool = create_whisper_pool()
+
+@app.on_event("startup")
+async def start_cleanup():
+    uploads.adopt_existing()
+    asyncio.create_task(cleanup_loop())
+
+@app.on_event("shutdown")
+def stop_whisper_workers():
+    if whisper_pool:
+        whisper_pool.shutdown(wait=False, cancel_futures=True)
+
+# --- Jobs ---
+# Transcription and rendering run as background jobs; the endpoints return a job id to poll at /jobs/{job_id}.
+# Only touched from the event loop, so no locking is needed.
+jobs: Dict[str, Dict[str, Any]] = {}
+
+def create_job(kind: str, video_path: Path) -> Dict[str, Any]:
+    """Creates a queued job holding a reference to its upload (released by run_job)."""
+    cutoff = time.time() - JOB_RETENTION_SECONDS
+    for job_id in [j for j, job in jobs.items() if job["finished_at"] and job["finished_at"] < cutoff]:
+        del jobs[job_id]
+    job = {"job_id": uuid.uuid4().hex, "kind": kind, "status": "queued", "video_path": video_path,
+           "result": None, "error": None, "created_at": time.time(), "finished_at": None}
+    uploads.acquire(video_path)
+    jobs[job["job_id"]] = job
+    return job
+
+async def run_job(job: Dict[str, Any], work):
+    """Runs the coroutine work() for job, recording its result or error."""
+    job["status"] = "running"
+    try:
+        job["result"] = await work()
+        job["status"] = "completed"
+    except HTTPException as e:
+        job["status"], job["error"] = "failed", e.detail
+    except Exception as e:
+        print(f"An unexpected error occurred in {job['kind']} job {job['job_id']}: {e}")
+        import traceback
+        traceback.print_exc()
+        job["status"], job["error"] = "failed", f"Unexpected server error during {job['kind']}: {type(e).__name__}"
+    finally:
+        job["finished_at"] = time.time()
+        uploads.release(job["video_path"])
+        print(f"--- {job['kind']} job {job['job_id']} {job['status']} ---")
+
+# Renders by cache key (see render_cache_key), so identical requests share one job or one finished file
+render_jobs: Dict[str, Dict[str, Any]] = {}
+
+def finished_job(kind: str, video_path: Path, result: Dict[str, Any]) -> Dict[str, Any]:
+    """A job that is already completed (a cached render); holds no reference to its upload."""
+    now = time.time()
+    job = {"job_id": uuid.uuid4().hex, "kind": kind, "status": "completed", "video_path": video_path,
+           "result": result, "error": None, "created_at": now, "finished_at": now}
+    jobs[job["job_id"]] = job
+    return job
+
+def job_response(job: Dict[str, Any], status_code: int = 200) -> JSONResponse:
+    content = {key: job[key] for key in ("job_id", "kind", "status", "result", "error")}
+    content["status_url"] = f"/jobs/{job['job_id']}"
+    return JSONResponse(content=content, status_code=status_code)
+
 # --- Pydantic Models ---
 class SubtitleSegment(BaseModel):
     start: float
@@ -58,6 +448,10 @@ class FinalizeRequest(BaseModel):
     # x_offset and y_offset removed
     output_suffix: str = ".mp4"
 
+class PreviewRequest(FinalizeRequest):
+    at: float = Field(0.0, ge=0) # Start of the preview clip (seconds), usually the current playhead
+    duration: float = Field(PREVIEW_CLIP_SECONDS, gt=0, le=30)
+
 # --- Helper Functions ---
 
 def convert_html_color_to_ass(html_color: str) -> str:
@@ -168,24 +562,27 @@ def write_srt_file(segments: List[SubtitleSegment], srt_path: Path):
 async def get_main_page(request: Request):
     return templates.TemplateResponse("index.html", {"request": request})
 
-@app.post("/transcribe/")
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    job = jobs.get(job_id)
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found. It may have expired; please start again.")
+    return job_response(job)
+
+@app.post("/transcribe/", status_code=202)
 async def transcribe_video(
+    request: Request,
     video_file: UploadFile = File(...),
     whisper_model_name: str = Form("tiny"),
     words_per_segment: int = Form(0)
 ):
-    global current_temp_video_path_for_cleanup
     print(f"\n--- /transcribe START ---")
     print(f"Received model={whisper_model_name}, words_per_segment={words_per_segment}")
     temp_video_path = None
+    if whisper_model_name not in whisper.available_models():
+        raise HTTPException(status_code=400, detail=f"Unknown Whisper model: {whisper_model_name}")
 
-    if current_temp_video_path_for_cleanup and current_temp_video_path_for_cleanup.exists():
-        print(f"Cleaning up previous temp video: {current_temp_video_path_for_cleanup}")
-        try:
-            current_temp_video_path_for_cleanup.unlink()
-        except Exception as e_clean:
-            print(f"Warning: Could not delete previous temp video {current_temp_video_path_for_cleanup}: {e_clean}")
-    current_temp_video_path_for_cleanup = None
+    session_id = request.cookies.get(SESSION_COOKIE) or uuid.uuid4().hex
 
     try:
         suffix = Path(video_file.filename).suffix
@@ -195,72 +592,193 @@ async def transcribe_video(
         temp_video_path = Path(temp_video_path_str)
         print(f"Saving uploaded video to new temporary file: {temp_video_path}")
 
-        with open(temp_video_path, "wb") as buffer:
-            shutil.copyfileobj(video_file.file, buffer)
-        os.close(temp_video_fd)
-        current_temp_video_path_for_cleanup = temp_video_path
+        pcm_path = pcm_path_for(temp_video_path)
+        def save_upload():
+            with os.fdopen(temp_video_fd, "wb") as buffer:
+                return copy_with_pcm_ingest(video_file.file, buffer, pcm_path)
+        pcm_ready = await run_in_threadpool(save_upload) # Large copy; keep the event loop free
+    except Exception as e:
+        print(f"An unexpected error occurred saving the upload in /transcribe: {e}")
+        if temp_video_path and temp_video_path.exists():
+             try: temp_video_path.unlink()
+             except OSError: pass
+        raise HTTPException(status_code=500, detail=f"Unexpected server error during upload: {type(e).__name__}")
+
+    uploads.register(temp_video_path, session_id) # Replaces this session's previous upload; 507 if over quota
+    job = create_job("transcription", temp_video_path)
 
-        result = {}
+    async def work():
+        pool = whisper_pool
         try:
-            print(f"Loading Whisper model: {whisper_model_name}")
-            model = whisper.load_model(whisper_model_name)
-            request_word_timestamps = words_per_segment > 0
-            print(f"Requesting word timestamps from Whisper: {request_word_timestamps}")
-            print(f"Transcribing video: {temp_video_path}")
-            result = model.transcribe(
-                str(temp_video_path),
-                fp16=False,
-                word_timestamps=request_word_timestamps
-            )
-            print("Whisper transcription finished.")
+            loop = asyncio.get_running_loop()
+            processed_segments = await loop.run_in_executor(pool, transcribe_in_worker, str(temp_video_path), whisper_model_name, words_per_segment, str(pcm_path) if pcm_ready else None)
+        except BrokenProcessPool as e:
+            replace_broken_whisper_pool(pool) # So later jobs don't fail on the dead pool too
+            print(f"Whisper transcription error: worker crashed: {e}")
+            uploads.discard(temp_video_path)
+            raise HTTPException(status_code=500, detail="Whisper transcription failed: the worker process crashed (possibly out of memory). Please try again or use a smaller model.")
         except Exception as e:
             print(f"Whisper transcription error: {e}")
-            import traceback
-            traceback.print_exc()
+            uploads.discard(temp_video_path) # Deleted once this job releases it
             raise HTTPException(status_code=500, detail=f"Whisper transcription failed: {e}")
-
-        print("Calling create_subtitle_segments...")
-        processed_segments = create_subtitle_segments(result, words_per_segment)
+        finally:
+            if pcm_path.exists(): # Only needed for this transcription
+                try: pcm_path.unlink()
+                except OSError: pass
 
         if not processed_segments:
              print("WARNING: No valid subtitle segments generated by create_subtitle_segments.")
-
-        print(f"--- /transcribe END - Returning {len(processed_segments)} segments ---")
-        return JSONResponse(content={
+        print(f"Transcription job {job['job_id']} produced {len(processed_segments)} segments")
+        return {
             "segments": processed_segments,
             "temp_video_path": str(temp_video_path),
             "output_suffix": suffix
-        })
+        }
 
-    except HTTPException as e:
-        if temp_video_path and temp_video_path.exists():
-             print(f"Cleaning up temp video due to HTTP error in /transcribe: {temp_video_path}")
-             try: temp_video_path.unlink()
-             except OSError: pass
-             current_temp_video_path_for_cleanup = None
-        raise e
-    except Exception as e:
-        print(f"An unexpected error occurred in /transcribe: {e}")
-        import traceback
-        traceback.print_exc()
-        if temp_video_path and temp_video_path.exists():
-             print(f"Cleaning up temp video due to unexpected error in /transcribe: {temp_video_path}")
-             try: temp_video_path.unlink()
-             except OSError: pass
-             current_temp_video_path_for_cleanup = None
-        raise HTTPException(status_code=500, detail=f"Unexpected server error during transcription: {type(e).__name__}")
+    asyncio.create_task(run_job(job, work))
+    print(f"--- /transcribe END - queued job {job['job_id']} ---")
+    response = job_response(job, status_code=202)
+    response.set_cookie(SESSION_COOKIE, session_id, httponly=True, samesite="lax")
+    return response
+
+
+def build_subtitles_filter(data: FinalizeRequest, srt_path: Path) -> str:
+    safe_font_name = data.font_name.replace("'", "").replace('"', '')
+
+    # --- Define Margins ---
+    base_horizontal_margin = 20  # Default horizontal padding from video edges
+    default_vertical_margin_from_edge = 30 # Default vertical distance from the relevant edge (top/bottom/middle-offset)
+
+    # Specific vertical margin for "Bottom Center" (position 2)
+    # This value makes it sit higher from the absolute bottom edge.
+    # For Alignment=2 (BottomCenter), MarginV is distance from bottom edge.
+    # A larger value pushes it further up.
+    bottom_center_specific_vertical_margin = 70
+
+    final_margin_l_value = base_horizontal_margin
+    final_margin_r_value = base_horizontal_margin
+
+    if data.position == 2:  # Bottom Center
+        final_margin_v_value = bottom_center_specific_vertical_margin
+        print(f"Using specific MarginV={final_margin_v_value} for Bottom Center (position 2).")
+    else:
+        # For other positions (top, other bottom, middle), use the default.
+        # Note on ASS MarginV for Middle Alignments (4,5,6):
+        # MarginV is often distance from the vertical center (0 = centered, positive = down).
+        # So, default_vertical_margin_from_edge (e.g., 30) would push middle text 30px down.
+        final_margin_v_value = default_vertical_margin_from_edge
+        print(f"Using default MarginV={final_margin_v_value} for position {data.position}.")
+    # --- End Margin Definition ---
+
+    style_options = [
+        f"FontName={safe_font_name}",
+        f"FontSize={data.font_size}",
+        f"PrimaryColour={convert_html_color_to_ass(data.font_color)}",
+        f"OutlineColour={convert_html_color_to_ass(data.outline_color)}",
+        f"BorderStyle=1", # 1 = Outline + Shadow
+        f"Outline={data.outline_width}",
+        f"Shadow={data.shadow_offset}",
+        f"Alignment={data.position}", # Numpad alignment
+        f"MarginL={final_margin_l_value}",
+        f"MarginR={final_margin_r_value}",
+        f"MarginV={final_margin_v_value}"
+    ]
+    force_style_str = ",".join(style_options)
+    print(f"ASS Force Style String: {force_style_str}")
+
+    srt_path_str = str(srt_path.resolve())
+    escaped_srt_path = srt_path_str.replace('\\', '/').replace(':', '\\:')
+    subtitles_filter = f"subtitles=filename='{escaped_srt_path}':force_style='{force_style_str}'"
+    print(f"Subtitles Filter String: {subtitles_filter}")
+    return subtitles_filter
+
+def render_cache_key(data: FinalizeRequest, video_path: Path) -> str:
+    """Key over the upload (path, size, mtime), the segments and the style (plus the clip window for previews)."""
+    stat = video_path.stat()
+    payload = [str(video_path), stat.st_size, stat.st_mtime_ns, data.dict(exclude={"temp_video_path"})]
+    return hashlib.sha256(json.dumps(payload, sort_keys=True).encode("utf-8")).hexdigest()
+
+def clip_segments(segments: List[SubtitleSegment], start: float, duration: float) -> List[SubtitleSegment]:
+    """The segments overlapping [start, start + duration], re-timed to start at 0."""
+    end = start + duration
+    return [
+        SubtitleSegment(start=max(seg.start, start) - start, end=min(seg.end, end) - start, text=seg.text)
+        for seg in segments if seg.end > start and seg.start < end
+    ]
+
+async def render_captioned_video(data: FinalizeRequest, temp_video_path: Path, processed_video_path: Path, clip: Optional[tuple] = None):
+    """
+    Burns the subtitles into the video with an asyncio ffmpeg subprocess (the event loop keeps serving meanwhile).
+    clip=(start, duration) renders only that window, quickly, for style previews. The output is written under a
+    temporary name and renamed, so a cached path never points at a partial file.
+    """
+    temp_srt_path = None
+    temp_output_path = processed_video_path.with_name(f".tmp_{uuid.uuid4().hex}{processed_video_path.suffix}")
+    try:
+        temp_srt_fd, temp_srt_path_str = tempfile.mkstemp(suffix=".srt", prefix="sub_", dir=UPLOADS_DIR)
+        os.close(temp_srt_fd)
+        temp_srt_path = Path(temp_srt_path_str)
+        write_srt_file(clip_segments(data.segments, *clip) if clip else data.segments, temp_srt_path)
+        print(f"{'Preview' if clip else 'Final'} SRT file generated: {temp_srt_path}")
+
+        if clip:
+            ffmpeg_cmd = [
+                FFMPEG_PATH, "-y",
+                "-ss", f"{clip[0]:.3f}", "-t", f"{clip[1]:.3f}", # Seek before decoding; the SRT is re-timed to match
+                "-i", str(temp_video_path),
+                "-vf", build_subtitles_filter(data, temp_srt_path),
+                "-c:a", "aac",
+                "-c:v", "libx264",
+                "-preset", "ultrafast",
+                "-crf", "28",
+                str(temp_output_path)
+            ]
+        else:
+            ffmpeg_cmd = [
+                FFMPEG_PATH, "-y",
+                "-i", str(temp_video_path),
+                "-vf", build_subtitles_filter(data, temp_srt_path),
+                "-c:a", "copy",
+                "-c:v", "libx264",
+                "-preset", "veryfast",
+                "-crf", "23",
+                str(temp_output_path)
+            ]
+        async with ffmpeg_slots: # Bounded so concurrent renders don't thrash the CPU
+            print(f"Running FFmpeg command: {' '.join(ffmpeg_cmd)}")
+            process = await asyncio.create_subprocess_exec(*ffmpeg_cmd, stdout=asyncio.subprocess.DEVNULL, stderr=asyncio.subprocess.PIPE)
+            _, stderr = await process.communicate()
+        full_stderr = stderr.decode('utf-8', errors='ignore')
 
+        if process.returncode != 0:
+            print(f"--- FFmpeg stderr START ---\n{full_stderr}\n--- FFmpeg stderr END ---")
+            lines = [line.strip() for line in full_stderr.splitlines() if line.strip()]
+            specific_error = f"FFmpeg processing failed. Last error: {lines[-1]}" if lines else "FFmpeg processing failed."
+            raise HTTPException(status_code=500, detail=specific_error)
+        elif full_stderr.strip():
+            print(f"--- FFmpeg stderr (Success run) START ---\n{full_stderr}\n--- FFmpeg stderr END ---")
+        os.replace(temp_output_path, processed_video_path)
+        print(f"Video processed successfully: {processed_video_path}")
+    finally:
+        if temp_output_path.exists():
+            try: temp_output_path.unlink()
+            except OSError: pass
+        print("--- Cleaning up temporary SRT file (Finalize) ---")
+        if temp_srt_path and temp_srt_path.exists():
+            try:
+                temp_srt_path.unlink()
+                print(f"Cleaned up temp SRT: {temp_srt_path}")
+            except Exception as e_clean:
+                 print(f"Error cleaning up temp SRT {temp_srt_path}: {e_clean}")
+        print(f"Keeping temp video for potential regeneration (until unused for {UPLOAD_TTL_SECONDS}s): {temp_video_path}")
 
-@app.post("/finalize_video/")
+@app.post("/finalize_video/", status_code=202)
 async def finalize_video(request: Request, data: FinalizeRequest):
     print(f"\n--- /finalize_video START ---")
     print(f"Received {len(data.segments)} segments for video: {data.temp_video_path}")
     # Adjusted print statement as x_offset and y_offset are removed from data
     print(f"Style: Font={data.font_name}, Size={data.font_size}, Pos={data.position}")
 
-
-    temp_srt_path = None
-    processed_video_path = None
     temp_video_path = Path(data.temp_video_path)
 
     try:
@@ -268,7 +786,7 @@ async def finalize_video(request: Request, data: FinalizeRequest):
         resolved_uploads_dir = UPLOADS_DIR.resolve()
         if resolved_uploads_dir not in resolved_temp_path.parents:
              raise ValueError("Attempt to access file outside of upload directory.")
-        if not resolved_temp_path.exists():
+        if uploads.get(resolved_temp_path) is None: # Also refreshes its TTL
              raise FileNotFoundError("Temporary video file not found.")
     except FileNotFoundError:
          raise HTTPException(status_code=404, detail="Temporary video file not found. Please start over by transcribing again.")
@@ -279,118 +797,51 @@ async def finalize_video(request: Request, data: FinalizeRequest):
          print(f"Error validating temporary path: {e_path}")
          raise HTTPException(status_code=500, detail="Server error validating video path.")
 
-    try:
-        temp_srt_fd, temp_srt_path_str = tempfile.mkstemp(suffix=".srt", prefix="sub_", dir=UPLOADS_DIR)
-        temp_srt_path = Path(temp_srt_path_str)
-        write_srt_file(data.segments, temp_srt_path)
-        os.close(temp_srt_fd)
-        print(f"Final SRT file generated: {temp_srt_path}")
-
-        output_filename = f"captioned_{uuid.uuid4().hex}{data.output_suffix}"
-        processed_video_path = PROCESSED_VIDEOS_DIR / output_filename
-        safe_font_name = data.font_name.replace("'", "").replace('"', '')
-
-        # --- Define Margins ---
-        base_horizontal_margin = 20  # Default horizontal padding from video edges
-        default_vertical_margin_from_edge = 30 # Default vertical distance from the relevant edge (top/bottom/middle-offset)
-
-        # Specific vertical margin for "Bottom Center" (position 2)
-        # This value makes it sit higher from the absolute bottom edge.
-        # For Alignment=2 (BottomCenter), MarginV is distance from bottom edge.
-        # A larger value pushes it further up.
-        bottom_center_specific_vertical_margin = 70
-
-        final_margin_l_value = base_horizontal_margin
-        final_margin_r_value = base_horizontal_margin
-
-        if data.position == 2:  # Bottom Center
-            final_margin_v_value = bottom_center_specific_vertical_margin
-            print(f"Using specific MarginV={final_margin_v_value} for Bottom Center (position 2).")
-        else:
-            # For other positions (top, other bottom, middle), use the default.
-            # Note on ASS MarginV for Middle Alignments (4,5,6):
-            # MarginV is often distance from the vertical center (0 = centered, positive = down).
-            # So, default_vertical_margin_from_edge (e.g., 30) would push middle text 30px down.
-            final_margin_v_value = default_vertical_margin_from_edge
-            print(f"Using default MarginV={final_margin_v_value} for position {data.position}.")
-        # --- End Margin Definition ---
-
-        style_options = [
-            f"FontName={safe_font_name}",
-            f"FontSize={data.font_size}",
-            f"PrimaryColour={convert_html_color_to_ass(data.font_color)}",
-            f"OutlineColour={convert_html_color_to_ass(data.outline_color)}",
-            f"BorderStyle=1", # 1 = Outline + Shadow
-            f"Outline={data.outline_width}",
-            f"Shadow={data.shadow_offset}",
-            f"Alignment={data.position}", # Numpad alignment
-            f"MarginL={final_margin_l_value}",
-            f"MarginR={final_margin_r_value}",
-            f"MarginV={final_margin_v_value}"
-        ]
-        force_style_str = ",".join(style_options)
-        print(f"ASS Force Style String: {force_style_str}")
-
-        srt_path_str = str(temp_srt_path.resolve())
-        escaped_srt_path = srt_path_str.replace('\\', '/').replace(':', '\\:')
-        subtitles_filter = f"subtitles=filename='{escaped_srt_path}':force_style='{force_style_str}'"
-        print(f"Subtitles Filter String: {subtitles_filter}")
-
-        ffmpeg_cmd = [
-            FFMPEG_PATH, "-y",
-            "-i", str(temp_video_path),
-            "-vf", subtitles_filter,
-            "-c:a", "copy",
-            "-c:v", "libx264",
-            "-preset", "veryfast",
-            "-crf", "23",
-            str(processed_video_path)
-        ]
-        print(f"Running FFmpeg command: {' '.join(ffmpeg_cmd)}")
-
-        process = subprocess.Popen(ffmpeg_cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-        stdout, stderr = process.communicate()
-        full_stderr = stderr.decode('utf-8', errors='ignore')
+    key = render_cache_key(data, resolved_temp_path)
+    output_filename = f"captioned_{key[:32]}{data.output_suffix}"
+    job = start_cached_render("render", request, data, resolved_temp_path, output_filename, key)
+    print(f"--- /finalize_video END - job {job['job_id']} ({job['status']}) ---")
+    return job_response(job, status_code=202)
+
+
+def start_cached_render(kind: str, request: Request, data: FinalizeRequest, video_path: Path, output_filename: str, key: str, clip: Optional[tuple] = None) -> Dict[str, Any]:
+    """Returns a completed job if this exact render exists, the running job if it's in progress, else starts one."""
+    processed_video_path = PROCESSED_VIDEOS_DIR / output_filename
+    result = {"video_url": str(request.url_for('processed_videos', path=output_filename)), "message": "Video processed successfully."}
+    if processed_video_path.exists():
+        print(f"Reusing cached {kind}: {processed_video_path}")
+        os.utime(processed_video_path) # Keep it past the next sweep
+        return finished_job(kind, video_path, result)
+    active = render_jobs.get(key)
+    if active and active["status"] in ("queued", "running"):
+        return active
+
+    job = create_job(kind, video_path)
+    render_jobs[key] = job
+
+    async def work():
+        try:
+            await render_captioned_video(data, video_path, processed_video_path, clip=clip)
+            return result
+        finally:
+            render_jobs.pop(key, None)
 
-        if process.returncode != 0:
-            print(f"--- FFmpeg stderr START ---\n{full_stderr}\n--- FFmpeg stderr END ---")
-            lines = [line.strip() for line in full_stderr.splitlines() if line.strip()]
-            specific_error = f"FFmpeg processing failed. Last error: {lines[-1]}" if lines else "FFmpeg processing failed."
-            if processed_video_path.exists():
-                try: processed_video_path.unlink()
-                except OSError: pass
-            raise HTTPException(status_code=500, detail=specific_error)
-        else:
-             if full_stderr.strip():
-                 print(f"--- FFmpeg stderr (Success run) START ---\n{full_stderr}\n--- FFmpeg stderr END ---")
+    asyncio.create_task(run_job(job, work))
+    return job
 
-        print(f"Video processed successfully: {processed_video_path}")
-        video_url = request.url_for('processed_videos', path=output_filename)
-        print(f"--- /finalize_video END ---")
-        return JSONResponse(content={"video_url": str(video_url), "message": "Video processed successfully."})
+@app.post("/preview_video/", status_code=202)
+async def preview_video(request: Request, data: PreviewRequest):
+    """Renders a few seconds around the playhead with the requested style, for quick feedback before exporting."""
+    print(f"\n--- /preview_video START (at {data.at:.2f}s, {data.duration:.1f}s) ---")
+    temp_video_path = Path(data.temp_video_path).resolve()
+    if UPLOADS_DIR.resolve() not in temp_video_path.parents:
+        raise HTTPException(status_code=400, detail="Invalid temporary video path provided.")
+    if uploads.get(temp_video_path) is None:
+        raise HTTPException(status_code=404, detail="Temporary video file not found. Please start over by transcribing again.")
 
-    except HTTPException as e:
-        if temp_srt_path and temp_srt_path.exists():
-             try: temp_srt_path.unlink()
-             except OSError: pass
-        raise e
-    except Exception as e:
-        print(f"An unexpected error occurred in /finalize_video: {e}")
-        import traceback
-        traceback.print_exc()
-        if temp_srt_path and temp_srt_path.exists():
-             try: temp_srt_path.unlink()
-             except OSError: pass
-        raise HTTPException(status_code=500, detail=f"Unexpected server error during finalization: {type(e).__name__}")
-    finally:
-        print("--- Cleaning up temporary SRT file (Finalize) ---")
-        if temp_srt_path and temp_srt_path.exists():
-            try:
-                temp_srt_path.unlink()
-                print(f"Cleaned up temp SRT: {temp_srt_path}")
-            except Exception as e_clean:
-                 print(f"Error cleaning up temp SRT {temp_srt_path}: {e_clean}")
-        print(f"Keeping temp video for potential regeneration: {temp_video_path}")
+    key = render_cache_key(data, temp_video_path)
+    job = start_cached_render("preview", request, data, temp_video_path, f"preview_{key[:32]}.mp4", key, clip=(data.at, data.duration))
+    return job_response(job, status_code=202)
 
 
 # --- Main Execution ---
@@ -414,12 +865,9 @@ if __name__ == "__main__":
          exit(1)
 
     try:
-        print("Attempting to load 'tiny' Whisper model to check installation...")
-        model_check = whisper.load_model("tiny")
-        print("Whisper seems to be installed correctly.")
-        del model_check
-        import gc
-        gc.collect()
+        # Models are loaded in the Whisper worker processes (preloaded when they start); just check PyTorch here
+        import torch
+        print(f"Whisper and PyTorch {torch.__version__} found. Preloading in {WHISPER_WORKERS} worker(s): {', '.join(WHISPER_PRELOAD_MODELS) or '(none)'}")
     except Exception as e:
         print(f"ERROR: Whisper model could not be loaded. Ensure 'openai-whisper' is installed correctly and any dependencies (like PyTorch/torchvision/torchaudio and potentially CUDA for GPU) are met. Error: {e}")
         import traceback
@@ -0,0 +1,231 @@
+import os
+import re
+import json
+import time
+import uuid
+import hashlib
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Settings
+upload_chunk_size = 8 * 1024 * 1024 # Chunk size suggested to clients (any size is accepted)
+upload_read_size = 1024 * 1024 # Bytes read from the request stream per write
+upload_session_ttl_seconds = 24 * 3600 # Unfinished uploads untouched for this long are removed
+UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(Exception):
+    """An upload request that can't be applied. status is the HTTP status to answer with; details go in the JSON body."""
+
+    def __init__(self, message, status=400, **details):
+        super().__init__(message)
+        self.status = status
+        self.details = details
+
+
+class ChunkedUploadStore:
+    """
+    Resumable uploads written straight into their destination directory.
+
+    Each upload is a preallocated ".upload-<id>.part" file next to where the finished file will live, plus a
+    small JSON sidecar recording how many bytes have been acknowledged, so a client can resume from that
+    offset after a dropped connection (or a server restart). Chunks are appended in order and the sha256 of
+    the content is updated as they are written, so completing an upload is a rename and needs no extra read
+    pass. Only if the server restarted mid-upload is the received prefix hashed once more.
+    """
+
+    def __init__(self, directory, on_progress=None, on_discard=None):
+        self.directory = directory
+        self.on_progress = on_progress # Called as on_progress(upload_id, received) after every chunk
+        self.on_discard = on_discard # Called as on_discard(upload_id) when an unfinished upload is aborted or pruned
+        self._lock = threading.Lock()
+        self._states = {} # upload_id -> sidecar state
+        self._hashers = {} # upload_id -> (sha256 object, bytes hashed)
+        self._upload_locks = {} # upload_id -> lock serializing writes to one upload
+
+    # --- Paths and state ---
+    def part_path(self, upload_id):
+        return os.path.join(self.directory, f".upload-{upload_id}.part")
+
+    def _state_path(self, upload_id):
+        return os.path.join(self.directory, f".upload-{upload_id}.json")
+
+    def _save_state(self, state):
+        state["updated_at"] = time.time()
+        state_path = self._state_path(state["upload_id"])
+        tmp_path = state_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _get_state(self, upload_id):
+        if not UPLOAD_ID_PATTERN.match(upload_id or ""):
+            raise UploadError("Upload not found", status=404)
+        with self._lock:
+            state = self._states.get(upload_id)
+            if state is None:
+                try:
+                    with open(self._state_path(upload_id), "r", encoding="utf-8") as f:
+                        state = json.load(f)
+                except (OSError, ValueError):
+                    raise UploadError("Upload not found", status=404)
+                if not os.path.exists(self.part_path(upload_id)):
+                    raise UploadError("Upload not found", status=404)
+                self._states[upload_id] = state
+            return state
+
+    def _upload_lock(self, upload_id):
+        with self._lock:
+            return self._upload_locks.setdefault(upload_id, threading.Lock())
+
+    def _forget(self, upload_id):
+        with self._lock:
+            self._states.pop(upload_id, None)
+            self._hashers.pop(upload_id, None)
+            self._upload_locks.pop(upload_id, None)
+        for path in (self.part_path(upload_id), self._state_path(upload_id)):
+            if os.path.exists(path):
+                try: os.remove(path)
+                except OSError as e: logger.warning(f"Could not remove upload file {path}: {e}")
+
+    @staticmethod
+    def _public(state):
+        return {key: state[key] for key in ("upload_id", "filename", "size", "received")}
+
+    # --- Upload lifecycle ---
+    def create(self, filename, size, options=None):
+        """Starts an upload of size bytes and reserves the disk space for it up front."""
+        if size < 0:
+            raise UploadError("Upload size must not be negative")
+        self.prune()
+        upload_id = uuid.uuid4().hex
+        part_path = self.part_path(upload_id)
+        fd = os.open(part_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o644)
+        try:
+            if size and hasattr(os, "posix_fallocate"):
+                os.posix_fallocate(fd, 0, size) # Fails now (not half-way through) if the disk is too full
+            else:
+                os.ftruncate(fd, size)
+        except OSError as e:
+            os.close(fd)
+            os.remove(part_path)
+            raise UploadError(f"Could not reserve {size} bytes for the upload: {e}", status=507)
+        os.close(fd)
+
+        state = {"upload_id": upload_id, "filename": filename, "size": size, "received": 0, "options": options or {}, "created_at": time.time()}
+        self._save_state(state)
+        with self._lock:
+            self._states[upload_id] = state
+            self._hashers[upload_id] = (hashlib.sha256(), 0)
+        logger.info(f"Started upload {upload_id} for {filename} ({size} bytes)")
+        return self._public(state)
+
+    def status(self, upload_id):
+        return self._public(self._get_state(upload_id))
+
+    def options(self, upload_id):
+        return dict(self._get_state(upload_id)["options"])
+
+    def write_chunk(self, upload_id, offset, stream):
+        """
+        Appends the bytes read from stream at offset. offset may be behind the acknowledged size (a retried
+        chunk; the overlap is skipped) but not ahead of it. Returns the upload's status afterwards.
+        """
+        with self._upload_lock(upload_id):
+            state = self._get_state(upload_id)
+            received = state["received"]
+            if offset < 0 or offset > received:
+                raise UploadError(f"Chunk offset {offset} does not match the {received} bytes received so far", status=409, received=received)
+
+            with self._lock:
+                hasher, hashed = self._hashers.get(upload_id, (None, 0))
+            if hasher is not None and hashed != received:
+                hasher = None # Out of step (shouldn't happen); complete() re-hashes instead
+            skip = received - offset
+            overflow = False
+            try:
+                with open(self.part_path(upload_id), "r+b") as f:
+                    f.seek(received)
+                    while True:
+                        block = stream.read(upload_read_size)
+                        if not block:
+                            break
+                        if skip:
+                            dropped = min(skip, len(block))
+                            block, skip = block[dropped:], skip - dropped
+                            if not block:
+                                continue
+                        if received + len(block) > state["size"]:
+                            block, overflow = block[:state["size"] - received], True
+                        f.write(block)
+                        if hasher is not None:
+                            hasher.update(block)
+                        received += len(block)
+                        if overflow:
+                            break
+            finally:
+                # Record whatever made it to disk, so an interrupted chunk resumes where it stopped
+                state["received"] = received
+                self._save_state(state)
+                with self._lock:
+                    if hasher is not None:
+                        self._hashers[upload_id] = (hasher, received)
+                    else:
+                        self._hashers.pop(upload_id, None)
+                if self.on_progress:
+                    self.on_progress(upload_id, received)
+            if overflow:
+                raise UploadError(f"Chunk runs past the declared size of {state['size']} bytes", status=413, received=received)
+            return self._public(state)
+
+    def complete(self, upload_id, dest_path):
+        """Moves a fully received upload to dest_path and returns the sha256 of its contents."""
+        with self._upload_lock(upload_id):
+            state = self._get_state(upload_id)
+            if state["received"] != state["size"]:
+                raise UploadError(f"Upload incomplete: {state['received']} of {state['size']} bytes received", status=409, received=state["received"])
+            part_path = self.part_path(upload_id)
+            with self._lock:
+                hasher, hashed = self._hashers.get(upload_id, (None, 0))
+            if hasher is None or hashed != state["size"]:
+                logger.info(f"Re-hashing upload {upload_id} (streaming hash state was lost)")
+                hasher = hashlib.sha256()
+                with open(part_path, "rb") as f:
+                    for block in iter(lambda: f.read(upload_read_size), b""):
+                        hasher.update(block)
+            os.replace(part_path, dest_path) # Same directory, so this is a rename, not a copy
+            self._forget(upload_id)
+        logger.info(f"Completed upload {upload_id} as {dest_path}")
+        return hasher.hexdigest()
+
+    def abort(self, upload_id):
+        self._get_state(upload_id)
+        with self._upload_lock(upload_id):
+            self._forget(upload_id)
+        if self.on_discard:
+            self.on_discard(upload_id)
+        logger.info(f"Aborted upload {upload_id}")
+
+    def prune(self):
+        """Removes unfinished uploads that haven't received data within upload_session_ttl_seconds."""
+        cutoff = time.time() - upload_session_ttl_seconds
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            match = re.match(r"^\.upload-([0-9a-f]{32})\.json$", name)
+            if not match:
+                continue
+            try:
+                with open(os.path.join(self.directory, name), "r", encoding="utf-8") as f:
+                    updated_at = json.load(f).get("updated_at", 0)
+            except (OSError, ValueError):
+                updated_at = 0
+            if updated_at < cutoff:
+                logger.info(f"Removing stale upload {match.group(1)}")
+                self._forget(match.group(1))
+                if self.on_discard:
+                    self.on_discard(match.group(1))
@@ -1,5 +1,6 @@
 import os
 from faster_whisper import WhisperModel
+from faster_whisper.vad import VadOptions, get_speech_timestamps # Silence detection for chunked transcription
 from moviepy.editor import VideoFileClip, TextClip, CompositeVideoClip, ColorClip
 from moviepy.config import change_settings
 import subprocess
@@ -10,6 +11,17 @@ import logging # For logging
 import webvtt # Import webvtt
 from datetime import timedelta # Import timedelta for VTT parsing
 import re # Add re import
+import threading # For the shared Whisper model pool
+from collections import OrderedDict # LRU ordering for loaded models
+from contextlib import contextmanager
+import multiprocessing # Process pool for parallel chunked transcription
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import json # For parsing ffprobe output
+import tempfile # Scratch files for multi-step ffmpeg cuts
+import shutil
+import numpy as np # Installed with faster-whisper; decoded audio buffers
+from artifact_cache import artifact_cache, materialize # Content-addressed cache for audio/transcripts/renders
+from transcript_store import TranscriptSegment, TranscriptWord, WordTranscript, save_transcript, TRANSCRIPTS_DIR # Array-backed word-level transcripts
 
 if not hasattr(PIL.Image, 'ANTIALIAS'):
     PIL.Image.ANTIALIAS = PIL.Image.LANCZOS
@@ -40,7 +52,9 @@ AUDIO_DIR = os.path.join(DATA_DIR, "audio")
 MUSIC_DIR = os.path.join(DATA_DIR, "music")
 
 SUBTITLES_DIR = os.path.join(DATA_DIR, "subtitles") # Ensure this exists
-for dir_path in [DATA_DIR, VIDEOS_DIR, EDITED_VIDEOS_DIR, EDITED_SHORTS_DIR, AUDIO_DIR, SUBTITLES_DIR]:
+PREVIEWS_DIR = os.path.join(DATA_DIR, "previews") # Low-resolution proxies for in-browser preview
+TRANSCRIPT_CHECKPOINT_DIR = os.path.join(TRANSCRIPTS_DIR, "partial") # Segments checkpointed while Whisper runs
+for dir_path in [DATA_DIR, VIDEOS_DIR, EDITED_VIDEOS_DIR, EDITED_SHORTS_DIR, AUDIO_DIR, SUBTITLES_DIR, PREVIEWS_DIR, TRANSCRIPT_CHECKPOINT_DIR]:
     os.makedirs(dir_path, exist_ok=True)
 
 # Settings
@@ -52,39 +66,390 @@ subtitle_stroke_color = "black"
 # zoom_factor = 2.0 # Default zoom factor removed, now passed as argument
 subtitle_vertical_offset = 550 # May need adjustment after wrapping
 words_per_line = 4 # Max words per subtitle line
+subtitle_kerning = -0.5
+target_width, target_height = 1080, 1920 # 9:16 output canvas
+proxy_width, proxy_height = 360, 640 # Preview proxy canvas (same framing, a third of the size)
+proxy_video_codec_args = ["-c:v", "libx264", "-preset", "ultrafast", "-crf", "30"] # Fast to make, good enough to pick cuts
+# Render engine for process_video: "ffmpeg" (ASS subtitles + one filtergraph pass) or "moviepy" (TextClip compositing)
+video_render_engine = "ffmpeg"
+video_render_engines = ("ffmpeg", "moviepy")
+
+# Whisper settings (shared by every transcription job in this process)
+whisper_model_size = "base" # or "tiny", "small", "medium", "large-v2", etc.
+whisper_compute_type = "int8" # "float16" or "float32" for GPU, "int8" for CPU efficiency
+whisper_device = "cpu" # or "cuda" if NVIDIA GPU and CUDA libraries are installed
+whisper_max_loaded_models = 2 # Max distinct (size, compute_type) models kept warm at once
+whisper_max_concurrent_per_model = 1 # Concurrent transcriptions allowed on one loaded model
+whisper_sample_rate = 16000 # faster-whisper works on 16 kHz mono audio
+audio_pcm_read_size = 1024 * 1024 # Bytes copied per read from ffmpeg's PCM pipe
+whisper_parallel_min_seconds = 20 * 60 # Audio at least this long is split at silences and transcribed by a process pool
+whisper_parallel_workers = max(1, min(8, (os.cpu_count() or 1) // 4)) # Worker processes, each with its own model
+whisper_parallel_cpu_threads = max(1, (os.cpu_count() or 1) // whisper_parallel_workers) # CTranslate2 threads per worker
+whisper_chunk_target_seconds = 5 * 60 # Preferred chunk length; chunks end in the middle of a silence
+whisper_chunk_min_silence_ms = 500 # Shortest pause that counts as a chunk boundary candidate
+
+# Short cutting settings
+short_cut_modes = ("smart", "copy", "reencode") # See cut_segment for what each mode does
+short_video_codec_args = ["-c:v", "libx264", "-preset", "medium", "-crf", "22", "-profile:v", "high", "-level:v", "4.1"]
+short_audio_codec_args = ["-c:a", "aac", "-b:a", "160k"]
+short_batch_max_outputs = 6 # Max shorts encoded by one ffmpeg run (each output holds its own encoder)
+short_batch_max_gap_seconds = 120 # Start a new batch rather than decode a longer stretch nobody uses
 
 logger = logging.getLogger(__name__) # Use logger
 
-def transcribe_audio(video_path, video_filename_base):
-    """Extracts audio and transcribes using FasterWhisper."""
-    audio_path = os.path.join(AUDIO_DIR, f"{video_filename_base}_audio.mp3")
-    if not os.path.exists(audio_path):
-        logger.info(f"Extracting audio from {video_path} to {audio_path}")
+class WhisperModelPool:
+    """
+    Process-wide registry of loaded WhisperModel instances.
+
+    Each (model_size, compute_type, device) combination is loaded once and kept warm.
+    Callers check a model out, use it, and return it; at most `max_concurrent_per_model`
+    callers can hold the same model at a time. When more than `max_loaded_models`
+    combinations are loaded, the least recently used idle model is evicted.
+    """
+
+    def __init__(self, max_loaded_models=whisper_max_loaded_models, max_concurrent_per_model=whisper_max_concurrent_per_model):
+        self.max_loaded_models = max(1, int(max_loaded_models))
+        self.max_concurrent_per_model = max(1, int(max_concurrent_per_model))
+        self._models = OrderedDict() # key -> WhisperModel, ordered least -> most recently used
+        self._in_use = {} # key -> number of active checkouts
+        self._loading = set() # keys currently being loaded (load happens outside the lock)
+        self._cond = threading.Condition()
+
+    def _evict_idle_models(self):
+        """Drops least recently used idle models until there is room for one more. Caller holds the lock."""
+        while len(self._models) + len(self._loading) >= self.max_loaded_models:
+            idle_keys = [k for k in self._models if self._in_use.get(k, 0) == 0]
+            if not idle_keys:
+                return False # Everything loaded is busy; caller must wait
+            evicted_key = idle_keys[0]
+            del self._models[evicted_key]
+            self._in_use.pop(evicted_key, None)
+            logger.info(f"Evicted Whisper model {evicted_key} from pool (LRU).")
+        return True
+
+    def checkout(self, model_size=whisper_model_size, compute_type=whisper_compute_type, device=whisper_device):
+        """Returns a loaded WhisperModel, loading it on first use. Blocks while the model is at its concurrency limit."""
+        key = (model_size, compute_type, device)
+        with self._cond:
+            while True:
+                if key in self._models:
+                    if self._in_use.get(key, 0) < self.max_concurrent_per_model:
+                        self._in_use[key] = self._in_use.get(key, 0) + 1
+                        self._models.move_to_end(key)
+                        return self._models[key]
+                elif key not in self._loading and self._evict_idle_models():
+                    self._loading.add(key)
+                    break # Load outside the lock so other models stay usable
+                self._cond.wait()
+
+        logger.info(f"Loading Whisper model into pool: size={model_size}, compute_type={compute_type}, device={device}")
         try:
-            subprocess.run([
-                "ffmpeg", "-i", video_path, "-vn", # No video
-                "-acodec", "libmp3lame", "-q:a", "2", # Good quality MP3
-                "-y", # Overwrite if exists
-                audio_path
-            ], check=True, capture_output=True, text=True) # Capture output for errors
-        except subprocess.CalledProcessError as e:
-             logger.error(f"FFmpeg audio extraction failed (Code {e.returncode}): {e.stderr}")
-             raise # Re-raise the exception
-    logger.info(f"Transcribing audio file: {audio_path}")
-    # Consider making model size configurable
-    model_size = "base" # or "tiny", "small", "medium", "large-v2", etc.
-    compute_type = "int8" # "float16" or "float32" for GPU, "int8" for CPU efficiency
-    device = "cpu" # or "cuda" if NVIDIA GPU and CUDA libraries are installed
+            model = WhisperModel(model_size, device=device, compute_type=compute_type, num_workers=self.max_concurrent_per_model)
+        except Exception:
+            with self._cond:
+                self._loading.discard(key)
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._loading.discard(key)
+            self._models[key] = model
+            self._in_use[key] = 1
+            self._cond.notify_all()
+        return model
+
+    def checkin(self, model_size=whisper_model_size, compute_type=whisper_compute_type, device=whisper_device):
+        """Returns a model previously obtained with checkout()."""
+        key = (model_size, compute_type, device)
+        with self._cond:
+            if self._in_use.get(key, 0) > 0:
+                self._in_use[key] -= 1
+            else:
+                logger.warning(f"Whisper model {key} checked in without a matching checkout.")
+            self._cond.notify_all()
+
+    @contextmanager
+    def model(self, model_size=whisper_model_size, compute_type=whisper_compute_type, device=whisper_device):
+        """Context manager wrapping checkout()/checkin()."""
+        model = self.checkout(model_size, compute_type, device)
+        try:
+            yield model
+        finally:
+            self.checkin(model_size, compute_type, device)
+
+whisper_model_pool = WhisperModelPool()
+
+def pcm_decode_command(source):
+    """ffmpeg command that writes source's soundtrack to stdout as raw 16 kHz mono float32 (f32le) samples."""
+    return [
+        "ffmpeg", "-loglevel", "error", "-i", source, "-vn", # No video
+        "-ac", "1", "-ar", str(whisper_sample_rate), "-f", "f32le", "-", # Raw mono float samples on stdout
+    ]
+
+def decode_audio_pcm(video_path, dest_path):
+    """Streams the soundtrack through ffmpeg as raw 16 kHz mono float32 (f32le) samples into dest_path."""
+    command = pcm_decode_command(video_path)
+    command.insert(1, "-nostdin")
+    with open(dest_path, "wb") as out, tempfile.TemporaryFile() as stderr_file:
+        process = subprocess.Popen(command, stdout=subprocess.PIPE, stderr=stderr_file)
+        for chunk in iter(lambda: process.stdout.read(audio_pcm_read_size), b""):
+            out.write(chunk)
+        process.stdout.close()
+        if process.wait() != 0:
+            stderr_file.seek(0)
+            stderr_text = stderr_file.read().decode("utf-8", errors="replace")
+            logger.error(f"FFmpeg audio decode failed (Code {process.returncode}): {stderr_text}")
+            raise subprocess.CalledProcessError(process.returncode, command, stderr=stderr_text)
+    return dest_path
+
+def open_audio_pcm(pcm_path):
+    """Read-only memory map of a decode_audio_pcm file as a float32 sample array."""
+    if os.path.getsize(pcm_path) == 0:
+        return np.zeros(0, dtype=np.float32) # No audio stream (memmap can't map an empty file)
+    return np.memmap(pcm_path, dtype="<f4", mode="r")
+
+_audio_decode_locks = {} # audio cache key -> lock, so concurrent callers decode a source only once
+_audio_decode_locks_guard = threading.Lock()
+
+def load_audio_pcm(video_path, source_digest=None):
+    """
+    Returns the soundtrack as 16 kHz mono float32 samples (the format faster-whisper consumes), decoded once
+    per distinct source content.
+
+    ffmpeg's raw output is streamed straight into the artifact cache, so nothing is encoded to an intermediate
+    format and the decode never holds the whole soundtrack in memory. The returned array is a read-only memory
+    map of the cached file, so the same buffer can be shared by Whisper, VAD, silence detection and loudness
+    analysis without extra copies.
+    """
+    source_digest = source_digest or artifact_cache.file_digest(video_path)
+    audio_key = artifact_cache.make_key("audio", source=source_digest, format="f32le", sample_rate=whisper_sample_rate, channels=1)
+    with _audio_decode_locks_guard:
+        decode_lock = _audio_decode_locks.setdefault(audio_key, threading.Lock())
+    with decode_lock: # An upload's early decode and its processing job may ask for the same audio at once
+        return _load_audio_pcm_locked(video_path, audio_key)
+
+def _load_audio_pcm_locked(video_path, audio_key):
+    cached_audio = artifact_cache.get_path("audio", audio_key, ".f32")
+    if not cached_audio:
+        temp_fd, temp_audio_path = tempfile.mkstemp(suffix=".f32", prefix="audio_", dir=AUDIO_DIR)
+        os.close(temp_fd)
+        logger.info(f"Decoding audio from {video_path} to 16 kHz PCM ({temp_audio_path})")
+        try:
+            decode_audio_pcm(video_path, temp_audio_path)
+        except Exception:
+            if os.path.exists(temp_audio_path): os.remove(temp_audio_path)
+            raise # Re-raise the exception
+        cached_audio = artifact_cache.put_file("audio", audio_key, ".f32", temp_audio_path)
+    return open_audio_pcm(cached_audio)
+
+def segment_to_dict(seg, offset=0.0):
+    """Serializes a Whisper segment to plain JSON data, shifting its times by offset seconds."""
+    return {
+        "start": round(float(seg.start) + offset, 3),
+        "end": round(float(seg.end) + offset, 3),
+        "text": seg.text,
+        "words": [[round(float(w.start) + offset, 3), round(float(w.end) + offset, 3), w.word, float(getattr(w, "probability", 0.0) or 0.0)] for w in (seg.words or [])],
+    }
+
+def segment_from_dict(data):
+    """Inverse of segment_to_dict."""
+    return TranscriptSegment(start=data["start"], end=data["end"], text=data["text"], words=[TranscriptWord(*w) for w in data.get("words", [])])
+
+def _transcript_cache_key(source_digest, model_size, compute_type):
+    return artifact_cache.make_key("transcript", source=source_digest, model_size=model_size, compute_type=compute_type, word_timestamps=True)
+
+def _checkpoint_path(transcript_key):
+    return os.path.join(TRANSCRIPT_CHECKPOINT_DIR, f"{transcript_key}.jsonl")
+
+def read_transcript_checkpoint(checkpoint_path):
+    """Returns the segments checkpointed so far (ignores a torn last line from a crash)."""
+    segments = []
+    if not os.path.exists(checkpoint_path):
+        return segments
+    with open(checkpoint_path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                segments.append(segment_from_dict(json.loads(line)))
+            except (ValueError, KeyError, TypeError):
+                logger.warning(f"Ignoring incomplete checkpoint line in {checkpoint_path}")
+                break
+    return segments
+
+def get_partial_transcript(video_path, model_size=whisper_model_size, compute_type=whisper_compute_type):
+    """Segments transcribed so far for a video that is still being transcribed (empty list if none)."""
     try:
-        model = WhisperModel(model_size, device=device, compute_type=compute_type)
+        source_digest = artifact_cache.file_digest(video_path)
+    except OSError:
+        return []
+    return read_transcript_checkpoint(_checkpoint_path(_transcript_cache_key(source_digest, model_size, compute_type)))
+
+# --- Transcription engines ---
+# Both call on_segment(seg_data) with segment_to_dict() data, in time order, as results become available.
+
+def transcribe_samples_streaming(audio, on_segment, model_size=whisper_model_size, compute_type=whisper_compute_type, offset=0.0, language=None):
+    """Single decoding stream over the whole array using the pooled model."""
+    with whisper_model_pool.model(model_size, compute_type) as model:
         # Segments will contain word timestamps if word_timestamps=True
-        segments, info = model.transcribe(audio_path, beam_size=5, word_timestamps=True)
+        segment_iter, info = model.transcribe(audio, beam_size=5, word_timestamps=True, language=language)
         logger.info(f"Transcription detected language: {info.language} with probability {info.language_probability}")
-        return list(segments) # Return segments as a list
+        # Consume the generator incrementally while the model is still checked out
+        for seg in segment_iter:
+            on_segment(segment_to_dict(seg, offset=offset))
+
+def detect_language(audio, model_size=whisper_model_size, compute_type=whisper_compute_type):
+    """Detects the spoken language from the opening 30 seconds of audio."""
+    with whisper_model_pool.model(model_size, compute_type) as model:
+        _, info = model.transcribe(audio[:30 * whisper_sample_rate], beam_size=5)
+    logger.info(f"Transcription detected language: {info.language} with probability {info.language_probability}")
+    return info.language
+
+def find_chunk_boundaries(audio, target_seconds=whisper_chunk_target_seconds, sample_rate=whisper_sample_rate):
+    """
+    Splits audio into [(start_sample, end_sample)] chunks of roughly target_seconds.
+
+    Cut points are placed in the middle of pauses found by faster-whisper's Silero VAD, so no word is split
+    between two chunks. If no pause occurs within twice the target length (e.g. continuous music) the chunk
+    is cut hard at the target length.
+    """
+    total = len(audio)
+    target = int(target_seconds * sample_rate)
+    if total <= target:
+        return [(0, total)]
+    speech = get_speech_timestamps(audio, vad_options=VadOptions(min_silence_duration_ms=whisper_chunk_min_silence_ms))
+    pause_midpoints = [(prev["end"] + nxt["start"]) // 2 for prev, nxt in zip(speech, speech[1:])]
+
+    boundaries = [0]
+    for cut in pause_midpoints + [total]:
+        while cut - boundaries[-1] > 2 * target:
+            boundaries.append(boundaries[-1] + target) # No pause in time: hard cut
+        if cut < total and cut - boundaries[-1] >= target:
+            boundaries.append(cut)
+    if len(boundaries) > 1 and total - boundaries[-1] < target // 4:
+        boundaries.pop() # Fold a short tail into the previous chunk
+    boundaries.append(total)
+    return list(zip(boundaries[:-1], boundaries[1:]))
+
+_chunk_worker_model = None # WhisperModel owned by a transcription worker process
+
+def _init_chunk_worker(model_size, compute_type, cpu_threads):
+    global _chunk_worker_model
+    _chunk_worker_model = WhisperModel(model_size, device=whisper_device, compute_type=compute_type, cpu_threads=cpu_threads)
+
+def _transcribe_chunk(audio_chunk, chunk_offset, chunk_end, language):
+    """Runs in a worker process. Returns the chunk's segments as dicts on the absolute timeline."""
+    segment_iter, _ = _chunk_worker_model.transcribe(audio_chunk, beam_size=5, word_timestamps=True, language=language)
+    results = []
+    for seg in segment_iter:
+        seg_data = segment_to_dict(seg, offset=chunk_offset)
+        # Whisper may overshoot the padded end of a chunk; keep times inside the chunk
+        seg_data["end"] = min(seg_data["end"], chunk_end)
+        for w in seg_data["words"]:
+            w[0], w[1] = min(w[0], chunk_end), min(w[1], chunk_end)
+        results.append(seg_data)
+    return results
+
+def transcribe_samples_parallel(audio, on_segment, model_size=whisper_model_size, compute_type=whisper_compute_type, offset=0.0, language=None, workers=whisper_parallel_workers, cpu_threads=whisper_parallel_cpu_threads):
+    """
+    Splits the array at pauses (find_chunk_boundaries) and transcribes the chunks in a process pool, each
+    worker holding its own model. Chunks finish out of order; their segments are shifted onto the absolute
+    timeline and handed to on_segment strictly in order, so checkpoints and progress stay contiguous.
+    """
+    chunks = find_chunk_boundaries(audio)
+    if language is None:
+        language = detect_language(audio, model_size, compute_type) # Once, so every chunk decodes in the same language
+    logger.info(f"Transcribing {len(audio) / whisper_sample_rate:.0f}s of audio as {len(chunks)} chunks on {min(workers, len(chunks))} worker processes.")
+
+    finished = {}
+    next_index = 0
+    context = multiprocessing.get_context("spawn") # Don't fork a process that holds threads and loaded models
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)), mp_context=context, initializer=_init_chunk_worker, initargs=(model_size, compute_type, cpu_threads)) as pool:
+        futures = {
+            pool.submit(_transcribe_chunk, np.asarray(audio[start:end]), offset + start / whisper_sample_rate, offset + end / whisper_sample_rate, language): index
+            for index, (start, end) in enumerate(chunks)
+        }
+        for future in as_completed(futures):
+            finished[futures[future]] = future.result()
+            while next_index in finished:
+                for seg_data in finished.pop(next_index):
+                    on_segment(seg_data)
+                next_index += 1
+
+def seed_transcription(source_digest, pcm_path, checkpoint_path, model_size=whisper_model_size, compute_type=whisper_compute_type):
+    """
+    Hands audio and checkpointed segments produced elsewhere (e.g. while the source was still uploading) to the
+    caches transcribe_audio reads, so it starts from them instead of decoding and transcribing from zero.
+    Either path may be None. Files that are not adopted are removed.
+    """
+    if pcm_path:
+        audio_key = artifact_cache.make_key("audio", source=source_digest, format="f32le", sample_rate=whisper_sample_rate, channels=1)
+        if artifact_cache.get_path("audio", audio_key, ".f32"):
+            os.remove(pcm_path)
+        else:
+            artifact_cache.put_file("audio", audio_key, ".f32", pcm_path)
+    if checkpoint_path:
+        transcript_key = _transcript_cache_key(source_digest, model_size, compute_type)
+        target_path = _checkpoint_path(transcript_key)
+        if artifact_cache.get_path("transcript", transcript_key, ".wtx") or os.path.exists(target_path):
+            os.remove(checkpoint_path) # Already transcribed (or being transcribed) from an earlier upload of this content
+        else:
+            os.replace(checkpoint_path, target_path)
+
+def transcribe_audio(video_path, video_filename_base, model_size=whisper_model_size, compute_type=whisper_compute_type, progress_callback=None, parallel=None):
+    """
+    Decodes audio to 16 kHz PCM (load_audio_pcm) and transcribes using FasterWhisper (model shared via whisper_model_pool).
+
+    Segments are consumed from faster-whisper's generator as they are produced and appended to a checkpoint
+    file, so a worker that dies mid-transcription resumes after the last checkpointed segment. If given,
+    progress_callback(percent) is called as segments arrive (segment end time vs. audio duration).
+    parallel selects the engine: True splits the audio at pauses and transcribes chunks in a process pool,
+    False uses a single decoding stream, None (default) goes parallel for audio of whisper_parallel_min_seconds or more.
+    Audio and finished transcripts are cached by source content hash + model settings, so identical content
+    is never re-transcribed. Returns a WordTranscript (a lazily loaded, list-like sequence of TranscriptSegment).
+    """
+    source_digest = artifact_cache.file_digest(video_path)
+    transcript_key = _transcript_cache_key(source_digest, model_size, compute_type)
+    cached_transcript = artifact_cache.get_path("transcript", transcript_key, ".wtx")
+    if cached_transcript:
+        logger.info(f"Using cached transcript for {video_filename_base}.")
+        if progress_callback: progress_callback(100.0)
+        return WordTranscript(cached_transcript)
+
+    audio = load_audio_pcm(video_path, source_digest)
+    checkpoint_path = _checkpoint_path(transcript_key)
+    segments = read_transcript_checkpoint(checkpoint_path)
+    resume_offset = segments[-1].end if segments else 0.0
+
+    logger.info(f"Transcribing audio of {video_filename_base}" + (f" (resuming at {resume_offset:.2f}s after {len(segments)} checkpointed segments)" if segments else ""))
+    try:
+        duration = len(audio) / whisper_sample_rate
+        if resume_offset > 0:
+            audio = audio[int(resume_offset * whisper_sample_rate):]
+        if progress_callback: progress_callback(min(100.0, 100.0 * resume_offset / duration) if duration else 0.0)
+
+        if len(audio) > 0:
+            if parallel is None:
+                parallel = whisper_parallel_workers > 1 and len(audio) / whisper_sample_rate >= whisper_parallel_min_seconds
+            engine = transcribe_samples_parallel if parallel else transcribe_samples_streaming
+            with open(checkpoint_path, "a", encoding="utf-8") as checkpoint:
+                def on_segment(seg_data):
+                    checkpoint.write(json.dumps(seg_data) + "\n")
+                    checkpoint.flush()
+                    segments.append(segment_from_dict(seg_data))
+                    if progress_callback and duration:
+                        progress_callback(min(100.0, 100.0 * seg_data["end"] / duration))
+                engine(audio, on_segment, model_size, compute_type, offset=resume_offset)
     except Exception as e:
-         logger.error(f"Error during Whisper transcription: {e}", exc_info=True)
+         logger.error(f"Error during Whisper transcription (checkpoint kept at {checkpoint_path}): {e}", exc_info=True)
          raise
 
+    temp_fd, temp_transcript_path = tempfile.mkstemp(suffix=".wtx", prefix="transcript_", dir=AUDIO_DIR)
+    os.close(temp_fd)
+    save_transcript(segments, temp_transcript_path)
+    cached_transcript = artifact_cache.put_file("transcript", transcript_key, ".wtx", temp_transcript_path)
+    try: os.remove(checkpoint_path)
+    except OSError: logger.warning(f"Could not remove transcript checkpoint {checkpoint_path}")
+    if progress_callback: progress_callback(100.0)
+    return WordTranscript(cached_transcript)
+
 def group_words_with_timestamps(segments, group_size=words_per_line):
     """Groups transcribed words into subtitle lines with approx group_size words."""
     subtitle_groups = []
@@ -246,6 +611,26 @@ def parse_vtt(filepath):
     logger.info(f"Parsed {len(subtitle_groups)} valid captions from VTT file.")
     return subtitle_groups
 
+def load_subtitle_groups(filepath):
+    """Parses an SRT/VTT file by extension, caching the parsed groups by file content hash."""
+    file_ext = os.path.splitext(filepath)[1].lower()
+    parsers = {'.srt': parse_srt, '.vtt': parse_vtt}
+    if file_ext not in parsers:
+        logger.warning(f"Unsupported subtitle file extension: {file_ext}")
+        return None
+    try:
+        groups_key = artifact_cache.make_key("subtitle_groups", source=artifact_cache.file_digest(filepath), ext=file_ext, words_per_line=words_per_line)
+    except OSError as e:
+        logger.error(f"Could not hash subtitle file {filepath}: {e}")
+        return parsers[file_ext](filepath)
+    cached_groups = artifact_cache.get_json("subtitle_groups", groups_key)
+    if cached_groups is not None:
+        return cached_groups
+    subtitle_groups = parsers[file_ext](filepath)
+    if subtitle_groups:
+        artifact_cache.put_json("subtitle_groups", groups_key, subtitle_groups)
+    return subtitle_groups
+
 # --- New Helper Function ---
 def get_text_from_segments(segments):
     """Extracts concatenated raw text from parsed subtitle segments."""
@@ -263,11 +648,187 @@ def get_text_from_segments(segments):
             logger.warning(f"Segment {i} missing expected text field or is empty: {seg}")
 
     return " ".join(all_text) # Join with spaces
+
+def get_timed_text_from_segments(segments):
+    """Formats parsed subtitle segments as "[hh:mm:ss - hh:mm:ss] text" lines, like a generated transcript."""
+    if not segments or not isinstance(segments, list):
+        logger.warning("Invalid or empty segments received for text extraction.")
+        return ""
+
+    lines = []
+    for i, seg in enumerate(segments):
+        if not isinstance(seg, dict) or "start" not in seg or "end" not in seg:
+            logger.warning(f"Segment {i} missing timing fields: {seg}")
+            continue
+        text = str(seg.get("raw_text") or seg.get("text") or "").replace('\n', ' ').strip()
+        if not text:
+            continue
+        start_h, start_rem = divmod(int(float(seg["start"])), 3600)
+        end_h, end_rem = divmod(int(float(seg["end"])), 3600)
+        lines.append(f"[{start_h:02}:{start_rem // 60:02}:{start_rem % 60:02} - {end_h:02}:{end_rem // 60:02}:{end_rem % 60:02}] {text}")
+
+    return "\n".join(lines)
 # --- End New Helper Function ---
 
 
+# --- ffmpeg/ASS Render Engine ---
+_ass_color_names = {"white": "&H00FFFFFF", "black": "&H00000000", "yellow": "&H0000FFFF", "red": "&H000000FF"}
+
+def _ass_color(color_name):
+    """Maps the MoviePy color names used in the settings to ASS &HAABBGGRR values."""
+    return _ass_color_names.get(str(color_name).lower(), "&H00FFFFFF")
+
+def format_ass_time(seconds):
+    """Converts seconds to ASS time format H:MM:SS.cc"""
+    centiseconds = max(0, int(round(float(seconds) * 100)))
+    hours, centiseconds = divmod(centiseconds, 360000)
+    minutes, centiseconds = divmod(centiseconds, 6000)
+    secs, centiseconds = divmod(centiseconds, 100)
+    return f"{hours}:{minutes:02}:{secs:02}.{centiseconds:02}"
+
+def write_ass_subtitles(subtitle_groups, ass_path, time_offset=0.0):
+    """
+    Writes subtitle groups to an ASS file styled like the MoviePy TextClips.
+
+    The script resolution matches the 1080x1920 canvas, so font size, outline and margins are in output pixels.
+    Bottom-center alignment with MarginV=subtitle_vertical_offset puts the bottom of the text block where
+    MoviePy placed it (target_height - text_h - subtitle_vertical_offset). time_offset is subtracted from
+    every timestamp (used when the video being rendered starts later than 0).
+    """
+    font_name = subtitle_font
+    bold = 0
+    if font_name.lower().endswith("-bold"): # ImageMagick-style name, e.g. "Calibri-Bold"
+        font_name = font_name[:-5]
+        bold = -1
+    side_margin = int(target_width * 0.05) # TextClip used 90% of the width
+    outline = subtitle_stroke_width / 2 # ImageMagick strokes straddle the glyph edge; ASS outlines sit outside it
+
+    lines = [
+        "[Script Info]",
+        "ScriptType: v4.00+",
+        f"PlayResX: {target_width}",
+        f"PlayResY: {target_height}",
+        "WrapStyle: 0",
+        "ScaledBorderAndShadow: yes",
+        "",
+        "[V4+ Styles]",
+        "Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding",
+        f"Style: Default,{font_name},{subtitle_fontsize},{_ass_color(subtitle_color)},&H000000FF,{_ass_color(subtitle_stroke_color)},&H00000000,{bold},0,0,0,100,100,{subtitle_kerning},0,1,{outline:g},0,2,{side_margin},{side_margin},{subtitle_vertical_offset},1",
+        "",
+        "[Events]",
+        "Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text",
+    ]
+    written = 0
+    for i, group in enumerate(subtitle_groups or []):
+        try:
+            start = float(group["start"]) - time_offset
+            end = float(group["end"]) - time_offset
+            text = str(group.get("text") or "")
+        except (ValueError, TypeError, KeyError) as e:
+            logger.warning(f"Skipping subtitle group {i} due to invalid data: {group}. Error: {e}")
+            continue
+        if end <= start or end <= 0 or not text.strip():
+            continue
+        # Braces start ASS override blocks; newlines become hard line breaks
+        text = text.replace("{", "(").replace("}", ")").replace("\r", "").replace("\n", "\\N")
+        lines.append(f"Dialogue: 0,{format_ass_time(max(0.0, start))},{format_ass_time(end)},Default,,0,0,0,,{text}")
+        written += 1
+
+    with open(ass_path, "w", encoding="utf-8") as f:
+        f.write("\n".join(lines) + "\n")
+    logger.info(f"Wrote {written} subtitle events to ASS file: {ass_path}")
+    return written
+
+def _escape_filter_path(path):
+    """Escapes a file path for use inside an ffmpeg filter option."""
+    return os.path.abspath(path).replace('\\', '/').replace(':', '\\:')
+
+def build_vertical_filter(width, height, zoom_factor, ass_path=None, canvas=(target_width, target_height)):
+    """
+    Builds the scale/crop/pad (and optional ASS burn-in) filter that maps a source frame onto the 1080x1920 canvas.
+    A smaller canvas (e.g. the preview proxy) gets the same framing; libass scales the subtitles to match.
+    """
+    canvas_w, canvas_h = canvas
+    scaling_factor = min(canvas_w / width, canvas_h / height) * zoom_factor
+    # Even dimensions keep libx264/yuv420p happy
+    new_w = max(2, int(width * scaling_factor) // 2 * 2)
+    new_h = max(2, int(height * scaling_factor) // 2 * 2)
+    crop_w, crop_h = min(new_w, canvas_w), min(new_h, canvas_h)
+    filters = [
+        f"scale={new_w}:{new_h}",
+        f"crop={crop_w}:{crop_h}", # Centered, like the MoviePy composite clipping an oversized clip
+        f"pad={canvas_w}:{canvas_h}:{(canvas_w - crop_w) // 2}:{(canvas_h - crop_h) // 2}:black",
+        "setsar=1",
+    ]
+    if ass_path:
+        filters.append(f"ass=filename='{_escape_filter_path(ass_path)}'")
+    return ",".join(filters)
+
+def _parse_frame_rate(rate):
+    """Parses ffprobe's "30000/1001" style frame rates."""
+    try:
+        num, _, den = str(rate).partition('/')
+        value = float(num) / float(den or 1)
+        return value if value > 0 else None
+    except (ValueError, ZeroDivisionError):
+        return None
+
+def render_video_ffmpeg(video_path, output_file, subtitle_groups, zoom_factor=2.0, proxy=False):
+    """
+    Renders the 1080x1920 edited video (scale/pad plus ASS subtitle burn-in) in a single ffmpeg pass.
+    proxy=True renders the 360x640 preview proxy instead: same framing and subtitles, ultrafast, small.
+    """
+    video_stream, audio_stream = probe_media_streams(video_path)
+    width, height = int(video_stream.get("width") or 0), int(video_stream.get("height") or 0)
+    if width <= 0 or height <= 0:
+        raise ValueError(f"Video file {video_path} has invalid dimensions: {width}x{height}")
+    fps = _parse_frame_rate(video_stream.get("r_frame_rate")) or 30
+    keyframe_interval = int(fps * 2)
+
+    ass_path = None
+    try:
+        if subtitle_groups:
+            ass_fd, ass_path = tempfile.mkstemp(suffix=".ass", prefix="render_", dir=SUBTITLES_DIR)
+            os.close(ass_fd)
+            if not write_ass_subtitles(subtitle_groups, ass_path):
+                os.remove(ass_path)
+                ass_path = None
+
+        command = [
+            "ffmpeg", "-loglevel", "warning", "-y",
+            "-i", video_path,
+            "-vf", build_vertical_filter(width, height, zoom_factor, ass_path, canvas=(proxy_width, proxy_height) if proxy else (target_width, target_height)),
+            "-map", "0:v:0", "-map", "0:a:0?",
+        ]
+        if proxy:
+            command += proxy_video_codec_args + ["-g", str(keyframe_interval), "-pix_fmt", "yuv420p", "-c:a", "aac", "-b:a", "96k"]
+        else:
+            command += [
+                "-c:v", "libx264", "-preset", "medium", "-b:v", "5000k",
+                "-g", str(keyframe_interval),
+                "-pix_fmt", "yuv420p", "-profile:v", "high", "-level:v", "4.1",
+                "-c:a", "aac",
+            ]
+        command += ["-threads", str(os.cpu_count() or 4), "-movflags", "+faststart", output_file]
+        logger.info(f"Rendering {'preview proxy' if proxy else 'edited video'} with ffmpeg ({'with' if ass_path else 'without'} subtitles) to: {output_file}")
+        try:
+            subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='replace')
+        except subprocess.CalledProcessError as e:
+            logger.error(f"FFmpeg render failed for {video_path} (Code {e.returncode}): {e.stderr}")
+            if os.path.exists(output_file):
+                try: os.remove(output_file)
+                except OSError: logger.warning(f"Could not delete potentially incomplete output file: {output_file}")
+            raise
+        logger.info(f"Successfully wrote video file: {output_file}")
+        return output_file
+    finally:
+        if ass_path and os.path.exists(ass_path):
+            try: os.remove(ass_path)
+            except OSError: logger.warning(f"Could not delete temporary ASS file: {ass_path}")
+
+
 # --- Modified process_video ---
-def process_video(video_path, edited_filename, skip_editing=False, subtitle_file_path=None, zoom_factor=2.0, process_without_subs=False):
+def process_video(video_path, edited_filename, skip_editing=False, subtitle_file_path=None, zoom_factor=2.0, process_without_subs=False, render_engine=None, whisper_transcript=None, progress_callback=None):
     """
     Processes video: transcodes, optionally adds subtitles (generated or from file).
 
@@ -278,11 +839,14 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
         subtitle_file_path (str, optional): Path to an SRT or VTT subtitle file to use instead of generating.
         zoom_factor (float, optional): The factor by which to zoom into the video (e.g., 1.5, 2.0). Defaults to 2.0.
         process_without_subs (bool, optional): If True, skips embedding subtitles into the video, but transcript and subtitle_groups are still generated.
+        render_engine (str, optional): "ffmpeg" or "moviepy". Defaults to the module-level video_render_engine setting.
+        whisper_transcript (WordTranscript, optional): Previously stored transcript to use instead of running Whisper again.
+        progress_callback (callable, optional): Called with the transcription percent complete as Whisper segments arrive.
 
     Returns:
         tuple: (output_file_path, transcript_data, subtitle_groups_data)
                output_file_path is the path to the edited video (even if skip_editing, it's the expected path).
-               transcript_data is the list of Whisper segments (or None if using external subtitles or transcription failed).
+               transcript_data is the Whisper transcript, a list-like sequence of segments (or None if using external subtitles or transcription failed).
                subtitle_groups_data is the list of parsed/grouped subtitles (from file or Whisper, or None on error).
     """
     video_filename_base = os.path.splitext(os.path.basename(video_path))[0]
@@ -303,15 +867,12 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
     # --- Always generate transcript/subtitles unless using uploaded subtitle file ---
     if subtitle_file_path and os.path.exists(subtitle_file_path):
         logger.info(f"Using provided subtitle file: {subtitle_file_path}")
-        file_ext = os.path.splitext(subtitle_file_path)[1].lower()
-        if file_ext == '.srt':
-            subtitle_groups = parse_srt(subtitle_file_path)
-            processed_subtitle_file = True
-        elif file_ext == '.vtt':
-            subtitle_groups = parse_vtt(subtitle_file_path)
+        parsed_groups = load_subtitle_groups(subtitle_file_path)
+        if parsed_groups is not None:
+            subtitle_groups = parsed_groups
             processed_subtitle_file = True
         else:
-            logger.warning(f"Unsupported subtitle file extension: {file_ext}. Falling back to Whisper transcription.")
+            logger.warning(f"Could not use subtitle file {subtitle_file_path}. Falling back to Whisper transcription.")
             # Fall through to transcription
 
         if processed_subtitle_file:
@@ -322,9 +883,13 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
 
     # Only run transcription if no valid subtitle file path was successfully processed
     if not processed_subtitle_file:
-        logger.info("Attempting to generate transcript using Whisper.")
         try:
-            transcript_data = transcribe_audio(video_path, video_filename_base)
+            if whisper_transcript is not None and len(whisper_transcript):
+                logger.info("Using stored word-level transcript instead of running Whisper.")
+                transcript_data = whisper_transcript
+            else:
+                logger.info("Attempting to generate transcript using Whisper.")
+                transcript_data = transcribe_audio(video_path, video_filename_base, progress_callback=progress_callback)
             subtitle_groups = group_words_with_timestamps(transcript_data)
             if not subtitle_groups:
                 logger.warning("Whisper transcription resulted in empty subtitle groups.")
@@ -339,7 +904,35 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
         # Even if skipping editing, return the transcript data and subtitle groups if generated/parsed
         return output_file, transcript_data, subtitle_groups
 
-    # 3. Process Video with MoviePy (if not skipping)
+    # 3. Render the edited video (if not skipping)
+    render_engine = render_engine or video_render_engine
+    if render_engine not in video_render_engines:
+        logger.warning(f"Unknown render engine '{render_engine}'. Using '{video_render_engine}'.")
+        render_engine = video_render_engine
+
+    # Identical source + subtitles + settings -> reuse the previous render
+    edited_key = artifact_cache.make_key(
+        "edited",
+        source=artifact_cache.file_digest(video_path),
+        zoom_factor=zoom_factor,
+        process_without_subs=bool(process_without_subs),
+        subtitles=None if process_without_subs else artifact_cache.make_key("groups", groups=subtitle_groups),
+        engine=render_engine,
+        style=[subtitle_font, subtitle_fontsize, subtitle_color, subtitle_stroke_width, subtitle_stroke_color, subtitle_vertical_offset, subtitle_kerning],
+    )
+    cached_edited = artifact_cache.get_path("edited", edited_key, ".mp4")
+    if cached_edited:
+        materialize(cached_edited, output_file)
+        logger.info(f"Reused cached edited video for {video_path}: {output_file}")
+        return output_file, transcript_data, subtitle_groups
+    if os.path.exists(output_file):
+        os.remove(output_file) # Never write through a hardlink shared with the cache
+
+    if render_engine == "ffmpeg":
+        render_video_ffmpeg(video_path, output_file, [] if process_without_subs else subtitle_groups, zoom_factor)
+        artifact_cache.put_file("edited", edited_key, ".mp4", output_file, move=False)
+        return output_file, transcript_data, subtitle_groups
+
     logger.info(f"Starting video processing with MoviePy for: {video_path}")
     video = None # Initialize video object variable
     subtitle_clips = [] # Initialize here
@@ -353,7 +946,6 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
 
         # --- Cropping/Resizing Logic ---
         w, h = video.size
-        target_width, target_height = 1080, 1920 # 9:16 aspect ratio
 
         # Calculate scaling factor using MIN to fit, then zoom
         scaling_factor = min(target_width / w, target_height / h) * zoom_factor # <-- USES zoom_factor variable
@@ -399,7 +991,7 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
                         align='center',
                         method='caption',
                         size=(target_width * 0.9, None),
-                        kerning=-0.5
+                        kerning=subtitle_kerning
                     ).set_start(start).set_duration(duration)
                     text_w, text_h = tc.size
                     pos_y = max(0, min(target_height - text_h, target_height - text_h - subtitle_vertical_offset))
@@ -438,6 +1030,7 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
             logger='bar',
         )
         logger.info(f"Successfully wrote video file: {output_file}")
+        artifact_cache.put_file("edited", edited_key, ".mp4", output_file, move=False)
 
     except Exception as e:
         logger.error(f"MoviePy processing failed for {video_path}: {e}", exc_info=True)
@@ -456,4 +1049,256 @@ def process_video(video_path, edited_filename, skip_editing=False, subtitle_file
         except Exception as e:
             logger.warning(f"Error during MoviePy cleanup: {e}")
 
-    return output_file, transcript_data, subtitle_groups # Return path, whisper data, and parsed/grouped subs
\ No newline at end of file
+    return output_file, transcript_data, subtitle_groups # Return path, whisper data, and parsed/grouped subs
+
+
+# --- Short Cutting Engine ---
+def probe_media_streams(video_path):
+    """Returns (video_stream, audio_stream) dicts from ffprobe; audio_stream may be None."""
+    result = subprocess.run([
+        "ffprobe", "-v", "error",
+        "-show_entries", "stream=index,codec_type,codec_name,width,height,r_frame_rate,time_base,sample_rate,channels",
+        "-of", "json", video_path
+    ], check=True, capture_output=True, text=True)
+    streams = json.loads(result.stdout or "{}").get("streams", [])
+    video_stream = next((st for st in streams if st.get("codec_type") == "video"), None)
+    audio_stream = next((st for st in streams if st.get("codec_type") == "audio"), None)
+    if not video_stream:
+        raise ValueError(f"No video stream found in {video_path}")
+    return video_stream, audio_stream
+
+def find_keyframes_around(video_path, time_seconds, window_seconds=10.0):
+    """
+    Finds the keyframes bracketing time_seconds by reading packet flags (no decoding).
+
+    Returns:
+        tuple: (previous_keyframe, next_keyframe). previous_keyframe is the last keyframe at or
+               before time_seconds, next_keyframe the first one after it. Either may be None if
+               no keyframe was found inside the probed window.
+    """
+    read_start = max(0.0, time_seconds - window_seconds)
+    result = subprocess.run([
+        "ffprobe", "-v", "error", "-select_streams", "v:0",
+        "-read_intervals", f"{read_start:.3f}%{time_seconds + window_seconds:.3f}",
+        "-show_entries", "packet=pts_time,flags",
+        "-of", "csv=p=0", video_path
+    ], check=True, capture_output=True, text=True)
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        parts = line.strip().split(',')
+        if len(parts) < 2 or 'K' not in parts[1]:
+            continue
+        try:
+            keyframes.append(float(parts[0]))
+        except ValueError:
+            continue # pts_time can be N/A for some packets
+    keyframes.sort()
+
+    previous_keyframe = None
+    next_keyframe = None
+    for kf in keyframes:
+        if kf <= time_seconds + 0.001: # Tolerate float rounding on an exact hit
+            previous_keyframe = kf
+        elif next_keyframe is None:
+            next_keyframe = kf
+    return previous_keyframe, next_keyframe
+
+def _run_cut_command(command, description):
+    """Runs one ffmpeg step of a cut, logging stderr on failure."""
+    logger.debug(f"FFmpeg command ({description}): {' '.join(command)}")
+    try:
+        return subprocess.run(command, check=True, capture_output=True, text=True, encoding='utf-8', errors='replace')
+    except subprocess.CalledProcessError as e:
+        logger.error(f"FFmpeg {description} failed (Code {e.returncode}): {e.stderr}")
+        raise
+
+def cut_segment(input_path, output_path, start_seconds, duration_seconds, mode="smart"):
+    """
+    Cuts [start, start + duration) from input_path into output_path using input-side seeking.
+
+    Modes:
+        "smart":    Re-encodes only the GOP at the head of the cut (start up to the next keyframe)
+                    and stream-copies everything after it, then joins the two with the concat demuxer.
+                    Falls back to "reencode" if the source layout doesn't allow it.
+        "copy":     Keyframe-aligned stream copy only (no re-encoding). The clip starts at the keyframe
+                    at or before start_seconds, so it may begin slightly early. Meant for fast previews.
+        "reencode": Seeks on the input side and re-encodes the whole clip.
+    """
+    if mode not in short_cut_modes:
+        logger.warning(f"Unknown cut mode '{mode}'. Using 'smart'.")
+        mode = "smart"
+    start_seconds = float(start_seconds)
+    duration_seconds = float(duration_seconds)
+    end_seconds = start_seconds + duration_seconds
+    base_command = ["ffmpeg", "-loglevel", "warning", "-y"]
+    output_args = ["-avoid_negative_ts", "make_zero", "-map_metadata", "-1", "-movflags", "+faststart"]
+
+    if mode == "copy":
+        _run_cut_command(base_command + [
+            "-ss", f"{start_seconds:.3f}", "-i", input_path, "-t", f"{duration_seconds:.3f}",
+            "-map", "0:v", "-map", "0:a?", "-c", "copy",
+        ] + output_args + [output_path], "keyframe copy")
+        return output_path
+
+    if mode == "smart":
+        try:
+            previous_keyframe, next_keyframe = find_keyframes_around(input_path, start_seconds)
+        except (subprocess.CalledProcessError, OSError) as e:
+            logger.warning(f"Keyframe probe failed for {input_path}, re-encoding whole cut instead: {e}")
+            previous_keyframe, next_keyframe = None, None
+
+        if previous_keyframe is not None and abs(previous_keyframe - start_seconds) <= 0.001:
+            # Cut starts exactly on a keyframe: nothing needs re-encoding
+            logger.info(f"Cut start {start_seconds}s is keyframe-aligned. Stream-copying.")
+            return cut_segment(input_path, output_path, start_seconds, duration_seconds, mode="copy")
+
+        if next_keyframe is not None and next_keyframe < end_seconds - 0.05:
+            try:
+                return _smart_cut(input_path, output_path, start_seconds, next_keyframe, end_seconds, base_command, output_args)
+            except (subprocess.CalledProcessError, ValueError, OSError) as e:
+                logger.warning(f"Smart cut failed for {output_path}, re-encoding whole cut instead: {e}")
+        else:
+            logger.info(f"No keyframe inside cut range after {start_seconds}s. Re-encoding whole cut.")
+
+    _run_cut_command(base_command + [
+        "-ss", f"{start_seconds:.3f}", "-i", input_path, "-t", f"{duration_seconds:.3f}",
+        "-map", "0:v", "-map", "0:a?",
+    ] + short_video_codec_args + short_audio_codec_args + output_args + [output_path], "re-encode cut")
+    return output_path
+
+def _smart_cut(input_path, output_path, start_seconds, head_end_seconds, end_seconds, base_command, output_args):
+    """Encodes [start, head_end) to match the source, stream-copies [head_end, end) and concatenates them."""
+    video_stream, audio_stream = probe_media_streams(input_path)
+    if video_stream.get("codec_name") != "h264":
+        raise ValueError(f"Smart cut needs an h264 source, got {video_stream.get('codec_name')}")
+
+    # Match the copied tail so the concat demuxer sees one consistent stream
+    head_video_args = short_video_codec_args + ["-pix_fmt", "yuv420p"]
+    time_base = str(video_stream.get("time_base", ""))
+    if '/' in time_base:
+        head_video_args += ["-video_track_timescale", time_base.split('/')[1]]
+    if video_stream.get("r_frame_rate") and video_stream["r_frame_rate"] != "0/0":
+        head_video_args += ["-r", video_stream["r_frame_rate"]]
+    head_audio_args = list(short_audio_codec_args)
+    if audio_stream:
+        if audio_stream.get("sample_rate"): head_audio_args += ["-ar", str(audio_stream["sample_rate"])]
+        if audio_stream.get("channels"): head_audio_args += ["-ac", str(audio_stream["channels"])]
+
+    work_dir = tempfile.mkdtemp(prefix="cut_", dir=os.path.dirname(output_path) or None)
+    try:
+        head_path = os.path.join(work_dir, "head.mp4")
+        tail_path = os.path.join(work_dir, "tail.mp4")
+        list_path = os.path.join(work_dir, "parts.txt")
+
+        _run_cut_command(base_command + [
+            "-ss", f"{start_seconds:.3f}", "-i", input_path, "-t", f"{head_end_seconds - start_seconds:.3f}",
+            "-map", "0:v", "-map", "0:a?",
+        ] + head_video_args + head_audio_args + [head_path], "head re-encode")
+        _run_cut_command(base_command + [
+            "-ss", f"{head_end_seconds:.3f}", "-i", input_path, "-t", f"{end_seconds - head_end_seconds:.3f}",
+            "-map", "0:v", "-map", "0:a?", "-c", "copy", "-avoid_negative_ts", "make_zero", tail_path
+        ], "tail stream copy")
+
+        with open(list_path, "w", encoding="utf-8") as f:
+            for part in (head_path, tail_path):
+                escaped_part = part.replace("'", "'\\''")
+                f.write(f"file '{escaped_part}'\n")
+        _run_cut_command(base_command + [
+            "-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy",
+        ] + output_args + [output_path], "concat")
+        logger.info(f"Smart cut wrote {output_path} (re-encoded {head_end_seconds - start_seconds:.2f}s head, copied {end_seconds - head_end_seconds:.2f}s).")
+        return output_path
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+def plan_cut_batches(clips, max_outputs=short_batch_max_outputs, max_gap_seconds=short_batch_max_gap_seconds):
+    """
+    Groups clips (dicts with "start" and "duration" seconds) into batches for cut_segments_batch.
+
+    Clips are sorted by start time; a batch is closed when it is full or when the next clip starts more than
+    max_gap_seconds after everything in the batch has ended (seeking past the gap is cheaper than decoding it).
+    Overlapping clips share a batch.
+    """
+    batches = []
+    batch_end = None
+    for clip in sorted(clips, key=lambda c: c["start"]):
+        if not batches or len(batches[-1]) >= max_outputs or clip["start"] - batch_end > max_gap_seconds:
+            batches.append([])
+            batch_end = clip["start"]
+        batches[-1].append(clip)
+        batch_end = max(batch_end, clip["start"] + clip["duration"])
+    return batches
+
+def cut_segments_batch(input_path, clips, background_audio=None, zoom_factor=None, subtitle_groups=None):
+    """
+    Re-encodes several clips of input_path with a single ffmpeg run, so the source is demuxed and decoded once.
+
+    clips are dicts with "output_path", "start" and "duration" (seconds). The input is read once from the
+    earliest start to the latest end; the decoded streams are split per clip, trimmed and encoded to one output
+    each. Overlapping clips are fine. background_audio=(path, volume, main_volume) loops a music file under
+    every clip, mixed like process_short does for a single clip. Raises CalledProcessError if the run fails
+    (callers retry the clips one by one to find the bad one).
+
+    With zoom_factor, input_path is the original video rather than the edited one: the read window is mapped
+    onto the 1080x1920 canvas and subtitle_groups are burned in (re-timed to the window) with the same filter
+    render_video_ffmpeg uses, before the split, so every frame of a short is encoded only once.
+    """
+    window_start = min(clip["start"] for clip in clips)
+    window_end = max(clip["start"] + clip["duration"] for clip in clips)
+    video_stream, audio_stream = probe_media_streams(input_path)
+    count = len(clips)
+
+    command = ["ffmpeg", "-loglevel", "warning", "-y",
+               "-ss", f"{window_start:.3f}", "-t", f"{window_end - window_start:.3f}", "-i", input_path]
+    ass_path = None
+    if zoom_factor is not None:
+        width, height = int(video_stream.get("width") or 0), int(video_stream.get("height") or 0)
+        if width <= 0 or height <= 0:
+            raise ValueError(f"Video file {input_path} has invalid dimensions: {width}x{height}")
+        window_groups = [g for g in subtitle_groups or [] if float(g["end"]) > window_start and float(g["start"]) < window_end]
+        if window_groups:
+            ass_fd, ass_path = tempfile.mkstemp(suffix=".ass", prefix="shorts_", dir=SUBTITLES_DIR)
+            os.close(ass_fd)
+            if not write_ass_subtitles(window_groups, ass_path, time_offset=window_start):
+                os.remove(ass_path)
+                ass_path = None
+        graph = [f"[0:v]{build_vertical_filter(width, height, zoom_factor, ass_path)},split={count}" + "".join(f"[v{i}]" for i in range(count))]
+    else:
+        graph = [f"[0:v]split={count}" + "".join(f"[v{i}]" for i in range(count))]
+    if audio_stream:
+        graph.append(f"[0:a]asplit={count}" + "".join(f"[a{i}]" for i in range(count)))
+    if background_audio:
+        music_path, music_volume, main_volume = background_audio
+        command += ["-stream_loop", "-1", "-i", music_path]
+        graph.append(f"[1:a]volume=volume={music_volume:.2f},asplit={count}" + "".join(f"[m{i}]" for i in range(count)))
+
+    outputs = []
+    for i, clip in enumerate(clips):
+        start = clip["start"] - window_start # Input-side seek puts window_start at t=0
+        end = start + clip["duration"]
+        graph.append(f"[v{i}]trim=start={start:.3f}:end={end:.3f},setpts=PTS-STARTPTS[vo{i}]")
+        audio_label = None
+        if audio_stream:
+            main_filter = f",volume=volume={main_volume:.2f}" if background_audio else ""
+            graph.append(f"[a{i}]atrim=start={start:.3f}:end={end:.3f},asetpts=PTS-STARTPTS{main_filter}[ao{i}]")
+            audio_label = f"ao{i}"
+        if background_audio:
+            graph.append(f"[m{i}]atrim=end={clip['duration']:.3f},asetpts=PTS-STARTPTS[mt{i}]")
+            if audio_label:
+                graph.append(f"[{audio_label}][mt{i}]amix=inputs=2:duration=first:dropout_transition=3[am{i}]")
+                audio_label = f"am{i}"
+            else:
+                audio_label = f"mt{i}"
+        outputs += ["-map", f"[vo{i}]"] + (["-map", f"[{audio_label}]"] if audio_label else [])
+        outputs += short_video_codec_args + ["-pix_fmt", "yuv420p"] + (short_audio_codec_args if audio_label else [])
+        outputs += ["-map_metadata", "-1", "-movflags", "+faststart", clip["output_path"]]
+
+    command += ["-filter_complex", ";".join(graph)] + outputs
+    logger.info(f"Cutting {count} clips from {input_path} in one pass ({window_start:.1f}s-{window_end:.1f}s{', reframed' if zoom_factor is not None else ''})")
+    try:
+        _run_cut_command(command, f"batch cut of {count} clips")
+    finally:
+        if ass_path and os.path.exists(ass_path):
+            try: os.remove(ass_path)
+            except OSError: logger.warning(f"Could not delete temporary ASS file: {ass_path}")
@@ -0,0 +1,244 @@
+import os
+import json
+import logging
+import tempfile
+import threading
+import subprocess
+
+import numpy as np # Installed with faster-whisper
+
+from createshorts import (
+    AUDIO_DIR, TRANSCRIPT_CHECKPOINT_DIR, whisper_sample_rate, audio_pcm_read_size,
+    pcm_decode_command, detect_language, find_chunk_boundaries, transcribe_samples_streaming, seed_transcription,
+)
+
+logger = logging.getLogger(__name__)
+
+# Settings
+live_ingest_min_bytes = 256 * 1024 * 1024 # Uploads at least this big are decoded and transcribed while they arrive
+live_ingest_window_seconds = 120 # Audio transcribed per step; each step ends in a pause (find_chunk_boundaries)
+live_ingest_finalize_timeout = 3600 # Give up on the handover if the upload isn't finalized this long after it's complete
+
+
+class LiveIngest:
+    """
+    Decodes and transcribes one upload while it is still arriving.
+
+    Acknowledged bytes of the growing part file are fed to ffmpeg's stdin and its PCM output is appended to a
+    file. Whenever two windows of audio are decoded beyond what has been transcribed, the first window (cut in
+    a pause) is transcribed and its segments are checkpointed. Once the upload is finalized and its digest is
+    known, the audio and the checkpoint are handed to the caches transcribe_audio reads (seed_transcription),
+    so the processing job skips the decode and only transcribes the tail.
+
+    Containers ffmpeg can't read from a pipe (e.g. MP4 with its index at the end) fail early; the ingest then
+    discards its files and the normal pipeline runs as before.
+    """
+
+    def __init__(self, upload_id, part_path, size, on_finished=None):
+        self.upload_id = upload_id
+        self.part_path = part_path
+        self.size = size
+        self.on_finished = on_finished
+        self.video_path = None
+        self.pcm_path = os.path.join(AUDIO_DIR, f"live_{upload_id}.f32")
+        self.checkpoint_path = os.path.join(TRANSCRIPT_CHECKPOINT_DIR, f"live_{upload_id}.jsonl")
+        self._cond = threading.Condition()
+        self._received = 0
+        self._cancelled = False
+        self._digest = None # Set when the upload is finalized
+        self._decoded_bytes = 0
+        self._decode_ok = None # None while ffmpeg runs, then True/False
+        self._process = None
+        self._stderr_file = None
+        self.finished = threading.Event() # Set once the results were handed over or discarded
+
+    # --- Called by the upload endpoints ---
+    def start(self):
+        self._stderr_file = tempfile.TemporaryFile()
+        self._process = subprocess.Popen(pcm_decode_command("pipe:0"), stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=self._stderr_file)
+        for target, name in ((self._feed, "feed"), (self._collect, "decode"), (self._transcribe, "transcribe")):
+            threading.Thread(target=target, name=f"live-{name}-{self.upload_id[:8]}", daemon=True).start()
+        logger.info(f"Live ingest started for upload {self.upload_id} ({self.size} bytes)")
+
+    def data_received(self, received):
+        with self._cond:
+            self._received = received
+            self._cond.notify_all()
+
+    def upload_completed(self, video_path, digest):
+        with self._cond:
+            self.video_path = video_path
+            self._digest = digest
+            self._cond.notify_all()
+
+    def cancel(self):
+        with self._cond:
+            self._cancelled = True
+            self._cond.notify_all()
+        if self._process and self._process.poll() is None:
+            self._process.kill()
+
+    # --- Worker threads ---
+    def _feed(self):
+        """Copies acknowledged bytes of the part file into ffmpeg (the open handle survives the final rename)."""
+        fed = 0
+        try:
+            with open(self.part_path, "rb") as source:
+                while fed < self.size:
+                    with self._cond:
+                        while self._received <= fed and not self._cancelled:
+                            self._cond.wait()
+                        if self._cancelled:
+                            return
+                        available = self._received
+                    while fed < available:
+                        block = source.read(min(audio_pcm_read_size, available - fed))
+                        if not block:
+                            break
+                        self._process.stdin.write(block)
+                        fed += len(block)
+        except (OSError, ValueError) as e: # BrokenPipeError once ffmpeg gives up on the input
+            logger.info(f"Live ingest of upload {self.upload_id} stopped feeding ffmpeg: {e}")
+        finally:
+            try: self._process.stdin.close()
+            except OSError: pass
+
+    def _collect(self):
+        with open(self.pcm_path, "wb") as out:
+            for block in iter(lambda: self._process.stdout.read(audio_pcm_read_size), b""):
+                out.write(block)
+                out.flush() # The transcriber maps what's counted as decoded
+                with self._cond:
+                    self._decoded_bytes += len(block)
+                    self._cond.notify_all()
+        self._process.stdout.close()
+        ok = self._process.wait() == 0
+        if not ok and not self._cancelled:
+            self._stderr_file.seek(0)
+            logger.info(f"Live ingest can't decode upload {self.upload_id} while it arrives; it will be decoded after upload: {self._stderr_file.read().decode('utf-8', errors='replace').strip()}")
+        self._stderr_file.close()
+        with self._cond:
+            self._decode_ok = ok and not self._cancelled
+            self._cond.notify_all()
+
+    def _transcribe(self):
+        window = live_ingest_window_seconds * whisper_sample_rate
+        transcribed = 0 # Samples
+        language = None
+        try:
+            with open(self.checkpoint_path, "a", encoding="utf-8") as checkpoint:
+                while True:
+                    with self._cond:
+                        while not self._cancelled and self._decode_ok is None and self._decoded_bytes // 4 - transcribed < 2 * window:
+                            self._cond.wait()
+                        if self._cancelled or self._decode_ok is not None:
+                            break # Decoding finished (or failed); the processing job transcribes the rest
+                        available = self._decoded_bytes // 4
+                    audio = np.memmap(self.pcm_path, dtype="<f4", mode="r", shape=(available,))
+                    if language is None:
+                        language = detect_language(audio)
+                    end = transcribed + find_chunk_boundaries(audio[transcribed:], target_seconds=live_ingest_window_seconds)[0][1]
+                    window_end = end / whisper_sample_rate
+
+                    def on_segment(seg_data):
+                        # Whisper may overshoot the end of the window; keep times inside it
+                        seg_data["end"] = min(seg_data["end"], window_end)
+                        for w in seg_data["words"]:
+                            w[0], w[1] = min(w[0], window_end), min(w[1], window_end)
+                        checkpoint.write(json.dumps(seg_data) + "\n")
+                        checkpoint.flush()
+
+                    transcribe_samples_streaming(np.asarray(audio[transcribed:end]), on_segment, offset=transcribed / whisper_sample_rate, language=language)
+                    transcribed = end
+                    logger.info(f"Live ingest of upload {self.upload_id} transcribed {window_end:.0f}s of audio")
+        except Exception as e:
+            logger.error(f"Live transcription of upload {self.upload_id} failed: {e}", exc_info=True)
+        self._hand_over(transcribed)
+
+    def _hand_over(self, transcribed):
+        with self._cond:
+            while self._decode_ok is None and not self._cancelled:
+                self._cond.wait()
+            if self._decode_ok and not self._cancelled:
+                self._cond.wait_for(lambda: self._digest is not None or self._cancelled, timeout=live_ingest_finalize_timeout)
+            usable = self._decode_ok and not self._cancelled and self._digest is not None
+            digest = self._digest
+        try:
+            if usable:
+                seed_transcription(digest, self.pcm_path, self.checkpoint_path if transcribed else None)
+                logger.info(f"Live ingest of upload {self.upload_id} handed over decoded audio and {transcribed / whisper_sample_rate:.0f}s of transcript")
+        except OSError as e:
+            logger.error(f"Could not hand over live ingest results of upload {self.upload_id}: {e}")
+        finally:
+            for path in (self.pcm_path, self.checkpoint_path):
+                if os.path.exists(path):
+                    try: os.remove(path)
+                    except OSError as e: logger.warning(f"Could not remove live ingest file {path}: {e}")
+            self.finished.set()
+            if self.on_finished:
+                self.on_finished(self)
+
+
+class LiveIngestRegistry:
+    """Tracks the live ingests of in-flight uploads, by upload id and (once finalized) by video path."""
+
+    def __init__(self, min_bytes=live_ingest_min_bytes):
+        self.min_bytes = min_bytes
+        self._lock = threading.Lock()
+        self._by_upload = {}
+        self._by_path = {}
+
+    def start(self, upload_id, part_path, size):
+        """Starts a live ingest for an upload of size bytes if it's large enough to be worth it."""
+        if size < self.min_bytes:
+            return None
+        ingest = LiveIngest(upload_id, part_path, size, on_finished=self._finished)
+        try:
+            ingest.start()
+        except OSError as e:
+            logger.warning(f"Could not start live ingest for upload {upload_id}: {e}")
+            return None
+        with self._lock:
+            self._by_upload[upload_id] = ingest
+        return ingest
+
+    def data_received(self, upload_id, received):
+        with self._lock:
+            ingest = self._by_upload.get(upload_id)
+        if ingest:
+            ingest.data_received(received)
+
+    def upload_completed(self, upload_id, video_path, digest):
+        """Returns True if a live ingest will hand over audio (and possibly transcript) for video_path."""
+        with self._lock:
+            ingest = self._by_upload.pop(upload_id, None)
+            if ingest and not ingest.finished.is_set():
+                self._by_path[os.path.abspath(video_path)] = ingest
+        if not ingest or ingest.finished.is_set():
+            return False
+        ingest.upload_completed(video_path, digest)
+        return True
+
+    def cancel(self, upload_id):
+        with self._lock:
+            ingest = self._by_upload.pop(upload_id, None)
+        if ingest:
+            ingest.cancel()
+
+    def wait_for(self, video_path, timeout=None):
+        """Blocks until a pending live ingest for video_path has handed over its results (no-op if there is none)."""
+        with self._lock:
+            ingest = self._by_path.get(os.path.abspath(video_path))
+        if ingest:
+            logger.info(f"Waiting for live ingest of {video_path} to hand over")
+            ingest.finished.wait(timeout)
+
+    def _finished(self, ingest):
+        with self._lock:
+            if self._by_upload.get(ingest.upload_id) is ingest:
+                del self._by_upload[ingest.upload_id]
+            if ingest.video_path and self._by_path.get(os.path.abspath(ingest.video_path)) is ingest:
+                del self._by_path[os.path.abspath(ingest.video_path)]
+
+
+live_ingests = LiveIngestRegistry()
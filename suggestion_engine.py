@@ -0,0 +1,383 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import google.generativeai as genai
+from google.generativeai import types as genai_types
+
+logger = logging.getLogger(__name__)
+
+# Settings
+suggestion_model_name = "models/gemini-1.5-flash-latest"
+suggestion_temperature = 0.3 # Slightly adjusted temperature for consistency
+suggestion_max_output_tokens = 8192 # Per window request; windows keep responses well under this
+suggestion_window_seconds = 10 * 60 # Transcript span sent in one request
+suggestion_window_overlap_seconds = 90 # Shared by neighbouring windows so segments crossing a cut aren't lost
+suggestion_max_concurrent_requests = 4 # Window requests in flight at once
+suggestion_duplicate_overlap_ratio = 0.5 # Segments sharing this much of the shorter one's duration are duplicates
+
+SUGGESTION_PROMPT_VERSION = 3 # Bump whenever build_window_prompt changes so cached responses are not reused
+
+# Formatted transcript lines look like "[hh:mm:ss - hh:mm:ss] text" (see app.format_transcript)
+TRANSCRIPT_LINE_PATTERN = re.compile(r'^\[(\d{1,3}:\d{2}:\d{2}) - (\d{1,3}:\d{2}:\d{2})\]\s?(.*)$')
+
+
+def time_to_seconds(time_str):
+    """Converts HH:MM:SS or H:MM:SS string to seconds."""
+    # Regex allows for H, HH, or HHH hours, but max practical is usually < 100
+    if not time_str or not re.match(r'^\d{1,3}:\d{2}:\d{2}$', time_str):
+        raise ValueError(f"Invalid time format: '{time_str}'. Expected H:MM:SS or HH:MM:SS.")
+    try:
+        parts = list(map(int, time_str.split(':')))
+        if len(parts) != 3:
+             raise ValueError("Time string must have 3 parts separated by colons.")
+        h, m, s = parts
+        # Add reasonable limits (e.g., 999 hours max?)
+        if not (0 <= h < 1000 and 0 <= m < 60 and 0 <= s < 60):
+             raise ValueError(f"Time components out of range (0-999h, 0-59m, 0-59s): {h}:{m}:{s}")
+        return h * 3600 + m * 60 + s
+    except ValueError as e: # Catch split errors, int conversion errors, or range errors
+        # Re-raise with a more informative message
+        raise ValueError(f"Could not parse time string '{time_str}': {e}")
+
+
+def seconds_to_time(seconds):
+    h, rem = divmod(int(seconds), 3600)
+    m, s = divmod(rem, 60)
+    return f"{h:02}:{m:02}:{s:02}"
+
+
+def _salvage_truncated_array(text):
+    """Closes a JSON array cut off by the output token limit after its last complete object."""
+    start, end = text.find('['), text.rfind('}')
+    if start == -1 or end <= start:
+        return None
+    try:
+        return json.loads(text[start:end + 1] + ']')
+    except json.JSONDecodeError:
+        return None
+
+
+def parse_segments(response_text):
+    """Parses the JSON response from Gemini into a list of segment dictionaries."""
+    if not response_text or not isinstance(response_text, str):
+         logger.warning("Received invalid or empty response text from Gemini for parsing.")
+         return []
+
+    try:
+        # Handle potential Markdown fences if the API didn't return pure JSON
+        cleaned_response = response_text.strip()
+        if cleaned_response.startswith("```json"):
+            cleaned_response = cleaned_response[7:]
+        if cleaned_response.endswith("```"):
+            cleaned_response = cleaned_response[:-3]
+        cleaned_response = cleaned_response.strip()
+
+        if not cleaned_response:
+             logger.warning("Cleaned response text from Gemini is empty.")
+             return []
+
+        try:
+            segments = json.loads(cleaned_response)
+        except json.JSONDecodeError:
+            segments = _salvage_truncated_array(cleaned_response)
+            if segments is None:
+                raise
+            logger.warning(f"Gemini response was truncated; recovered {len(segments)} complete segments.")
+
+        # Validate structure: should be a list
+        if not isinstance(segments, list):
+            # Try to load if it's a JSON object with a key containing the list
+            if isinstance(segments, dict):
+                # Look for a likely key containing the list (common names)
+                potential_keys = ['segments', 'suggestions', 'clips', 'shorts']
+                found_list = False
+                for key in segments:
+                    if key.lower() in potential_keys and isinstance(segments[key], list):
+                        segments = segments[key]
+                        found_list = True
+                        logger.info(f"Found segment list under key '{key}' in Gemini response.")
+                        break
+                if not found_list:
+                     raise ValueError(f"Expected a JSON array or object containing a list, but got object keys: {list(segments.keys())}")
+            else:
+                raise ValueError(f"Expected a JSON array, but got type {type(segments)}")
+
+        valid_segments = []
+        # Regex for hh:mm:ss format (allows 1 to 3 digits for hour)
+        time_pattern = re.compile(r'^\d{1,3}:\d{2}:\d{2}$')
+
+        for i, seg in enumerate(segments):
+             if not isinstance(seg, dict):
+                 logger.warning(f"Segment {i} is not a dictionary, skipping. Data: {seg}")
+                 continue
+
+             # Normalize keys (lowercase, remove underscores/spaces) for flexibility
+             normalized_seg = {k.lower().replace('_','').replace(' ',''): v for k, v in seg.items()}
+
+             # Check for required keys using normalized names
+             required_keys = ['shortname', 'shortdescription', 'starttime', 'endtime']
+             if not all(k in normalized_seg for k in required_keys):
+                 logger.warning(f"Segment {i} missing required fields. Got keys: {list(normalized_seg.keys())}. Segment data: {seg}")
+                 continue
+
+             start_time_str = str(normalized_seg['starttime']).strip()
+             end_time_str = str(normalized_seg['endtime']).strip()
+
+             # Validate time format more strictly (H:MM:SS or HH:MM:SS etc.)
+             if not (time_pattern.match(start_time_str) and time_pattern.match(end_time_str)):
+                 logger.warning(f"Segment {i} has invalid time format (Expected H:MM:SS or HH:MM:SS). Start='{start_time_str}', End='{end_time_str}'. Data: {seg}")
+                 continue
+
+             # Optional: Validate start < end
+             try:
+                 start_s = time_to_seconds(start_time_str)
+                 end_s = time_to_seconds(end_time_str)
+                 if start_s >= end_s:
+                      logger.warning(f"Segment {i} has start time >= end time. Start='{start_time_str}', End='{end_time_str}'. Skipping.")
+                      continue
+             except ValueError as e:
+                  logger.warning(f"Segment {i} time conversion error: {e}. Start='{start_time_str}', End='{end_time_str}'. Skipping.")
+                  continue
+
+             # Map normalized keys back to expected DB keys
+             # Ensure values are strings and reasonably sized
+             short_name = str(normalized_seg['shortname'])[:100] # Limit length
+             short_desc = str(normalized_seg['shortdescription'])[:500] # Limit length
+
+             valid_segments.append({
+                 'short_name': short_name,
+                 'short_description': short_desc,
+                 'start_time': start_time_str, # Keep original valid format
+                 'end_time': end_time_str      # Keep original valid format
+             })
+
+        logger.info(f"Successfully parsed {len(valid_segments)} valid segments from Gemini response.")
+        return valid_segments
+
+    except json.JSONDecodeError as e:
+        logger.error(f"Failed to parse JSON response from Gemini: {e}. Response text: '{response_text[:500]}...'")
+        return []
+    except ValueError as e:
+        logger.error(f"Invalid segment format or structure from Gemini: {e}. Response text: '{response_text[:500]}...'")
+        return []
+    except Exception as e: # Catch other potential errors during parsing
+        logger.error(f"An unexpected error occurred during Gemini segment parsing: {e}", exc_info=True)
+        return []
+
+
+def split_transcript_windows(text, window_seconds=suggestion_window_seconds, overlap_seconds=suggestion_window_overlap_seconds):
+    """
+    Splits a formatted transcript into overlapping time windows.
+
+    Returns [(window_start, window_end, window_text)] in seconds. Text without "[hh:mm:ss - hh:mm:ss]" lines
+    (e.g. plain text from an uploaded subtitle) can't be placed on a timeline and is returned as one window
+    with None bounds.
+    """
+    lines = []
+    for raw_line in text.splitlines():
+        match = TRANSCRIPT_LINE_PATTERN.match(raw_line.strip())
+        if match:
+            try:
+                lines.append((time_to_seconds(match.group(1)), time_to_seconds(match.group(2)), raw_line.strip()))
+            except ValueError:
+                continue
+    if not lines:
+        return [(None, None, text)]
+
+    total_end = max(end for _, end, _ in lines)
+    step = max(1, window_seconds - overlap_seconds)
+    windows = []
+    window_start = lines[0][0]
+    while True:
+        window_end = window_start + window_seconds
+        window_lines = [line for start, _, line in lines if window_start <= start < window_end]
+        if window_lines:
+            windows.append((window_start, min(window_end, total_end), "\n".join(window_lines)))
+        if window_end >= total_end:
+            break
+        window_start += step
+    return windows
+
+
+def build_window_prompt(window_text, window_start=None, window_end=None):
+    """Prompt for one transcript window. Timestamped windows ask for times taken from the transcript."""
+    if window_start is not None:
+        time_guidance = (
+            "Provide precise start and end times based *only* on the timestamps given in the transcript (format: [hh:mm:ss - hh:mm:ss]). "
+            f"This excerpt covers {seconds_to_time(window_start)} to {seconds_to_time(window_end)} of a longer video; "
+            "only suggest segments that start and end inside it.\n\n"
+        )
+    else:
+        # Untimed text is sent whole, so it still needs the whole-video guidance
+        time_guidance = (
+            "if the duration of the whole video is more than 20 minutes, please suggest at least 20 segments.\n\n"
+            "Estimate appropriate start and end times in hh:mm:ss format based on the flow of the text. Ensure start time is before end time.\n\n"
+        )
+
+    return (
+        "Analyze the following video subtitle text and suggest 3-5 engaging segments suitable for YouTube Shorts (typically 50-60 seconds). "
+        "Focus on segments with clear topics, questions, or strong statements.\n\n"
+        "If a logical segment is significantly longer than 60 seconds, try to break it into meaningful parts (e.g., 'Topic X Part 1', 'Topic X Part 2'), ensuring each part is still engaging on its own.\n\n"
+        f"{time_guidance}"
+        "Return the result *ONLY* as a valid JSON array. Each object in the array must contain:\n"
+        "- 'shortname': A concise, unique, descriptive name for the clip (under 50 characters).\n"
+        "- 'shortdescription': A brief summary of the segment's content (1-2 sentences).\n"
+        "- 'starttime': The start time in hh:mm:ss format.\n"
+        "- 'endtime': The end time in hh:mm:ss format.\n\n"
+        "Example Input Segment (with timestamps): [00:01:15 - 00:02:10] Discussion about AI ethics...\n"
+        "Example Output Object: {\"shortname\": \"AI Ethics Intro\", \"shortdescription\": \"Introduction to the ethical considerations of AI.\", \"starttime\": \"00:01:15\", \"endtime\": \"00:02:10\"}\n\n"
+        "Subtitle Text:\n" + window_text
+    )
+
+
+def normalize_transcript_text(text):
+    """Whitespace-insensitive form of a transcript, so cosmetic differences don't miss the response cache."""
+    return "\n".join(" ".join(line.split()) for line in text.splitlines() if line.strip())
+
+
+def suggestion_cache_key(window_text, window_start, window_end, model_name, temperature, prompt_version=SUGGESTION_PROMPT_VERSION):
+    """Cache key for one window request: everything that goes into the prompt or affects the response."""
+    payload = json.dumps({
+        "transcript_sha256": hashlib.sha256(normalize_transcript_text(window_text).encode("utf-8")).hexdigest(),
+        "window": [window_start, window_end],
+        "model": model_name,
+        "prompt_version": prompt_version,
+        "temperature": temperature,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def gemini_model_factory():
+    """Default model factory: a configured genai.GenerativeModel."""
+    api_key = os.environ.get('GEMINI_API_KEY')
+    if not api_key:
+        logger.error("GEMINI_API_KEY not set in environment")
+        raise ValueError("GEMINI_API_KEY not set in environment")
+    genai.configure(api_key=api_key)
+    return genai.GenerativeModel(suggestion_model_name)
+
+
+def merge_segments(window_results):
+    """
+    Reduce step: combines per-window segments and drops duplicates from overlapping windows.
+
+    window_results is [(window_start, window_end, segments)]. Two segments are duplicates when their time
+    intersection covers suggestion_duplicate_overlap_ratio of the shorter one; the copy whose midpoint sits
+    nearer the centre of its window (i.e. was seen with the most surrounding context) is kept.
+    """
+    candidates = []
+    for window_start, window_end, segments in window_results:
+        window_mid = (window_start + window_end) / 2 if window_start is not None else None
+        for seg in segments:
+            start, end = time_to_seconds(seg['start_time']), time_to_seconds(seg['end_time'])
+            centrality = abs((start + end) / 2 - window_mid) if window_mid is not None else 0.0
+            candidates.append((centrality, start, end, seg))
+
+    kept = []
+    for centrality, start, end, seg in sorted(candidates, key=lambda c: (c[0], c[1])):
+        duplicate = any(
+            min(end, k_end) - max(start, k_start) >= suggestion_duplicate_overlap_ratio * min(end - start, k_end - k_start)
+            for _, k_start, k_end, _ in kept
+        )
+        if not duplicate:
+            kept.append((centrality, start, end, seg))
+    return [seg for _, _, _, seg in sorted(kept, key=lambda k: k[1])]
+
+
+class SuggestionEngine:
+    """
+    Map-reduce Gemini suggestions: the transcript is split into overlapping time windows, each window is sent
+    as its own request (at most max_workers in flight), and the per-window segments are merged with
+    merge_segments.
+
+    model_factory() must return an object with generate_content(contents=..., generation_config=...) whose
+    result has a .text attribute; pass a stub in place of genai.GenerativeModel to run without the API.
+
+    If a cache is given (any object with get(key) -> str or None and put(key, response_text)), raw window
+    responses are stored under suggestion_cache_key, and a hit skips the API call and goes straight to
+    parse_segments. force_fresh bypasses cache reads for one call; fresh responses are still stored.
+    """
+
+    def __init__(self, model_factory=gemini_model_factory, max_workers=suggestion_max_concurrent_requests,
+                 window_seconds=suggestion_window_seconds, overlap_seconds=suggestion_window_overlap_seconds,
+                 temperature=suggestion_temperature, model_name=suggestion_model_name, cache=None):
+        self.model_factory = model_factory
+        self.max_workers = max(1, int(max_workers))
+        self.window_seconds = window_seconds
+        self.overlap_seconds = overlap_seconds
+        self.temperature = temperature
+        self.model_name = model_name
+        self.cache = cache
+
+    def _request_window(self, get_model, window, force_fresh=False):
+        window_start, window_end, window_text = window
+        label = f"{seconds_to_time(window_start)}-{seconds_to_time(window_end)}" if window_start is not None else "full text"
+        cache_key = suggestion_cache_key(window_text, window_start, window_end, self.model_name, self.temperature) if self.cache else None
+        response_text = self.cache.get(cache_key) if cache_key and not force_fresh else None
+        if response_text is not None:
+            logger.info(f"Suggestion cache hit for window {label}; skipping Gemini call.")
+            return self._window_segments(response_text, window_start, window_end)
+
+        try:
+            response = get_model().generate_content(
+                contents=[build_window_prompt(window_text, window_start, window_end)],
+                generation_config=genai_types.GenerationConfig(
+                    response_mime_type="application/json", # Request JSON output directly
+                    max_output_tokens=suggestion_max_output_tokens,
+                    temperature=self.temperature
+                ),
+            )
+            response_text = response.text
+            logger.info(f"Gemini window {label} raw response text (first 250 chars): {response_text[:250]}...")
+        except Exception as e:
+            logger.error(f"Error calling Gemini API for window {label}: {e}", exc_info=True)
+            return []
+
+        segments = self._window_segments(response_text, window_start, window_end)
+        if cache_key and segments: # Don't pin unusable responses in the cache
+            self.cache.put(cache_key, response_text)
+        return segments
+
+    @staticmethod
+    def _window_segments(response_text, window_start, window_end):
+        segments = parse_segments(response_text)
+        if window_start is None:
+            return segments
+        # Drop suggestions the model placed outside the excerpt it was shown
+        return [
+            seg for seg in segments
+            if window_start - 1 <= time_to_seconds(seg['start_time']) and time_to_seconds(seg['end_time']) <= window_end + 1
+        ]
+
+    def suggest(self, text, force_fresh=False):
+        """Returns the merged list of segment dicts (parse_segments format) for a formatted transcript."""
+        if not text or not isinstance(text, str) or text.strip() == "":
+            logger.warning("Cannot get suggestions: Subtitle content text is missing or empty.")
+            return []
+        windows = split_transcript_windows(text, self.window_seconds, self.overlap_seconds)
+        # The model is only created if some window actually needs the API (all cache hits need no key)
+        model_holder, model_lock = [], threading.Lock()
+        def get_model():
+            with model_lock:
+                if not model_holder:
+                    model_holder.append(self.model_factory())
+                return model_holder[0]
+
+        logger.info(f"Requesting Gemini suggestions for {len(windows)} transcript window(s), {min(self.max_workers, len(windows))} at a time.")
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(windows)), thread_name_prefix="gemini") as pool:
+            per_window = list(pool.map(lambda window: self._request_window(get_model, window, force_fresh), windows))
+        merged = merge_segments([(start, end, segments) for (start, end, _), segments in zip(windows, per_window)])
+        logger.info(f"Merged {sum(len(s) for s in per_window)} window suggestions into {len(merged)} segments.")
+        return merged
+
+    def suggest_json(self, text, force_fresh=False):
+        """suggest() serialized in the JSON shape Gemini is asked for, so the result can go through parse_segments."""
+        return json.dumps([
+            {'shortname': seg['short_name'], 'shortdescription': seg['short_description'], 'starttime': seg['start_time'], 'endtime': seg['end_time']}
+            for seg in self.suggest(text, force_fresh=force_fresh)
+        ])
@@ -0,0 +1,195 @@
+import os
+import json
+import struct
+import logging
+from collections import namedtuple
+
+import numpy as np # Installed with faster-whisper
+
+logger = logging.getLogger(__name__)
+
+# Directories (ensure consistency with app.py / createshorts.py)
+DATA_DIR = os.path.abspath("data")
+TRANSCRIPTS_DIR = os.path.join(DATA_DIR, "transcripts")
+os.makedirs(TRANSCRIPTS_DIR, exist_ok=True)
+
+# Settings
+transcript_mmap_min_bytes = 8 * 1024 * 1024 # Files at least this big are memory-mapped instead of read into memory
+
+# Plain transcript records (same attribute names as faster-whisper's Segment/Word)
+TranscriptWord = namedtuple("TranscriptWord", ["start", "end", "word", "probability"])
+TranscriptSegment = namedtuple("TranscriptSegment", ["start", "end", "text", "words"])
+
+# --- On-disk format (.wtx) ---
+# MAGIC | uint32 header length | JSON header | padding | segments array | words array | UTF-8 text blob
+# Arrays start on 16-byte boundaries so they can be memory-mapped directly.
+MAGIC = b"WTX1"
+SEGMENT_DTYPE = np.dtype([
+    ("start", "<f4"), ("end", "<f4"),
+    ("first_word", "<u4"), ("word_count", "<u4"),
+    ("text_offset", "<u4"), ("text_length", "<u4"),
+])
+WORD_DTYPE = np.dtype([
+    ("start", "<f4"), ("end", "<f4"), ("probability", "<f4"),
+    ("text_offset", "<u4"), ("text_length", "<u2"),
+])
+_ALIGN = 16
+_HEADER_SPACE = 240 # Bytes reserved for the JSON header
+
+
+def _seconds(value):
+    """Times are stored as float32; round away the representation noise (Whisper times are 10 ms steps)."""
+    return round(float(value), 3)
+
+
+def _aligned(offset):
+    return (offset + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+def save_transcript(segments, path):
+    """Writes Whisper segments (faster-whisper Segments or TranscriptSegments) to a .wtx file atomically."""
+    segments = list(segments)
+    word_total = sum(len(seg.words or []) for seg in segments)
+    segment_array = np.zeros(len(segments), dtype=SEGMENT_DTYPE)
+    word_array = np.zeros(word_total, dtype=WORD_DTYPE)
+    text_blob = bytearray()
+
+    word_index = 0
+    for i, seg in enumerate(segments):
+        seg_text = (seg.text or "").encode("utf-8")
+        segment_array[i] = (seg.start, seg.end, word_index, len(seg.words or []), len(text_blob), len(seg_text))
+        text_blob += seg_text
+        for w in seg.words or []:
+            word_text = (w.word or "").encode("utf-8")[:0xFFFF]
+            word_array[word_index] = (w.start, w.end, getattr(w, "probability", 0.0) or 0.0, len(text_blob), len(word_text))
+            text_blob += word_text
+            word_index += 1
+
+    segments_offset = _aligned(len(MAGIC) + 4 + _HEADER_SPACE)
+    words_offset = _aligned(segments_offset + segment_array.nbytes)
+    text_offset = _aligned(words_offset + word_array.nbytes)
+    header = {
+        "version": 1, "segments": len(segments), "words": word_total, "text_bytes": len(text_blob),
+        "segments_offset": segments_offset, "words_offset": words_offset, "text_offset": text_offset,
+    }
+    header_bytes = json.dumps(header).encode("utf-8")
+    if len(header_bytes) > _HEADER_SPACE:
+        raise ValueError(f"Transcript header too large ({len(header_bytes)} bytes)")
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for offset, payload in ((segments_offset, segment_array.tobytes()), (words_offset, word_array.tobytes()), (text_offset, bytes(text_blob))):
+            f.write(b"\0" * (offset - f.tell()))
+            f.write(payload)
+    os.replace(tmp_path, path)
+    logger.info(f"Saved transcript ({len(segments)} segments, {word_total} words) to {path}")
+    return path
+
+
+class WordTranscript:
+    """
+    Lazily loaded, read-only view over a .wtx transcript file.
+
+    Behaves like a list of TranscriptSegment (len, indexing, iteration), so it can be passed straight to
+    group_words_with_timestamps and format_transcript. Large files are memory-mapped rather than read.
+    """
+
+    def __init__(self, path, mmap=None):
+        self.path = path
+        self._mmap = mmap
+        self._header = None
+        self._segments = None
+        self._words = None
+        self._text = None
+
+    def _read_header(self):
+        if self._header is None:
+            with open(self.path, "rb") as f:
+                if f.read(len(MAGIC)) != MAGIC:
+                    raise ValueError(f"Not a transcript file: {self.path}")
+                (header_len,) = struct.unpack("<I", f.read(4))
+                self._header = json.loads(f.read(header_len).decode("utf-8"))
+        return self._header
+
+    def _load(self):
+        if self._segments is not None:
+            return
+        header = self._read_header()
+        use_mmap = self._mmap if self._mmap is not None else os.path.getsize(self.path) >= transcript_mmap_min_bytes
+
+        def read_array(dtype, count, offset):
+            if count == 0:
+                return np.zeros(0, dtype=dtype)
+            if use_mmap:
+                return np.memmap(self.path, dtype=dtype, mode="r", offset=offset, shape=(count,))
+            return np.fromfile(self.path, dtype=dtype, count=count, offset=offset)
+
+        self._segments = read_array(SEGMENT_DTYPE, header["segments"], header["segments_offset"])
+        self._words = read_array(WORD_DTYPE, header["words"], header["words_offset"])
+        self._text = read_array(np.uint8, header["text_bytes"], header["text_offset"])
+
+    def _decode(self, offset, length):
+        return bytes(self._text[offset:offset + length]).decode("utf-8", errors="replace")
+
+    def _word(self, index):
+        w = self._words[index]
+        return TranscriptWord(_seconds(w["start"]), _seconds(w["end"]), self._decode(int(w["text_offset"]), int(w["text_length"])), round(float(w["probability"]), 4))
+
+    def __len__(self):
+        return self._read_header()["segments"]
+
+    def __getitem__(self, index):
+        self._load()
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        seg = self._segments[index]
+        first, count = int(seg["first_word"]), int(seg["word_count"])
+        return TranscriptSegment(
+            start=_seconds(seg["start"]),
+            end=_seconds(seg["end"]),
+            text=self._decode(int(seg["text_offset"]), int(seg["text_length"])),
+            words=[self._word(i) for i in range(first, first + count)],
+        )
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    @property
+    def word_count(self):
+        return self._read_header()["words"]
+
+    @property
+    def duration(self):
+        """End time of the last segment (0.0 for an empty transcript)."""
+        self._load()
+        return _seconds(self._segments["end"][-1]) if len(self._segments) else 0.0
+
+    def words_between(self, start, end):
+        """Returns the words that start inside [start, end), using a binary search over word start times."""
+        self._load()
+        starts = self._words["start"]
+        lo = int(np.searchsorted(starts, start, side="left"))
+        hi = int(np.searchsorted(starts, end, side="left"))
+        return [self._word(i) for i in range(lo, hi)]
+
+
+def load_transcript(path):
+    """Returns a WordTranscript for path, or None if the file doesn't exist or isn't readable."""
+    if not path or not os.path.exists(path):
+        return None
+    transcript = WordTranscript(path)
+    try:
+        transcript._read_header()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Ignoring unreadable transcript file {path}: {e}")
+        return None
+    return transcript
+
+
+def video_transcript_path(video_id):
+    """Per-video location of the structured word-level transcript."""
+    return os.path.join(TRANSCRIPTS_DIR, f"video_{video_id}.wtx")